@@ -0,0 +1,163 @@
+# facets.py
+"""
+Facettes des points de vente (listes déroulantes du dashboard).
+
+`filter_options` faisait sept DISTINCT sur les points de vente de
+l'utilisateur à chaque montage du dashboard. Les valeurs et leurs effectifs
+sortent maintenant d'une seule requête groupée sur les colonnes filtrables ;
+le résultat est gardé dans le cache Django par utilisateur et invalidé par
+les signaux de PointOfSale (voir signals.py).
+
+`facet_counts` calcule les effectifs d'une liste déjà filtrée
+(`?include=facets`) : une requête groupée par commune, les autres facettes
+en agrégation conditionnelle dans la même passe.
+
+    FACETS_CACHE_TTL = 300   # secondes
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import PointOfSale
+
+FACETS_CACHE_PREFIX = 'pos_facets'
+
+FACET_FIELDS = ['commune', 'district', 'region', 'type', 'potentiel', 'brander', 'marque_brander']
+
+# Ordre logique métier (pas alphabétique)
+POTENTIEL_ORDER = ['standard', 'developpement', 'fort_potentiel', 'premium']
+
+
+def _cache_key(user_id):
+    return f'{FACETS_CACHE_PREFIX}:{user_id}'
+
+
+def _cache_ttl():
+    return getattr(settings, 'FACETS_CACHE_TTL', 300)
+
+
+def invalidate_facets(*user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
+
+
+def _labelled(counts, choices, order):
+    labels = dict(choices)
+    return [
+        {'value': value, 'label': labels.get(value, value), 'count': counts[value]}
+        for value in order if value and value in counts
+    ]
+
+
+def compute_filter_options(queryset):
+    """Valeurs distinctes et effectifs, en une requête groupée."""
+    rows = (
+        queryset
+        .order_by()
+        .values(*FACET_FIELDS)
+        .annotate(count=Count('id'))
+    )
+
+    communes, districts, regions = Counter(), Counter(), Counter()
+    marques, types, potentiels = Counter(), Counter(), Counter()
+    for row in rows:
+        count = row['count']
+        if row['commune']:
+            communes[row['commune']] += count
+        if row['district']:
+            districts[row['district']] += count
+        if row['region']:
+            regions[row['region']] += count
+        if row['brander'] and row['marque_brander']:
+            marques[row['marque_brander']] += count
+        types[row['type']] += count
+        potentiels[row['potentiel']] += count
+
+    return {
+        'communes':   sorted(communes),
+        'districts':  sorted(districts),
+        'regions':    sorted(regions),
+        'marques':    sorted(marques),
+        'types':      _labelled(types, PointOfSale.TYPE_CHOICES, sorted(types)),
+        'potentiels': _labelled(potentiels, PointOfSale.POTENTIEL_CHOICES, POTENTIEL_ORDER),
+        # Effectifs des listes simples, par valeur
+        'counts': {
+            'communes':  dict(sorted(communes.items())),
+            'districts': dict(sorted(districts.items())),
+            'regions':   dict(sorted(regions.items())),
+            'marques':   dict(sorted(marques.items())),
+        },
+        'total': sum(types.values()),
+    }
+
+
+def filter_options_for_user(user):
+    key = _cache_key(user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = compute_filter_options(PointOfSale.objects.filter(user=user))
+        cache.set(key, data, _cache_ttl())
+    return data
+
+
+# ── Effectifs d'une liste filtrée ───────────────────────────────────────────
+
+def _conditional_counts():
+    """{alias: (facette, valeur, Count filtré)} pour les facettes à choix fixes."""
+    facets = {
+        'type': PointOfSale.TYPE_CHOICES,
+        'status': PointOfSale.STATUS_CHOICES,
+        'potentiel': PointOfSale.POTENTIEL_CHOICES,
+        'brander': [(True, 'Brandé'), (False, 'Non brandé')],
+    }
+    counts = {}
+    for facet, choices in facets.items():
+        for index, (value, _) in enumerate(choices):
+            counts[f'{facet}_{index}'] = (facet, value, Count('id', filter=Q(**{facet: value})))
+    return counts
+
+
+def facet_counts(queryset):
+    """
+    Effectifs par type, statut, potentiel, commune et branding du queryset
+    (filtres appliqués), en une requête.
+    """
+    conditional = _conditional_counts()
+    rows = (
+        queryset
+        .order_by()
+        .values('commune')
+        .annotate(
+            total=Count('id'),
+            **{alias: count for alias, (_, _, count) in conditional.items()},
+        )
+    )
+
+    totals = Counter()
+    communes = []
+    for row in rows:
+        communes.append({'value': row['commune'], 'count': row['total']})
+        for alias in conditional:
+            totals[alias] += row[alias]
+
+    labels = {
+        'type': dict(PointOfSale.TYPE_CHOICES),
+        'status': dict(PointOfSale.STATUS_CHOICES),
+        'potentiel': dict(PointOfSale.POTENTIEL_CHOICES),
+    }
+    facets = {'type': [], 'status': [], 'potentiel': [], 'brander': {}}
+    for alias, (facet, value, _) in conditional.items():
+        if facet == 'brander':
+            facets['brander'][str(value).lower()] = totals[alias]
+        else:
+            facets[facet].append(
+                {'value': value, 'label': labels[facet][value], 'count': totals[alias]}
+            )
+
+    communes.sort(key=lambda item: (-item['count'], item['value']))
+    facets['commune'] = communes
+    facets['total'] = sum(item['count'] for item in communes)
+    return facets
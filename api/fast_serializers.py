@@ -0,0 +1,235 @@
+# fast_serializers.py
+"""
+Serializers "values" pour les listes en lecture seule.
+
+Sur les grosses listes, l'instanciation des modèles puis des champs DRF
+coûte plus cher que la requête elle-même. `ValuesSerializer` lit directement
+des lignes `.values()` et applique des conversions pré-calculées, tout en
+produisant exactement le même JSON que le ModelSerializer d'origine
+(Decimal en chaîne quantifiée, datetime ISO "Z", URLs absolues des fichiers).
+
+    class DistrictValuesSerializer(ValuesSerializer):
+        class Meta:
+            model = District
+            fields = ['id', 'nom', 'villes_count', 'date_creation']
+            # annotations ajoutées au queryset avant .values()
+            annotations = {'villes_count_annotated': Count('villes')}
+            # lookup ORM ou annotation pour un nom de sortie
+            sources = {'villes_count': 'villes_count_annotated'}
+
+        # colonne calculée : get_<nom>(row) où row est la ligne .values()
+        def get_xxx(self, row): ...
+
+Le type de sortie est déduit du champ modèle atteint par le lookup ; pour
+une annotation on le précise dans `Meta.formats` (`decimal(2)`, `integer`...).
+`?fields=` (voir fieldsets.py) est respecté au premier niveau.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .fieldsets import _level, _request_params
+
+
+# ── Convertisseurs (alignés sur les champs DRF) ─────────────────────────────
+
+def decimal(places):
+    quantum = Decimal(1).scaleb(-places)
+
+    def convert(value, context):
+        if value is None:
+            return None
+        return '{:f}'.format(Decimal(value).quantize(quantum, rounding=ROUND_HALF_UP))
+    return convert
+
+
+def integer(value, context):
+    return None if value is None else int(value)
+
+
+def floating(value, context):
+    return None if value is None else float(value)
+
+
+def boolean(value, context):
+    return None if value is None else bool(value)
+
+
+def string(value, context):
+    return None if value is None else str(value)
+
+
+def raw(value, context):
+    return value
+
+
+def datetime_iso(value, context):
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def date_iso(value, context):
+    return None if value is None else value.isoformat()
+
+
+def file_url(storage):
+    def convert(value, context):
+        if not value:
+            return None
+        url = storage.url(value)
+        request = context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def _converter_for_field(field):
+    if isinstance(field, models.FileField):
+        return file_url(field.storage)
+    if isinstance(field, models.DecimalField):
+        return decimal(field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return datetime_iso
+    if isinstance(field, (models.DateField, models.TimeField)):
+        return date_iso
+    if isinstance(field, models.BooleanField):
+        return boolean
+    if isinstance(field, models.FloatField):
+        return floating
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return integer
+    if isinstance(field, (models.CharField, models.TextField)):
+        return string
+    if isinstance(field, models.ForeignKey):
+        return _converter_for_field(field.target_field)
+    return raw
+
+
+def _resolve_field(model, lookup):
+    field = None
+    for part in lookup.split('__'):
+        if model is None:
+            return None
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model
+    return field
+
+
+# ── Base ────────────────────────────────────────────────────────────────────
+
+class ValuesSerializer:
+    class Meta:
+        model = None
+        fields = []
+        sources = {}
+        formats = {}
+        annotations = {}
+        extra_values = []
+
+    def __init__(self, queryset=None, many=True, context=None):
+        self.queryset = queryset
+        self.context = context or {}
+
+    @classmethod
+    def _plan(cls):
+        """(nom, lookup, convertisseur, méthode) calculé une fois par classe."""
+        plan = cls.__dict__.get('_cached_plan')
+        if plan is not None:
+            return plan
+
+        meta = cls.Meta
+        sources = getattr(meta, 'sources', {})
+        formats = getattr(meta, 'formats', {})
+        plan = []
+        for name in meta.fields:
+            method = getattr(cls, f'get_{name}', None)
+            if method is not None:
+                plan.append((name, None, None, method))
+                continue
+            lookup = sources.get(name, name)
+            converter = formats.get(name)
+            if converter is None:
+                field = _resolve_field(meta.model, lookup)
+                converter = _converter_for_field(field) if field is not None else raw
+            plan.append((name, lookup, converter, None))
+        cls._cached_plan = plan
+        return plan
+
+    def _active_plan(self):
+        plan = self._plan()
+        wanted, _ = _request_params(self.context.get('request'))
+        wanted = _level(wanted, '', True)
+        if wanted is None:
+            return plan
+        return [entry for entry in plan if entry[0] in wanted]
+
+    def lookups(self, plan=None):
+        plan = plan if plan is not None else self._active_plan()
+        names = [lookup for _, lookup, _, _ in plan if lookup]
+        names.extend(getattr(self.Meta, 'extra_values', ()))
+        return list(dict.fromkeys(names))
+
+    def values_queryset(self, queryset=None):
+        queryset = self.queryset if queryset is None else queryset
+        annotations = getattr(self.Meta, 'annotations', None)
+        if annotations:
+            # Meta.ordering est ignoré dès qu'il y a un GROUP BY : on le garde
+            # explicitement pour rendre les lignes dans le même ordre que DRF
+            if not queryset.query.order_by and queryset.query.default_ordering:
+                queryset = queryset.order_by(*queryset.model._meta.ordering)
+            queryset = queryset.annotate(**annotations)
+        # Les prefetch n'ont pas de sens sur des dicts
+        return queryset.prefetch_related(None).values(*self.lookups())
+
+    def to_representation(self, row, plan):
+        context = self.context
+        data = {}
+        for name, lookup, converter, method in plan:
+            if method is not None:
+                data[name] = method(self, row)
+            else:
+                data[name] = converter(row[lookup], context)
+        return data
+
+    def serialize_rows(self, rows):
+        plan = self._active_plan()
+        return [self.to_representation(row, plan) for row in rows]
+
+    @property
+    def data(self):
+        return self.serialize_rows(self.values_queryset())
+
+
+class ValuesListMixin:
+    """
+    Remplace `list()` d'un ViewSet par le chemin `.values()`.
+    Pagination DRF respectée si elle est configurée.
+    """
+    values_serializer_class = None
+
+    def get_values_serializer(self, queryset):
+        return self.values_serializer_class(queryset, context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        return self.values_response(self.filter_queryset(self.get_queryset()))
+
+    def values_response(self, queryset):
+        """Réponse de `list()` pour un queryset déjà filtré."""
+        serializer = self.get_values_serializer(queryset)
+        rows = serializer.values_queryset()
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize_rows(page))
+        return Response(serializer.serialize_rows(rows))
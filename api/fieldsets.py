@@ -0,0 +1,141 @@
+# fieldsets.py
+"""
+Sparse fieldsets et contrôle de l'expansion des serializers.
+
+    GET /api/orders/?fields=id,status,total
+    GET /api/orders/?expand=point_of_sale_details
+    GET /api/disputes/?fields=id,status,order.id,order.total&expand=order
+
+- `fields` : liste des champs à renvoyer (notation pointée pour les
+  serializers imbriqués). Sans préfixe pour un imbriqué, il est renvoyé entier.
+- `expand` : parmi les champs imbriqués déclarés dans
+  `Meta.expandable_fields`, seuls ceux listés sont calculés. Sans paramètre
+  `expand`, le comportement historique est conservé (tout est imbriqué).
+
+Les champs écartés sont retirés dans `get_fields()` : ils ne sont jamais liés
+ni calculés (pas de SerializerMethodField, pas d'accès aux relations).
+Seules les lectures (GET/HEAD/OPTIONS) sont concernées, l'écriture garde tous
+les champs.
+
+`Meta.sparse_relations` associe un champ aux select_related/prefetch_related
+dont il a besoin ; `SparseFieldsetViewMixin` les applique au queryset
+uniquement pour les champs effectivement demandés.
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _parse(value):
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+def _level(paths, prefix, is_root):
+    """
+    Noms de premier niveau demandés sous `prefix`.
+    None = aucune restriction à ce niveau.
+    """
+    if paths is None:
+        return None
+    if is_root:
+        return {path.split('.', 1)[0] for path in paths}
+    start = prefix + '.'
+    names = {path[len(start):].split('.', 1)[0] for path in paths if path.startswith(start)}
+    return names or None
+
+
+def _request_params(request):
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = getattr(request, 'query_params', request.GET)
+    return _parse(params.get(FIELDS_PARAM)), _parse(params.get(EXPAND_PARAM))
+
+
+def _is_active(name, wanted, expanded, expandable):
+    if wanted is not None and name not in wanted:
+        return False
+    if name in expandable and expanded is not None and name not in expanded:
+        # Un champ explicitement listé dans ?fields= reste prioritaire
+        return wanted is not None and name in wanted
+    return True
+
+
+class SparseFieldsetMixin:
+    """
+    À placer avant ModelSerializer :
+
+        class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+            class Meta:
+                ...
+                expandable_fields = ['items', 'point_of_sale_details']
+                sparse_relations = {
+                    'point_of_sale_details': {'select_related': ['point_of_sale']},
+                }
+    """
+
+    def _sparse_path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if getattr(node, 'field_name', None):
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        wanted, expanded = _request_params(self.context.get('request'))
+        if wanted is None and expanded is None:
+            return fields
+
+        path = self._sparse_path()
+        is_root = not path
+        wanted = _level(wanted, path, is_root)
+        # Pour un imbriqué sans précision dans ?expand=, on garde tout
+        expanded = _level(expanded, path, is_root)
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+
+        for name in list(fields):
+            if not _is_active(name, wanted, expanded, expandable):
+                fields.pop(name)
+        return fields
+
+
+def sparse_queryset(queryset, serializer_class, request):
+    """
+    Ajoute au queryset les select_related / prefetch_related déclarés dans
+    `Meta.sparse_relations` pour les seuls champs de premier niveau demandés.
+    """
+    meta = getattr(serializer_class, 'Meta', None)
+    relations = getattr(meta, 'sparse_relations', None)
+    if not relations:
+        return queryset
+
+    wanted, expanded = _request_params(request)
+    wanted = _level(wanted, '', True)
+    expanded = _level(expanded, '', True)
+    expandable = set(getattr(meta, 'expandable_fields', ()))
+
+    select, prefetch = [], []
+    for name, hints in relations.items():
+        if _is_active(name, wanted, expanded, expandable):
+            select.extend(hints.get('select_related', ()))
+            prefetch.extend(hints.get('prefetch_related', ()))
+
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class SparseFieldsetViewMixin:
+    """Vue générique / ViewSet : ajuste le queryset aux champs demandés."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return sparse_queryset(queryset, self.get_serializer_class(), self.request)
@@ -0,0 +1,391 @@
+# geo.py
+"""
+Index spatial des coordonnées (PointOfSale, Purchase, Sale, SalePOS).
+
+Chaque ligne porte un `geohash` (précision 9, ~5 m) recalculé à la
+sauvegarde (GeohashMixin) et par les écritures en masse (GeohashQuerySet :
+bulk_create, bulk_update, update), et indexé. Une écriture en SQL brut doit
+être suivie de `refresh_geohash`. Les requêtes "viewport" passent par :
+
+- sur PostgreSQL & co : des préfixes `geohash LIKE 'cell%'` sur les quelques
+  cellules qui couvrent la zone (index varchar_pattern_ops créé par Django
+  pour un CharField indexé ; une plage `< 'cell{'` dépendrait de la
+  collation, qui sur PostgreSQL ignore la ponctuation),
+- sur SQLite : une table virtuelle R*Tree `<table>_rtree` maintenue par
+  triggers (migrations 0003 et 0008), vrai index 2D plutôt que des plages de
+  préfixes. Une migration qui reconstruit l'une de ces tables sur SQLite
+  (AddField, AlterField...) supprime ses triggers : elle doit les recréer
+  comme 0008.
+
+Dans les deux cas on termine par un filtre exact latitude/longitude.
+
+Paramètres acceptés par GeoAreaFilter :
+    ?bbox=ouest,sud,est,nord          (longitudes / latitudes, ordre GeoJSON)
+    ?lat=5.35&lng=-4.00&radius=1500   (rayon en mètres)
+
+Le clustering des cartes (cluster_queryset) regroupe en SQL sur un préfixe
+du geohash dont la longueur dépend du niveau de zoom ; `nearest` cherche les
+k plus proches voisins par anneaux de rayon croissant sur le même index.
+"""
+import math
+
+from django.db import connection, models, transaction
+from django.db.models import Avg, Count, F, FloatField, Min, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt, Substr
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Au-delà, la zone est trop grande pour que les cellules aident
+MAX_CELLS = 32
+EARTH_RADIUS_M = 6371008.8
+# À partir de ce zoom (tuiles web 256 px), on renvoie les points un par un
+CLUSTER_POINTS_ZOOM = 16
+MAX_ZOOM = 22
+# Recherche des plus proches voisins : rayon initial, facteur d'expansion
+NEAREST_START_RADIUS_M = 500
+NEAREST_GROWTH = 4
+NEAREST_MAX_RADIUS_M = 50000
+
+
+# ── Geohash ─────────────────────────────────────────────────────────────────
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    if latitude is None or longitude is None:
+        return ''
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """(hauteur en degrés de latitude, largeur en degrés de longitude)."""
+    total = 5 * precision
+    lng_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def geohash_cells(bbox, max_cells=MAX_CELLS):
+    """
+    Cellules geohash (la plus fine possible) couvrant `bbox`, ou None si la
+    zone demande plus de `max_cells` cellules même à la précision 1.
+    """
+    west, south, east, north = bbox
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        rows = math.floor((north + 90) / height) - math.floor((south + 90) / height) + 1
+        cols = math.floor((east + 180) / width) - math.floor((west + 180) / width) + 1
+        if rows * cols > max_cells:
+            continue
+        row0 = math.floor((south + 90) / height)
+        col0 = math.floor((west + 180) / width)
+        cells = set()
+        for row in range(rows):
+            lat = min((row0 + row + 0.5) * height - 90, 90.0)
+            for col in range(cols):
+                lng = min((col0 + col + 0.5) * width - 180, 180.0)
+                cells.add(geohash_encode(lat, lng, precision))
+        return sorted(cells)
+    return None
+
+
+# ── Zones ───────────────────────────────────────────────────────────────────
+
+def _floats(value, count, name):
+    try:
+        parts = [float(part) for part in value.split(',')]
+    except (TypeError, ValueError):
+        parts = []
+    if len(parts) != count:
+        raise ValidationError({name: f"{count} nombres séparés par des virgules attendus."})
+    return parts
+
+
+def parse_bbox(value):
+    west, south, east, north = _floats(value, 4, 'bbox')
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValidationError({'bbox': "Format attendu : ouest,sud,est,nord (degrés)."})
+    return west, south, east, north
+
+
+def radius_bbox(latitude, longitude, radius_m):
+    """Rectangle englobant un cercle (approximation locale, suffisante ici)."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = math.degrees(radius_m / (EARTH_RADIUS_M * max(math.cos(math.radians(latitude)), 1e-6)))
+    return (
+        max(longitude - dlng, -180.0), max(latitude - dlat, -90.0),
+        min(longitude + dlng, 180.0), min(latitude + dlat, 90.0),
+    )
+
+
+def parse_area(params):
+    """
+    Lit bbox / lat+lng+radius dans les query params.
+    Retourne (bbox, centre, rayon) ; (None, None, None) si aucun filtre.
+    """
+    if params.get('bbox'):
+        return parse_bbox(params['bbox']), None, None
+
+    lat, lng, radius = params.get('lat'), params.get('lng'), params.get('radius')
+    if radius is None:
+        return None, None, None
+    if lat is None or lng is None:
+        raise ValidationError({'radius': "Les paramètres lat et lng sont requis avec radius."})
+    try:
+        lat, lng, radius = float(lat), float(lng), float(radius)
+    except ValueError:
+        raise ValidationError({'radius': "lat, lng et radius doivent être numériques."})
+    if radius <= 0 or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValidationError({'radius': "Rayon ou coordonnées invalides."})
+    return radius_bbox(lat, lng, radius), (lat, lng), radius
+
+
+def haversine_expression(latitude, longitude, lat_field='latitude', lng_field='longitude'):
+    """Distance en mètres entre (latitude, longitude) et chaque ligne, en SQL."""
+    lat0 = Value(math.radians(latitude), output_field=FloatField())
+    lng0 = Value(math.radians(longitude), output_field=FloatField())
+    dlat = (Radians(F(lat_field)) - lat0) / 2
+    dlng = (Radians(F(lng_field)) - lng0) / 2
+    a = Power(Sin(dlat), 2) + math.cos(math.radians(latitude)) * Cos(Radians(F(lat_field))) * Power(Sin(dlng), 2)
+    return 2 * EARTH_RADIUS_M * ASin(Sqrt(a))
+
+
+_rtree_tables = {}
+
+
+def rtree_table(model):
+    """Nom de la table R*Tree du modèle si elle existe (SQLite uniquement)."""
+    if connection.vendor != 'sqlite':
+        return None
+    table = f'{model._meta.db_table}_rtree'
+    if table not in _rtree_tables:
+        _rtree_tables[table] = table in connection.introspection.table_names()
+    return table if _rtree_tables[table] else None
+
+
+def filter_bbox(queryset, bbox):
+    west, south, east, north = bbox
+    table = rtree_table(queryset.model)
+    if table is not None:
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT id FROM "{table}" '
+            'WHERE max_lat >= %s AND min_lat <= %s AND max_lng >= %s AND min_lng <= %s',
+            (south, north, west, east),
+        ))
+    else:
+        cells = geohash_cells(bbox)
+        if cells:
+            area = Q()
+            for cell in cells:
+                area |= Q(geohash__startswith=cell)
+            queryset = queryset.filter(area)
+
+    return queryset.filter(
+        latitude__gte=south, latitude__lte=north,
+        longitude__gte=west, longitude__lte=east,
+    )
+
+
+def filter_area(queryset, params):
+    bbox, center, radius = parse_area(params)
+    if bbox is None:
+        return queryset
+    queryset = filter_bbox(queryset, bbox)
+    if center is not None:
+        queryset = queryset.annotate(
+            distance_m=haversine_expression(*center)
+        ).filter(distance_m__lte=radius)
+    return queryset
+
+
+class GeoAreaFilter(BaseFilterBackend):
+    """Filtre DRF : ?bbox=... ou ?lat=&lng=&radius= (voir en-tête du module)."""
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_area(queryset, request.query_params)
+
+
+def refresh_geohash(queryset, batch_size=2000):
+    """Recalcule geohash des lignes du queryset, par paquets. Retourne le nombre de lignes."""
+    model = queryset.model
+    rows = queryset.order_by('pk').only('pk', 'latitude', 'longitude')
+    total, last_pk = 0, None
+    while True:
+        page = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        batch = list(page[:batch_size])
+        if not batch:
+            return total
+        for obj in batch:
+            obj.geohash = geohash_encode(obj.latitude, obj.longitude)
+        models.QuerySet(model, using=queryset.db).bulk_update(batch, ['geohash'])
+        total += len(batch)
+        last_pk = batch[-1].pk
+
+
+class GeohashQuerySet(models.QuerySet):
+    """
+    bulk_create(), bulk_update() et update() ne passent pas par save() :
+    geohash y est recalculé dès que latitude ou longitude sont écrites, pour
+    que les requêtes par cellules (hors SQLite) voient aussi ces lignes.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.geohash = geohash_encode(obj.latitude, obj.longitude)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if {'latitude', 'longitude'} & set(fields):
+            for obj in objs:
+                obj.geohash = geohash_encode(obj.latitude, obj.longitude)
+            fields = list(fields) + ['geohash']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if not {'latitude', 'longitude'} & kwargs.keys():
+            return super().update(**kwargs)
+        # Valeurs quelconques (expressions comprises) : relecture des lignes touchées
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            count = super().update(**kwargs)
+            refresh_geohash(self.model._base_manager.using(self.db).filter(pk__in=pks))
+        return count
+
+
+class GeohashMixin:
+    """
+    Maintient `geohash` à partir de latitude/longitude à chaque save(). Les
+    modèles déclarent aussi `objects = GeohashQuerySet.as_manager()` pour les
+    écritures en masse.
+    """
+
+    def save(self, *args, **kwargs):
+        self.geohash = geohash_encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+
+# ── Clustering ──────────────────────────────────────────────────────────────
+
+def parse_zoom(value):
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({'zoom': "Niveau de zoom entier attendu."})
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValidationError({'zoom': f"Le zoom doit être compris entre 0 et {MAX_ZOOM}."})
+    return zoom
+
+
+def zoom_precision(zoom):
+    """
+    Longueur de préfixe geohash pour un zoom : la plus fine dont la cellule
+    fait encore au moins ~64 px de large (un quart de tuile).
+    """
+    target = 360.0 / (2 ** zoom) / 4
+    precision = 1
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        if geohash_cell_size(candidate)[1] < target:
+            break
+        precision = candidate
+    return precision
+
+
+def cluster_queryset(queryset, bbox, precision, revenue=None):
+    """
+    Un dict par cellule : cell, count, latitude/longitude (centroïde),
+    revenue si une agrégation est fournie, et `id` si la cellule ne
+    contient qu'une ligne.
+    """
+    aggregates = {
+        'count': Count('pk'),
+        'first_id': Min('pk'),
+        'centroid_lat': Avg('latitude'),
+        'centroid_lng': Avg('longitude'),
+    }
+    if revenue is not None:
+        aggregates['revenue'] = revenue
+
+    rows = (
+        filter_bbox(queryset, bbox)
+        .exclude(geohash='')
+        .order_by()
+        .values(cell=Substr('geohash', 1, precision))
+        .annotate(**aggregates)
+        .order_by('cell')
+    )
+
+    clusters = []
+    for row in rows:
+        cluster = {
+            'cell': row['cell'],
+            'count': row['count'],
+            'latitude': row['centroid_lat'],
+            'longitude': row['centroid_lng'],
+        }
+        if revenue is not None:
+            cluster['revenue'] = float(row['revenue'] or 0)
+        if row['count'] == 1:
+            cluster['id'] = row['first_id']
+        clusters.append(cluster)
+    return clusters
+
+
+# ── Plus proches voisins ────────────────────────────────────────────────────
+
+def nearest(queryset, latitude, longitude, k, max_radius=NEAREST_MAX_RADIUS_M):
+    """
+    Les `k` lignes les plus proches de (latitude, longitude), annotées de
+    `distance_m`, dans la limite de `max_radius` mètres.
+
+    Chaque tour interroge l'index spatial sur le carré englobant un cercle
+    de rayon r : si k lignes sont à moins de r, aucune ligne hors du carré
+    ne peut être plus proche et le résultat est exact. Sinon r est
+    multiplié par NEAREST_GROWTH.
+    """
+    distance = haversine_expression(latitude, longitude)
+    radius = min(NEAREST_START_RADIUS_M, max_radius)
+    while True:
+        rows = list(
+            filter_bbox(queryset, radius_bbox(latitude, longitude, radius))
+            .annotate(distance_m=distance)
+            .filter(distance_m__lte=radius)
+            .order_by('distance_m', 'pk')[:k]
+        )
+        if len(rows) >= k or radius >= max_radius:
+            return rows
+        radius = min(radius * NEAREST_GROWTH, max_radius)
@@ -0,0 +1,121 @@
+# heatmap.py
+"""
+Tuiles de densité / chiffre d'affaires des ventes géolocalisées.
+
+Une tuile web (z/x/y, projection Web Mercator) est découpée en une grille
+`bins` x `bins`. Les coordonnées sont lues par paquets depuis la base puis
+cumulées avec numpy.histogram2d ; les bords des lignes suivent la projection
+Mercator pour que la grille se superpose exactement à la tuile affichée.
+
+Le résultat est mis en cache par (couche, métrique, tuile, période,
+périmètre) pendant settings.HEATMAP_CACHE_TTL secondes.
+"""
+import hashlib
+import math
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+
+from .geo import MAX_ZOOM, filter_bbox
+
+DEFAULT_BINS = 64
+MAX_BINS = 256
+CHUNK_SIZE = 20000
+METRICS = ('count', 'revenue')
+
+
+# ── Tuiles ──────────────────────────────────────────────────────────────────
+
+def _tile_latitude(y, n):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+
+def tile_bbox(z, x, y):
+    """(ouest, sud, est, nord) d'une tuile web."""
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    return west, _tile_latitude(y + 1, n), east, _tile_latitude(y, n)
+
+
+def parse_tile(z, x, y):
+    try:
+        z, x, y = int(z), int(x), int(y)
+    except (TypeError, ValueError):
+        raise ValidationError({'tile': "z, x et y entiers attendus."})
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValidationError({'tile': "Tuile hors limites."})
+    return z, x, y
+
+
+def tile_edges(z, x, y, bins):
+    """Bords des cellules : latitudes (sud → nord, pas Mercator) et longitudes."""
+    n = 2 ** z
+    west, _, east, _ = tile_bbox(z, x, y)
+    rows = y + 1 - np.arange(bins + 1) / bins
+    lat_edges = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * rows / n))))
+    lng_edges = np.linspace(west, east, bins + 1)
+    return lat_edges, lng_edges
+
+
+# ── Grille ──────────────────────────────────────────────────────────────────
+
+def histogram(queryset, lat_edges, lng_edges, amount_field=None):
+    """
+    Cumule les lignes du queryset dans la grille. `amount_field` pondère
+    chaque point (CA) ; sinon on compte les points.
+    """
+    fields = ['latitude', 'longitude']
+    if amount_field:
+        fields.append(amount_field)
+    rows = queryset.order_by().values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+    grid = np.zeros((len(lat_edges) - 1, len(lng_edges) - 1))
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            grid += _bin_chunk(chunk, lat_edges, lng_edges, amount_field)
+            chunk = []
+    if chunk:
+        grid += _bin_chunk(chunk, lat_edges, lng_edges, amount_field)
+    return grid
+
+
+def _bin_chunk(chunk, lat_edges, lng_edges, weighted):
+    data = np.array(chunk, dtype=float)
+    weights = data[:, 2] if weighted else None
+    counts, _, _ = np.histogram2d(data[:, 0], data[:, 1], bins=[lat_edges, lng_edges], weights=weights)
+    return counts
+
+
+def heatmap_tile(queryset, z, x, y, bins=DEFAULT_BINS, amount_field=None):
+    lat_edges, lng_edges = tile_edges(z, x, y, bins)
+    bbox = tile_bbox(z, x, y)
+    grid = histogram(filter_bbox(queryset, bbox), lat_edges, lng_edges, amount_field)
+    # Première ligne = nord, comme l'image de la tuile
+    grid = np.flipud(grid)
+    return {
+        'tile': {'z': z, 'x': x, 'y': y},
+        'bbox': list(bbox),
+        'bins': bins,
+        'grid': np.round(grid, 2).tolist(),
+        'max': float(grid.max()) if grid.size else 0.0,
+        'total': float(grid.sum()),
+    }
+
+
+def cache_key(layer, metric, tile, bins, start, end, scope):
+    scope_hash = hashlib.md5(','.join(map(str, sorted(scope))).encode()).hexdigest()[:12]
+    z, x, y = tile
+    return f'heatmap:{layer}:{metric}:{z}/{x}/{y}:{bins}:{start or ""}:{end or ""}:{scope_hash}'
+
+
+def cached_heatmap_tile(key, queryset, z, x, y, bins=DEFAULT_BINS, amount_field=None):
+    data = cache.get(key)
+    if data is None:
+        data = heatmap_tile(queryset, z, x, y, bins, amount_field)
+        cache.set(key, data, getattr(settings, 'HEATMAP_CACHE_TTL', 300))
+    return data
@@ -0,0 +1,114 @@
+# bench_json.py
+"""
+Benchmark du rendu / parsing JSON sur les gros payloads de l'API.
+
+    python manage.py bench_json --rows 5000 --repeat 5
+
+Compare le JSONRenderer standard de DRF avec api.renderers.FastJSONRenderer
+sur des payloads ayant la forme de /carte/, purchasedata/{id}/sales_details
+et purchasedata/sales_summary (Decimal, datetime, UUID). Si la base contient
+des Purchase, le payload réel de purchasedata est aussi mesuré.
+"""
+import io
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Purchase
+from api.renderers import FastJSONParser, FastJSONRenderer, orjson
+
+
+def _sale_row(i, now):
+    return {
+        'id': i,
+        'product': f'Produit {i % 50}',
+        'variant_id': i % 300,
+        'variant_name': f'Produit {i % 50} - 1L',
+        'format': '1L',
+        'price': Decimal('1250.00') + i % 7,
+        'quantity': i % 12 + 1,
+        'amount': Decimal('15000.00') + i % 100,
+        'date': now - timedelta(minutes=i),
+        'reference': uuid.UUID(int=i),
+    }
+
+
+def _carte_payload(rows, now):
+    customers = []
+    for i in range(rows):
+        customers.append({
+            'id': i,
+            'full_name': f'Client {i}',
+            'phone': f'07{i:08d}',
+            'zone': 'Yopougon',
+            'latitude': 5.33 + i * 1e-5,
+            'longitude': -4.06 - i * 1e-5,
+            'purchase_date': now - timedelta(hours=i),
+            'total_sales_amount': Decimal('45000.00') + i,
+            'total_quantity': i % 30,
+            'sales_details': [_sale_row(i * 3 + k, now) for k in range(3)],
+        })
+    return {'customers': customers, 'grand_total_sales': Decimal('123456789.50')}
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de sérialisation JSON (DRF standard vs orjson)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _bench(self, label, data, rows, repeat):
+        std_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        std_t, body = self._time(lambda: std_renderer.render(data), repeat)
+        fast_t, _ = self._time(lambda: fast_renderer.render(data), repeat)
+
+        std_parser, fast_parser = JSONParser(), FastJSONParser()
+        std_p, _ = self._time(lambda: std_parser.parse(io.BytesIO(body)), repeat)
+        fast_p, _ = self._time(lambda: fast_parser.parse(io.BytesIO(body)), repeat)
+
+        size_mb = len(body) / (1024 * 1024)
+        self.stdout.write(
+            f"{label:<28} {rows:>7} lignes {size_mb:7.2f} Mo | "
+            f"rendu {std_t * 1000:8.1f} ms → {fast_t * 1000:7.1f} ms (x{std_t / fast_t:4.1f}) | "
+            f"parse {std_p * 1000:8.1f} ms → {fast_p * 1000:7.1f} ms (x{std_p / fast_p:4.1f})"
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                "orjson n'est pas installé : FastJSONRenderer utilise le repli standard."
+            ))
+
+        now = timezone.now()
+        self._bench('/carte/', _carte_payload(rows, now), rows, repeat)
+        self._bench(
+            'sales_details',
+            {'sales': [_sale_row(i, now) for i in range(rows)]},
+            rows, repeat,
+        )
+
+        if Purchase.objects.exists():
+            # Payload réel : mêmes annotations que PurchaseViewSetData
+            from api.views import PurchaseViewSetData
+            from api.serializers_rapports import PurchaseSummarySerializer
+
+            queryset = PurchaseViewSetData().get_queryset()[:rows]
+            data = PurchaseSummarySerializer(queryset, many=True).data
+            self._bench('purchasedata (base)', data, len(data), repeat)
@@ -0,0 +1,151 @@
+# bench_serializers.py
+"""
+Coût CPU par ligne : ModelSerializer DRF vs ValuesSerializer (.values()).
+
+    python manage.py bench_serializers --rows 2000 --repeat 3
+
+Les données de test sont créées dans une transaction annulée à la fin :
+la base n'est pas modifiée. Pour chaque liste on vérifie aussi que le JSON
+produit est identique.
+"""
+import json
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.models import District, MobileVendor, PointOfSale, Purchase, Quartier, Ville
+from api.renderers import FastJSONRenderer
+from api.serializers import (
+    DistrictSerializer, DistrictValuesSerializer,
+    QuartierSerializer, QuartierValuesSerializer,
+    VilleSerializer, VilleValuesSerializer,
+)
+from api.serializers_rapports import PurchaseSummarySerializer, PurchaseSummaryValuesSerializer
+from api.serializerss import PointOfSaleListSerializer, PointOfSaleListValuesSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare le coût par ligne des serializers DRF et des serializers .values()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    # ── Données ───────────────────────────────────────────────────────────
+    def _seed(self, rows):
+        user = User.objects.create(username='__bench_serializers__')
+        district = District.objects.create(nom='__BENCH__')
+        villes = Ville.objects.bulk_create(
+            Ville(nom=f'Ville {i}', district=district) for i in range(max(rows // 20, 1))
+        )
+        Quartier.objects.bulk_create(
+            Quartier(nom=f'Quartier {i}', ville=villes[i % len(villes)]) for i in range(rows)
+        )
+        District.objects.bulk_create(District(nom=f'__BENCH__ {i}') for i in range(rows))
+        points = PointOfSale.objects.bulk_create(
+            PointOfSale(
+                user=user, name=f'PDV {i}', owner='Bench', address='Abidjan',
+                latitude=5.3 + i * 1e-5, longitude=-4.0 - i * 1e-5,
+                district='Abidjan', region='Lagunes', commune='Yopougon',
+                type='boutique', registration_date=date(2024, 1, 1),
+                turnover='1250.50', agent_name=f'Agent {i % 10}',
+            )
+            for i in range(rows)
+        )
+        vendor = MobileVendor.objects.create(
+            point_of_sale=points[0], first_name='Bench', last_name='Vendor', phone='__bench__'
+        )
+        Purchase.objects.bulk_create(
+            Purchase(
+                vendor=vendor, first_name=f'Client {i}', last_name='Bench', zone='Yopougon',
+                amount='1000.00', phone=f'__bench__{i}', latitude=5.3, longitude=-4.0,
+            )
+            for i in range(rows)
+        )
+        return user
+
+    # ── Mesure ────────────────────────────────────────────────────────────
+    def _best(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _bench(self, label, drf, fast, repeat):
+        drf_t, drf_data = self._best(drf, repeat)
+        fast_t, fast_data = self._best(fast, repeat)
+        rows = len(drf_data) or 1
+        renderer = FastJSONRenderer()
+        same = json.loads(renderer.render(drf_data)) == json.loads(renderer.render(fast_data))
+        self.stdout.write(
+            f"{label:<22} {rows:>6} lignes | DRF {drf_t / rows * 1e6:7.1f} µs/ligne"
+            f" → values {fast_t / rows * 1e6:6.1f} µs/ligne (x{drf_t / fast_t:4.1f})"
+            f" | JSON identique : {'oui' if same else 'NON'}"
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        try:
+            with transaction.atomic():
+                user = self._seed(rows)
+                request = Request(RequestFactory().get('/api/'))
+                context = {'request': request}
+
+                self._bench(
+                    'districts',
+                    lambda: DistrictSerializer(District.objects.all(), many=True).data,
+                    lambda: DistrictValuesSerializer(District.objects.all()).data,
+                    repeat,
+                )
+                self._bench(
+                    'villes',
+                    lambda: VilleSerializer(Ville.objects.all(), many=True).data,
+                    lambda: VilleValuesSerializer(Ville.objects.all()).data,
+                    repeat,
+                )
+                self._bench(
+                    'quartiers',
+                    lambda: QuartierSerializer(Quartier.objects.all(), many=True).data,
+                    lambda: QuartierValuesSerializer(Quartier.objects.all()).data,
+                    repeat,
+                )
+
+                purchases = Purchase.objects.annotate(
+                    total_sales_amount=Sum('purchases__total_amount', default=0),
+                    total_sales_quantity=Sum('purchases__quantity', default=0),
+                    sales_count=Count('purchases'),
+                    total_products=Count('purchases__product_variant', distinct=True),
+                    total_variants=Count('purchases__product_variant', distinct=False),
+                ).select_related('vendor')
+                self._bench(
+                    'purchasedata',
+                    lambda: PurchaseSummarySerializer(purchases.all(), many=True).data,
+                    lambda: PurchaseSummaryValuesSerializer(purchases.all()).data,
+                    repeat,
+                )
+
+                points = PointOfSale.objects.filter(user=user).annotate(
+                    photos_count_annotated=Count('photos', distinct=True)
+                )
+                self._bench(
+                    'points-vente',
+                    lambda: PointOfSaleListSerializer(points.all(), many=True, context=context).data,
+                    lambda: PointOfSaleListValuesSerializer(points.all(), context=context).data,
+                    repeat,
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
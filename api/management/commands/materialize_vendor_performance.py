@@ -0,0 +1,49 @@
+# materialize_vendor_performance.py
+"""
+Matérialise VendorPerformance pour tous les vendeurs (voir api/performance.py).
+
+    python manage.py materialize_vendor_performance              # mois en cours
+    python manage.py materialize_vendor_performance --month 2025-06
+    python manage.py materialize_vendor_performance --months 3   # mois en cours + 2 précédents
+
+Seule source des lignes lues par les vues (elles ne recalculent rien) : à
+planifier, par exemple toutes les 15 minutes pour le mois en cours, et une
+fois en début de mois avec --months 2 pour clôturer le mois écoulé :
+
+    */15 * * * *  python manage.py materialize_vendor_performance
+    30 0 1 * *    python manage.py materialize_vendor_performance --months 2
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.performance import current_month, materialize_month, previous_month
+
+
+class Command(BaseCommand):
+    help = 'Calcule les performances mensuelles des vendeurs en une passe groupée'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Mois à calculer (AAAA-MM), mois en cours par défaut')
+        parser.add_argument('--months', type=int, default=1,
+                            help='Nombre de mois à calculer en remontant depuis --month')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month attend le format AAAA-MM')
+        else:
+            month = current_month()
+        if options['months'] < 1:
+            raise CommandError('--months doit être supérieur ou égal à 1')
+
+        for _ in range(options['months']):
+            start = time.perf_counter()
+            count = materialize_month(month)
+            self.stdout.write(
+                f"{month:%Y-%m} : {count} vendeurs en {(time.perf_counter() - start) * 1000:.0f} ms"
+            )
+            month = previous_month(month)
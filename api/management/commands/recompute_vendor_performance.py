@@ -0,0 +1,34 @@
+# recompute_vendor_performance.py
+"""
+Recalcule MobileVendor.performance et average_daily_sales de tous les
+vendeurs (voir api/performance.py).
+
+    python manage.py recompute_vendor_performance            # 30 derniers jours
+    python manage.py recompute_vendor_performance --days 7
+
+Un agrégat groupé sur les ventes puis bulk_update par paquets : prévu pour
+tourner chaque nuit.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.performance import recompute_vendor_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcule la performance et le CA journalier moyen de tous les vendeurs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='Fenêtre glissante en jours (30 par défaut)')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days doit être supérieur ou égal à 1')
+
+        start = time.perf_counter()
+        count = recompute_vendor_stats(days=options['days'])
+        self.stdout.write(
+            f"{count} vendeurs mis à jour en {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
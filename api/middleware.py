@@ -0,0 +1,202 @@
+# middleware.py
+"""
+Compression gzip / brotli des réponses de l'API.
+
+Les payloads carte et analytics (/carte/, /pointsaleorders/, liste des
+points de vente avec URLs de photos) partent vers des téléphones en 3G :
+on les compresse au-delà d'un seuil de taille, y compris les réponses en
+streaming. Configuration dans settings.API_COMPRESSION :
+
+    API_COMPRESSION = {
+        'MIN_SIZE': 1024,          # octets, en dessous on n'y touche pas
+        'GZIP_LEVEL': 6,
+        'BROTLI_QUALITY': 5,       # utilisé si le module `brotli` est installé
+        'PATH_PREFIXES': ['/api/'],
+        'SKIP_CONTENT_TYPES': ['image/', 'video/', ...],
+    }
+
+Les médias (MEDIA_URL) et les contenus déjà compressés sont ignorés. Une vue
+peut refuser la compression avec le décorateur `no_compression` (exports de
+StatisticsViewSet).
+
+Chaque réponse compressée porte `X-Uncompressed-Length` et
+`X-Compression-Saved` (octets économisés) ; le logger `api.compression`
+trace la même information, y compris en fin de streaming.
+"""
+import gzip
+import logging
+import zlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+logger = logging.getLogger('api.compression')
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'PATH_PREFIXES': ['/api/'],
+    'SKIP_CONTENT_TYPES': [
+        'image/', 'video/', 'audio/',
+        'application/zip', 'application/gzip', 'application/x-gzip',
+        'application/x-7z-compressed', 'application/x-rar-compressed',
+        'application/vnd.openxmlformats',
+        'application/pdf',
+        'application/octet-stream',
+    ],
+}
+
+_accepts_br = _lazy_re_compile(r'\bbr\b')
+_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+
+
+def no_compression(view_func):
+    """
+    Désactive la compression pour une vue (fonction, méthode ou action DRF).
+
+        @action(detail=False, methods=['get'])
+        @no_compression
+        def export(self, request): ...
+    """
+    @wraps(view_func)
+    def wrapped(*args, **kwargs):
+        response = view_func(*args, **kwargs)
+        response.skip_compression = True
+        return response
+    return wrapped
+
+
+def _config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_COMPRESSION', {}))
+    return config
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = _config()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    # ── Éligibilité ───────────────────────────────────────────────────────
+    def _should_skip(self, request, response):
+        if getattr(response, 'skip_compression', False):
+            return True
+        if response.has_header('Content-Encoding'):
+            return True
+
+        path = request.path
+        if settings.MEDIA_URL and path.startswith(settings.MEDIA_URL):
+            return True
+        prefixes = self.config['PATH_PREFIXES']
+        if prefixes and not any(path.startswith(prefix) for prefix in prefixes):
+            return True
+
+        content_type = response.get('Content-Type', '').lower()
+        return any(content_type.startswith(ct) for ct in self.config['SKIP_CONTENT_TYPES'])
+
+    def _choose_encoding(self, request):
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and _accepts_br.search(accept):
+            return 'br'
+        if _accepts_gzip.search(accept):
+            return 'gzip'
+        return None
+
+    # ── Compression ───────────────────────────────────────────────────────
+    def _compress(self, encoding, content):
+        if encoding == 'br':
+            return brotli.compress(content, quality=self.config['BROTLI_QUALITY'])
+        return gzip.compress(content, compresslevel=self.config['GZIP_LEVEL'], mtime=0)
+
+    def _compressor(self, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.config['BROTLI_QUALITY'])
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(self.config['GZIP_LEVEL'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, compressor.flush
+
+    def _stream(self, encoding, chunks, path):
+        compress, finish = self._compressor(encoding)
+        original = compressed = 0
+        for chunk in chunks:
+            original += len(chunk)
+            data = compress(chunk)
+            if data:
+                compressed += len(data)
+                yield data
+        data = finish()
+        compressed += len(data)
+        yield data
+        logger.debug("%s %s (stream) : %d → %d octets, %d économisés",
+                     path, encoding, original, compressed, original - compressed)
+
+    async def _astream(self, encoding, chunks, path):
+        compress, finish = self._compressor(encoding)
+        original = compressed = 0
+        async for chunk in chunks:
+            original += len(chunk)
+            data = compress(chunk)
+            if data:
+                compressed += len(data)
+                yield data
+        data = finish()
+        compressed += len(data)
+        yield data
+        logger.debug("%s %s (stream) : %d → %d octets, %d économisés",
+                     path, encoding, original, compressed, original - compressed)
+
+    def process_response(self, request, response):
+        if self._should_skip(request, response):
+            return response
+
+        if not response.streaming and len(response.content) < self.config['MIN_SIZE']:
+            return response
+
+        # La réponse dépend de Accept-Encoding, même si on ne compresse pas
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = self._choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._astream(
+                    encoding, response.streaming_content, request.path
+                )
+            else:
+                response.streaming_content = self._stream(
+                    encoding, response.streaming_content, request.path
+                )
+            del response.headers['Content-Length']
+        else:
+            original = len(response.content)
+            compressed = self._compress(encoding, response.content)
+            if len(compressed) >= original:
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+            response.headers['X-Uncompressed-Length'] = str(original)
+            response.headers['X-Compression-Saved'] = str(original - len(compressed))
+            logger.debug("%s %s : %d → %d octets, %d économisés",
+                         request.path, encoding, original, len(compressed),
+                         original - len(compressed))
+
+        # Un ETag fort ne correspond plus au contenu compressé
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
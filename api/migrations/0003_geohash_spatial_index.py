@@ -0,0 +1,143 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:27
+
+from django.db import migrations, models
+
+GEO_MODELS = ['pointofsale', 'purchase', 'sale', 'salepos']
+BATCH_SIZE = 2000
+
+# Copie figée de api.geo.geohash_encode (précision 9) : la migration ne doit
+# pas dépendre du code de l'application, qui peut changer par la suite.
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    if latitude is None or longitude is None:
+        return ''
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def backfill_geohash(apps, schema_editor):
+    for model_name in GEO_MODELS:
+        model = apps.get_model('api', model_name)
+        queryset = model.objects.exclude(latitude=None).exclude(longitude=None).order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).only('pk', 'latitude', 'longitude')[:BATCH_SIZE])
+            if not batch:
+                break
+            for obj in batch:
+                obj.geohash = geohash_encode(obj.latitude, obj.longitude)
+            model.objects.bulk_update(batch, ['geohash'])
+            last_pk = batch[-1].pk
+
+
+# ── R*Tree SQLite (voir geo.rtree_table) ────────────────────────────────────
+
+def _rtree_tables(apps):
+    for model_name in GEO_MODELS:
+        table = apps.get_model('api', model_name)._meta.db_table
+        yield table, f'{table}_rtree'
+
+
+def create_rtree(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, rtree in _rtree_tables(apps):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{rtree}" '
+            'USING rtree(id, min_lat, max_lat, min_lng, max_lng)'
+        )
+        schema_editor.execute(
+            f'INSERT INTO "{rtree}" (id, min_lat, max_lat, min_lng, max_lng) '
+            f'SELECT id, latitude, latitude, longitude, longitude FROM "{table}" '
+            'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{rtree}_insert" AFTER INSERT ON "{table}" '
+            'WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL BEGIN '
+            f'INSERT INTO "{rtree}" (id, min_lat, max_lat, min_lng, max_lng) '
+            'VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude); END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{rtree}_update" '
+            f'AFTER UPDATE OF latitude, longitude ON "{table}" BEGIN '
+            f'DELETE FROM "{rtree}" WHERE id = OLD.id; '
+            f'INSERT INTO "{rtree}" (id, min_lat, max_lat, min_lng, max_lng) '
+            'SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude '
+            'WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL; END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{rtree}_delete" AFTER DELETE ON "{table}" BEGIN '
+            f'DELETE FROM "{rtree}" WHERE id = OLD.id; END'
+        )
+
+
+def drop_rtree(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, rtree in _rtree_tables(apps):
+        for suffix in ('insert', 'update', 'delete'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{rtree}_{suffix}"')
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{rtree}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_pointofsale_accessibilite_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointofsale',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='salepos',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        migrations.RunPython(create_rtree, drop_rtree),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:34
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_location(apps, schema_editor):
+    MobileVendor = apps.get_model('api', 'MobileVendor')
+    VendorActivity = apps.get_model('api', 'VendorActivity')
+
+    latest = (
+        VendorActivity.objects
+        .filter(vendor=OuterRef('pk'))
+        .exclude(location__isnull=True)
+        .order_by('-timestamp')
+        .values('pk')[:1]
+    )
+    activity_ids = dict(
+        MobileVendor.objects.annotate(activity_id=Subquery(latest))
+        .exclude(activity_id=None)
+        .values_list('pk', 'activity_id')
+    )
+    activities = VendorActivity.objects.in_bulk(activity_ids.values())
+
+    vendors = []
+    for vendor in MobileVendor.objects.filter(pk__in=activity_ids).only('pk'):
+        activity = activities[activity_ids[vendor.pk]]
+        if isinstance(activity.location, dict) and activity.location:
+            vendor.last_location = activity.location
+            vendor.last_location_at = activity.timestamp
+            vendors.append(vendor)
+    MobileVendor.objects.bulk_update(vendors, ['last_location', 'last_location_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_geohash_spatial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mobilevendor',
+            name='last_location',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mobilevendor',
+            name='last_location_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_location, migrations.RunPython.noop),
+    ]
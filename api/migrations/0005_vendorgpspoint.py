@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_mobilevendor_last_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorGPSPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('accuracy', models.FloatField(blank=True, null=True)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gps_points', to='api.mobilevendor')),
+            ],
+            options={
+                'verbose_name': 'Point GPS de vendeur',
+                'verbose_name_plural': 'Points GPS des vendeurs',
+                'ordering': ['timestamp'],
+                'unique_together': {('vendor', 'timestamp')},
+            },
+        ),
+    ]
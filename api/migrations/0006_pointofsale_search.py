@@ -0,0 +1,105 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:38
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+TABLE = 'api_pointofsale'
+FTS = 'api_pointofsale_fts'
+BATCH_SIZE = 2000
+
+# Copie figée de api.search au moment de la migration : le module peut
+# évoluer, le texte indexé par cette migration ne doit pas changer.
+SEARCH_FIELDS = ['name', 'owner', 'commune', 'quartier', 'address', 'marque_brander']
+
+_non_word = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(value):
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return _non_word.sub(' ', value.lower()).strip()
+
+
+def search_document(instance):
+    words = ' '.join(normalize(getattr(instance, field)) for field in SEARCH_FIELDS).split()
+    return f" {' '.join(words)} " if words else ''
+
+
+def backfill_search_text(apps, schema_editor):
+    PointOfSale = apps.get_model('api', 'PointOfSale')
+    queryset = PointOfSale.objects.order_by('pk').only('pk', *SEARCH_FIELDS)
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for point in batch:
+            point.search_text = search_document(point)
+        PointOfSale.objects.bulk_update(batch, ['search_text'])
+        last_pk = batch[-1].pk
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS api_pointofsale_search_trgm '
+            f'ON {TABLE} USING gin (search_text gin_trgm_ops)'
+        )
+        return
+    if vendor != 'sqlite':
+        return
+
+    columns = ', '.join(SEARCH_FIELDS)
+    new_values = ', '.join(f'NEW.{field}' for field in SEARCH_FIELDS)
+    old_values = ', '.join(f'OLD.{field}' for field in SEARCH_FIELDS)
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS}" USING fts5({columns}, '
+        f"content='{TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(f'''INSERT INTO "{FTS}"("{FTS}") VALUES ('rebuild')''')
+    schema_editor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS "{FTS}_insert" AFTER INSERT ON "{TABLE}" BEGIN '
+        f'INSERT INTO "{FTS}"(rowid, {columns}) VALUES (NEW.id, {new_values}); END'
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS "{FTS}_delete" AFTER DELETE ON "{TABLE}" BEGIN '
+        f'''INSERT INTO "{FTS}"("{FTS}", rowid, {columns}) VALUES ('delete', OLD.id, {old_values}); END'''
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS "{FTS}_update" AFTER UPDATE OF {columns} ON "{TABLE}" BEGIN '
+        f'''INSERT INTO "{FTS}"("{FTS}", rowid, {columns}) VALUES ('delete', OLD.id, {old_values}); '''
+        f'INSERT INTO "{FTS}"(rowid, {columns}) VALUES (NEW.id, {new_values}); END'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS api_pointofsale_search_trgm')
+    elif vendor == 'sqlite':
+        for suffix in ('insert', 'update', 'delete'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{FTS}_{suffix}"')
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{FTS}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_vendorgpspoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointofsale',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
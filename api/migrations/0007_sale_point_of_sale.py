@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-19 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 2000
+
+
+def backfill_point_of_sale(apps, schema_editor):
+    """
+    Recopie vendor.point_of_sale dans les ventes existantes, par tranches de
+    clés primaires : chaque tranche est un UPDATE dans sa propre transaction,
+    le verrou d'écriture est relâché entre deux tranches.
+    """
+    Sale = apps.get_model('api', 'Sale')
+    MobileVendor = apps.get_model('api', 'MobileVendor')
+    db_alias = schema_editor.connection.alias
+
+    point_of_sale = Subquery(
+        MobileVendor.objects.filter(pk=OuterRef('vendor_id')).values('point_of_sale_id')[:1]
+    )
+    pending = Sale.objects.using(db_alias).filter(point_of_sale__isnull=True).order_by()
+    last_pk = 0
+    while True:
+        pks = list(
+            pending.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            break
+        with transaction.atomic(using=db_alias):
+            Sale.objects.using(db_alias).filter(
+                pk__gte=pks[0], pk__lte=pks[-1], point_of_sale__isnull=True
+            ).update(point_of_sale=point_of_sale)
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    # Une transaction par tranche (voir backfill_point_of_sale)
+    atomic = False
+
+    dependencies = [
+        ('api', '0006_pointofsale_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='point_of_sale',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='api.pointofsale', verbose_name='Point de vente'),
+        ),
+        migrations.RunPython(backfill_point_of_sale, migrations.RunPython.noop),
+        # Index créé après le remplissage : une seule construction
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['point_of_sale', 'created_at'], name='sales_pos_created_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:12
+
+from django.db import migrations
+
+# Sur SQLite, l'AddField de 0006 (search_text) reconstruit api_pointofsale :
+# les triggers R*Tree posés par 0003 disparaissent avec l'ancienne table et
+# l'index spatial ne suit plus les créations ni les déplacements. Les triggers
+# sont recréés (IF NOT EXISTS : sans effet sur les tables intactes) et chaque
+# R*Tree est resynchronisé avec sa table.
+GEO_MODELS = ['pointofsale', 'purchase', 'sale', 'salepos']
+
+
+def _rtree_tables(apps):
+    for model_name in GEO_MODELS:
+        table = apps.get_model('api', model_name)._meta.db_table
+        yield table, f'{table}_rtree'
+
+
+def restore_rtree(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, rtree in _rtree_tables(apps):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{rtree}" '
+            'USING rtree(id, min_lat, max_lat, min_lng, max_lng)'
+        )
+        schema_editor.execute(f'DELETE FROM "{rtree}"')
+        schema_editor.execute(
+            f'INSERT INTO "{rtree}" (id, min_lat, max_lat, min_lng, max_lng) '
+            f'SELECT id, latitude, latitude, longitude, longitude FROM "{table}" '
+            'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{rtree}_insert" AFTER INSERT ON "{table}" '
+            'WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL BEGIN '
+            f'INSERT INTO "{rtree}" (id, min_lat, max_lat, min_lng, max_lng) '
+            'VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude); END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{rtree}_update" '
+            f'AFTER UPDATE OF latitude, longitude ON "{table}" BEGIN '
+            f'DELETE FROM "{rtree}" WHERE id = OLD.id; '
+            f'INSERT INTO "{rtree}" (id, min_lat, max_lat, min_lng, max_lng) '
+            'SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude '
+            'WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL; END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{rtree}_delete" AFTER DELETE ON "{table}" BEGIN '
+            f'DELETE FROM "{rtree}" WHERE id = OLD.id; END'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_sale_point_of_sale'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_rtree, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 import uuid
 from rest_framework.exceptions import ValidationError
+from .geo import GeohashMixin, GeohashQuerySet
+from .search import SEARCH_FIELDS, search_document
 
 class Category(models.Model):
     """
@@ -43,7 +45,7 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
-class PointOfSale(models.Model):
+class PointOfSale(GeohashMixin, models.Model):
 
     TYPE_CHOICES = [
         ('boutique', 'Boutique'),
@@ -83,10 +85,14 @@ class PointOfSale(models.Model):
     # ── Localisation ──────────────────────────────────────────────────────────
     latitude  = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    # Index spatial, recalculé à chaque save() (voir geo.py)
+    geohash   = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
     district  = models.CharField(max_length=100)
     region    = models.CharField(max_length=100)
     commune   = models.CharField(max_length=100)
     quartier  = models.CharField(max_length=100, blank=True, default='')
+    # Texte normalisé pour la recherche (voir search.py), recalculé au save()
+    search_text = models.TextField(blank=True, default='', editable=False)
 
     # ── Catégorisation ────────────────────────────────────────────────────────
     type      = models.CharField(max_length=50, choices=TYPE_CHOICES)
@@ -144,6 +150,8 @@ class PointOfSale(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = GeohashQuerySet.as_manager()
+
     class Meta:
         verbose_name          = "Point de vente"
         verbose_name_plural   = "Points de vente"
@@ -208,6 +216,10 @@ class PointOfSale(models.Model):
 
     def save(self, *args, **kwargs):
         self.compute_scores()
+        self.search_text = search_document(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(SEARCH_FIELDS) & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'search_text'}
         super().save(*args, **kwargs)
 
 
@@ -772,6 +784,9 @@ class MobileVendor(models.Model):
     # date_joined = models.DateField(default=timezone.now)
     date_joined = models.DateTimeField(default=timezone.now)  # Changed from DateField
     last_activity = models.DateTimeField(blank=True, null=True)
+    # Dernière position connue : copie de VendorActivity.location (voir signals.py)
+    last_location = models.JSONField(blank=True, null=True)
+    last_location_at = models.DateTimeField(blank=True, null=True, db_index=True)
     is_approved = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -792,6 +807,16 @@ class MobileVendor(models.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    @classmethod
+    def record_location(cls, vendor_id, location, timestamp):
+        """
+        Met à jour la dernière position connue si `timestamp` est plus récent.
+        Un seul UPDATE conditionnel : sans effet pour un point plus ancien.
+        """
+        return cls.objects.filter(pk=vendor_id).filter(
+            models.Q(last_location_at__isnull=True) | models.Q(last_location_at__lte=timestamp)
+        ).update(last_location=location, last_location_at=timestamp)
+
     def update_performance(self):
         """Méthode pour calculer et mettre à jour la performance du vendeur"""
         # Implémentez votre logique de calcul de performance ici
@@ -849,6 +874,7 @@ class MobileVendor(models.Model):
 
 # models.py
 from django.db import models, transaction
+from django.db.models import F
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
@@ -995,9 +1021,13 @@ class VendorActivity(models.Model):
             # Pour les autres cas (mise à jour ou autres types)
             super().save(*args, **kwargs)
 
+    @transaction.atomic
     def affecter_quantite_commande(self):
         """
-        Affecte la quantité assignée aux articles de la commande
+        Affecte la quantité assignée aux articles de la commande.
+        Les articles sont verrouillés et lus une fois, la répartition est
+        calculée en mémoire puis écrite en un bulk_update sur quantity_affecte
+        (la quantité commandée ne change pas : pas d'effet sur le stock).
         """
         if not self.related_order:
             print("❌ Aucune commande liée")
@@ -1005,15 +1035,21 @@ class VendorActivity(models.Model):
             
         print(f"🔧 Début affectation - Quantité à affecter: {self.quantity_assignes}")
         
-        order_items = self.related_order.items.all()
-        if not order_items.exists():
+        order_items = list(
+            self.related_order.items
+            .select_for_update()
+            .order_by('pk')
+            .only('pk', 'order', 'quantity', 'quantity_affecte')
+        )
+        if not order_items:
             print("❌ Aucun article dans la commande")
             raise ValidationError("La commande liée ne contient aucun article")
             
         quantite_restante_apres_affectation = self.quantity_assignes
         total_affecte = 0
+        articles_affectes = []
         
-        print(f"📦 Nombre d'articles dans la commande: {order_items.count()}")
+        print(f"📦 Nombre d'articles dans la commande: {len(order_items)}")
         
         for item in order_items:
             if quantite_restante_apres_affectation <= 0:
@@ -1026,17 +1062,11 @@ class VendorActivity(models.Model):
             if quantite_restante_item > 0:
                 quantite_a_affecter = min(quantite_restante_apres_affectation, quantite_restante_item)
                 
-                print(f"   ➕ Article {item.id}: affectation de {quantite_a_affecter} unités")
-                
-                try:
-                    # Affecter la quantité à l'article
-                    item.affecter_quantite(quantite_a_affecter)
-                    quantite_restante_apres_affectation -= quantite_a_affecter
-                    total_affecte += quantite_a_affecter
-                    print(f"   ✅ Affecté: {quantite_a_affecter}, Reste à affecter: {quantite_restante_apres_affectation}")
-                except ValidationError as e:
-                    print(f"   ❌ Erreur d'affectation pour l'article {item.id}: {e}")
-                    continue
+                item.quantity_affecte += quantite_a_affecter
+                articles_affectes.append(item)
+                quantite_restante_apres_affectation -= quantite_a_affecter
+                total_affecte += quantite_a_affecter
+                print(f"   ✅ Article {item.id}: affecté {quantite_a_affecter}, Reste à affecter: {quantite_restante_apres_affectation}")
             else:
                 print(f"   ⏭️ Article {item.id}: déjà complètement affecté, passage au suivant")
         
@@ -1052,6 +1082,8 @@ class VendorActivity(models.Model):
             print(f"❌ {error_msg}")
             raise ValidationError(error_msg)
         
+        OrderItem.objects.bulk_update(articles_affectes, ['quantity_affecte'])
+        
         # Mettre à jour la quantité restante
         self.quantity_restante = quantite_restante_apres_affectation
         print(f"🔧 Affectation terminée avec SUCCÈS:")
@@ -1070,88 +1102,49 @@ class VendorActivity(models.Model):
         """Vérifie si la quantité demandée peut être vendue"""
         return quantite_demandee <= self.quantity_restante
     
-    @transaction.atomic
     def vendre_avec_verrouillage(self, quantite):
         """
-        Effectue une vente avec verrouillage atomique
-        Cette méthode garantit la cohérence des données lors des ventes simultanées
+        Effectue une vente en un seul UPDATE conditionnel :
+        quantity_sales += n, quantity_restante = assignées - vendues - n,
+        seulement si assignées - vendues >= n. Le stock disponible est
+        recalculé dans la même instruction (correction de quantity_restante
+        incluse) ; le verrou de ligne ne dure que le temps de la transaction
+        de l'appelant (Sale.save y insère la vente).
         """
         if quantite <= 0:
             raise ValidationError("La quantité de vente doit être positive")
-        
-        # Verrouiller l'instance en base pour éviter les conditions de concurrence
-        locked_activity = VendorActivity.objects.select_for_update().get(id=self.id)
-        
-        print(f"🔒 Verrouillage activité {locked_activity.id}")
-        print(f"   Quantité demandée: {quantite}")
-        print(f"   Quantité restante actuelle: {locked_activity.quantity_restante}")
-        print(f"   Quantité assignée: {locked_activity.quantity_assignes}")
-        print(f"   Quantité déjà vendue: {locked_activity.quantity_sales}")
-        
-        # CORRECTION CRITIQUE : Vérification et correction systématique
-        quantite_calculee_restante = locked_activity.quantity_assignes - locked_activity.quantity_sales
-        
-        # Si incohérence détectée, corriger IMMÉDIATEMENT et SAUVEGARDER
-        if quantite_calculee_restante != locked_activity.quantity_restante:
-            print(f"⚠️ Incohérence détectée: restante={locked_activity.quantity_restante}, calculée={quantite_calculee_restante}")
-            
-            # Appliquer la correction
-            ancienne_valeur = locked_activity.quantity_restante
-            locked_activity.quantity_restante = max(0, quantite_calculee_restante)
-            
-            print(f"🔧 Correction appliquée: {ancienne_valeur} → {locked_activity.quantity_restante}")
-            
-            # CORRECTION : SAUVEGARDER LA CORRECTION avant de continuer
-            locked_activity.save(update_fields=['quantity_restante'])
-            print(f"💾 Correction sauvegardée en base")
-            
-            # Vérification de sécurité après correction
-            if locked_activity.quantity_restante < 0:
-                raise ValidationError(f"Quantité restante devenue négative après correction: {locked_activity.quantity_restante}")
-        
-        # VÉRIFICATION FINALE AVANT VENTE
-        if quantite > locked_activity.quantity_restante:
-            raise ValidationError(
-                f"Stock insuffisant. Demande: {quantite}, Disponible: {locked_activity.quantity_restante}"
+
+        disponible = F('quantity_assignes') - F('quantity_sales')
+        # quantity_restante d'abord : calculée sur l'ancienne valeur des ventes
+        vendu = (
+            VendorActivity.objects
+            .filter(pk=self.pk, quantity_assignes__gte=F('quantity_sales') + quantite)
+            .update(
+                quantity_restante=disponible - quantite,
+                quantity_sales=F('quantity_sales') + quantite,
             )
-        
-        if locked_activity.quantity_restante == 0:
-            raise ValidationError("Stock épuisé, impossible de vendre")
-        
-        # Mise à jour atomique
-        locked_activity.quantity_sales += quantite
-        locked_activity.quantity_restante -= quantite
-        
-        # Validation rigoureuse des nouvelles valeurs
-        if locked_activity.quantity_restante < 0:
-            raise ValidationError(f"Quantité restante négative après vente: {locked_activity.quantity_restante}")
-        
-        if locked_activity.quantity_sales > locked_activity.quantity_assignes:
-            raise ValidationError(
-                f"Ventes ({locked_activity.quantity_sales}) > assignées ({locked_activity.quantity_assignes})"
+        )
+
+        if not vendu:
+            # Refus : relecture seulement pour le message d'erreur
+            restante = (
+                VendorActivity.objects
+                .filter(pk=self.pk)
+                .annotate(disponible=disponible)
+                .values_list('disponible', flat=True)
+                .first()
             )
-        
-        # Vérification de cohérence finale
-        if locked_activity.quantity_sales + locked_activity.quantity_restante != locked_activity.quantity_assignes:
+            if restante is None:
+                raise ValidationError("Activité de vendeur introuvable")
+            if restante <= 0:
+                raise ValidationError("Stock épuisé, impossible de vendre")
             raise ValidationError(
-                f"Incohérence après vente: {locked_activity.quantity_sales} + {locked_activity.quantity_restante} != {locked_activity.quantity_assignes}"
+                f"Stock insuffisant. Demande: {quantite}, Disponible: {restante}"
             )
-        
-        # CORRECTION: Sauvegarde avec validation complète
-        locked_activity.save()
-        
-        print(f"✅ Vente effectuée avec succès:")
-        print(f"   Quantité vendue: {quantite}")
-        print(f"   Nouvelles ventes totales: {locked_activity.quantity_sales}")
-        print(f"   Nouvelle quantité restante: {locked_activity.quantity_restante}")
-        print(f"   Vérification: {locked_activity.quantity_sales} + {locked_activity.quantity_restante} = {locked_activity.quantity_assignes}")
-        print(f"🔓 Déverrouillage activité {locked_activity.id}")
-        
-        # Mettre à jour l'instance actuelle avec les nouvelles valeurs
-        self.quantity_sales = locked_activity.quantity_sales
-        self.quantity_restante = locked_activity.quantity_restante
-        
-        return locked_activity
+
+        # Relecture : l'instance peut dater d'avant d'autres ventes concurrentes
+        self.refresh_from_db(fields=['quantity_assignes', 'quantity_sales', 'quantity_restante'])
+        return self
     
     def incrementer_ventes(self, quantite):
         """
@@ -1313,7 +1306,33 @@ class VendorPerformance(models.Model):
         # Implémentez votre logique de calcul ici
         pass
 
-class Purchase(models.Model):
+
+class VendorGPSPoint(models.Model):
+    """
+    Point GPS d'un vendeur ambulant. Journal en ajout seul, un point par
+    (vendeur, horodatage) ; sert au calcul de distance_covered (trails.py).
+    """
+    vendor = models.ForeignKey(
+        MobileVendor,
+        on_delete=models.CASCADE,
+        related_name='gps_points'
+    )
+    timestamp = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    accuracy = models.FloatField(blank=True, null=True)  # En mètres
+
+    class Meta:
+        verbose_name = "Point GPS de vendeur"
+        verbose_name_plural = "Points GPS des vendeurs"
+        # L'index unique (vendor, timestamp) sert aussi aux lectures par jour
+        unique_together = ['vendor', 'timestamp']
+        ordering = ['timestamp']
+
+    def __str__(self):
+        return f"{self.vendor_id} @ {self.timestamp:%Y-%m-%d %H:%M:%S} ({self.latitude}, {self.longitude})"
+
+class Purchase(GeohashMixin, models.Model):
     """
     Modèle pour représenter les achats effectués par les vendeurs ambulants
     """
@@ -1337,8 +1356,11 @@ class Purchase(models.Model):
     pushcard_type = models.CharField(max_length=100, blank=True, verbose_name="Type de pushcard")
     latitude = models.FloatField(blank=True, null=True, verbose_name="Latitude")
     longitude = models.FloatField(blank=True, null=True, verbose_name="Longitude")
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
     phone = models.CharField(max_length=100, blank=True, verbose_name="Type de pushcard",unique=True)
 
+    objects = GeohashQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Achat"
         verbose_name_plural = "Achats"
@@ -1352,23 +1374,14 @@ class Purchase(models.Model):
         return f"{self.first_name} {self.last_name}"
 
     def update_performance(self):
-        """Méthode pour calculer et mettre à jour la performance du vendeur"""
-        purchases = self.purchases.all()
-        total_sales = sum(purchase.amount for purchase in purchases)
-        purchase_count = purchases.count()
-
-        # Exemple de calcul : performance basée sur le montant total vendu
-        if purchase_count > 0:
-            self.performance = (total_sales / purchase_count) * 100
-        else:
-            self.performance = 0.0
-
-        days_active = (timezone.now().date() - self.date_joined).days or 1
-        self.average_daily_sales = total_sales / days_active
-
-        self.save()
+        """
+        Met à jour la performance du vendeur de cet achat (Purchase n'a pas
+        de champ de performance propre, voir performance.py)
+        """
+        from .performance import recompute_vendor_stats
+        recompute_vendor_stats(vendor_ids=[self.vendor_id])
 
-class Sale(models.Model):
+class Sale(GeohashMixin, models.Model):
     """
     Modèle pour enregistrer les ventes
     """
@@ -1386,6 +1399,7 @@ class Sale(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     latitude = models.FloatField(blank=True, null=True, verbose_name="Latitude")
     longitude = models.FloatField(blank=True, null=True, verbose_name="Longitude")
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     vendor = models.ForeignKey(
@@ -1398,10 +1412,27 @@ class Sale(models.Model):
         on_delete=models.CASCADE,
         related_name='sales'
     )
+    # Copie de vendor.point_of_sale à la création : les statistiques par
+    # point de vente filtrent sur cette colonne sans joindre le vendeur
+    point_of_sale = models.ForeignKey(
+        'PointOfSale',
+        on_delete=models.CASCADE,
+        related_name='sales',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,
+        verbose_name="Point de vente"
+    )
     
+    objects = GeohashQuerySet.as_manager()
+
     class Meta:
         db_table = 'sales'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['point_of_sale', 'created_at'], name='sales_pos_created_idx'),
+        ]
     
     def clean(self):
         """Validation avant sauvegarde"""
@@ -1420,26 +1451,30 @@ class Sale(models.Model):
         # Validation
         self.clean()
         
-        # Si c'est une nouvelle vente
-        if self._state.adding:
-            print(f"💰 Création nouvelle vente: {self.quantity} unités")
-            
-            # Utiliser la méthode atomique pour effectuer la vente
-            try:
-                self.vendor_activity.vendre_avec_verrouillage(self.quantity)
-                print(f"✅ Stock mis à jour avec succès")
-            except ValidationError as e:
-                print(f"❌ Erreur lors de la vente: {e}")
-                raise e
+        if self._state.adding and self.point_of_sale_id is None:
+            self.point_of_sale_id = self.vendor.point_of_sale_id
         
-        # Sauvegarder la vente
-        super().save(*args, **kwargs)
+        # Décrément du stock et insertion dans la même transaction courte
+        with transaction.atomic():
+            # Si c'est une nouvelle vente
+            if self._state.adding:
+                print(f"💰 Création nouvelle vente: {self.quantity} unités")
+                
+                try:
+                    self.vendor_activity.vendre_avec_verrouillage(self.quantity)
+                    print(f"✅ Stock mis à jour avec succès")
+                except ValidationError as e:
+                    print(f"❌ Erreur lors de la vente: {e}")
+                    raise e
+            
+            # Sauvegarder la vente
+            super().save(*args, **kwargs)
         print(f"💾 Vente sauvegardée: ID={self.id}")
     
     def __str__(self):
         return f"Vente {self.quantity} unités - {self.vendor_activity.vendor.full_name}"
     
-class SalePOS(models.Model):
+class SalePOS(GeohashMixin, models.Model):
     """
     Modèle pour enregistrer les ventes
     """
@@ -1457,6 +1492,7 @@ class SalePOS(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     latitude = models.FloatField(blank=True, null=True, verbose_name="Latitude")
     longitude = models.FloatField(blank=True, null=True, verbose_name="Longitude")
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     vendor = models.ForeignKey(
@@ -1470,6 +1506,8 @@ class SalePOS(models.Model):
         related_name='salespos'
     )
     
+    objects = GeohashQuerySet.as_manager()
+
     class Meta:
         db_table = 'salespos'
         ordering = ['-created_at']
@@ -1491,20 +1529,21 @@ class SalePOS(models.Model):
         # Validation
         self.clean()
         
-        # Si c'est une nouvelle vente
-        if self._state.adding:
-            print(f"💰 Création nouvelle vente: {self.quantity} unités")
+        # Décrément du stock et insertion dans la même transaction courte
+        with transaction.atomic():
+            # Si c'est une nouvelle vente
+            if self._state.adding:
+                print(f"💰 Création nouvelle vente: {self.quantity} unités")
+                
+                try:
+                    self.vendor_activity.vendre_avec_verrouillage(self.quantity)
+                    print(f"✅ Stock mis à jour avec succès")
+                except ValidationError as e:
+                    print(f"❌ Erreur lors de la vente: {e}")
+                    raise e
             
-            # Utiliser la méthode atomique pour effectuer la vente
-            try:
-                self.vendor_activity.vendre_avec_verrouillage(self.quantity)
-                print(f"✅ Stock mis à jour avec succès")
-            except ValidationError as e:
-                print(f"❌ Erreur lors de la vente: {e}")
-                raise e
-        
-        # Sauvegarder la vente
-        super().save(*args, **kwargs)
+            # Sauvegarder la vente
+            super().save(*args, **kwargs)
         print(f"💾 Vente sauvegardée: ID={self.id}")
     
     def __str__(self):
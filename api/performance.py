@@ -0,0 +1,169 @@
+# performance.py
+"""
+Performances mensuelles des vendeurs (VendorPerformance).
+
+`materialize_month` calcule un mois pour tous les vendeurs en une passe
+groupée sur les ventes (total, nombre de ventes) et une sur les activités
+(jours travaillés), puis écrit toutes les lignes en un upsert
+(`bulk_create(update_conflicts=True)` sur vendor + month). Le total du
+marché est la somme des totaux par vendeur : il n'est plus recalculé pour
+chaque vendeur.
+
+performance_score = part du vendeur dans les ventes du mois (en %), comme
+MobileVendor.calculate_performance. distance_covered (trails.py),
+bonus_earned et notes ne sont pas touchés.
+
+Lancé uniquement par la commande `materialize_vendor_performance`, à
+planifier (cron, voir la commande) : les vues ne font que lire les lignes
+matérialisées, un GET n'écrit jamais. Un mois pas encore calculé se lit
+comme un mois sans activité.
+
+`recompute_vendor_stats` met à jour MobileVendor.performance et
+average_daily_sales de tous les vendeurs sur une fenêtre glissante : un
+agrégat groupé, puis `bulk_update` par paquets (commande
+`recompute_vendor_performance`, action vendors/recompute_performance).
+"""
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import MobileVendor, Sale, VendorActivity, VendorPerformance
+from .timeseries import day_bounds, local_date, truncate
+
+BATCH_SIZE = 1000
+
+# Activités qui comptent comme un jour travaillé
+WORKED_ACTIVITIES = ['check_in', 'sale']
+
+MATERIALIZED_FIELDS = [
+    'total_sales', 'orders_completed', 'days_worked', 'performance_score', 'updated_at',
+]
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def previous_month(month):
+    return (month - datetime.timedelta(days=1)).replace(day=1)
+
+
+def current_month(now=None):
+    return month_start(local_date(now or timezone.now()))
+
+
+def month_range(month):
+    """[1er du mois 00:00, 1er du mois suivant 00:00[ dans le fuseau métier."""
+    return day_bounds(month, next_month(month) - datetime.timedelta(days=1))
+
+
+def compute_month(month, vendor_ids=None):
+    """{vendor_id: {champ: valeur}} pour le mois, vendeurs sans vente compris."""
+    lower, upper = month_range(month)
+
+    vendors = MobileVendor.objects.order_by()
+    sales = Sale.objects.filter(created_at__gte=lower, created_at__lt=upper).order_by()
+    activities = VendorActivity.objects.filter(
+        timestamp__gte=lower, timestamp__lt=upper, activity_type__in=WORKED_ACTIVITIES
+    ).order_by()
+    if vendor_ids is not None:
+        vendors = vendors.filter(pk__in=vendor_ids)
+        activities = activities.filter(vendor_id__in=vendor_ids)
+
+    # Le total du marché porte sur tous les vendeurs, même pour un sous-ensemble
+    totals = {
+        row['vendor_id']: row
+        for row in sales.values('vendor_id').annotate(
+            total=Sum('total_amount'), count=Count('id')
+        )
+    }
+    market = sum((row['total'] or 0) for row in totals.values())
+
+    days = dict(
+        activities
+        .values('vendor_id')
+        .annotate(days=Count(truncate('timestamp', 'day'), distinct=True))
+        .values_list('vendor_id', 'days')
+    )
+
+    results = {}
+    for vendor_id in vendors.values_list('pk', flat=True):
+        row = totals.get(vendor_id, {})
+        total = row.get('total') or 0
+        results[vendor_id] = {
+            'total_sales': total,
+            'orders_completed': row.get('count', 0),
+            'days_worked': days.get(vendor_id, 0),
+            'performance_score': round(float(total / market * 100), 2) if market else 0.0,
+        }
+    return results
+
+
+@transaction.atomic
+def materialize_month(month, vendor_ids=None):
+    """Calcule et enregistre VendorPerformance du mois. Retourne le nombre de lignes."""
+    month = month_start(month)
+    rows = [
+        VendorPerformance(vendor_id=vendor_id, month=month, **values)
+        for vendor_id, values in compute_month(month, vendor_ids).items()
+    ]
+    VendorPerformance.objects.bulk_create(
+        rows,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['vendor', 'month'],
+        update_fields=MATERIALIZED_FIELDS,
+    )
+    return len(rows)
+
+
+# ── MobileVendor.performance / average_daily_sales ─────────────────────────
+
+def recompute_vendor_stats(days=30, start=None, end=None, vendor_ids=None):
+    """
+    Part de marché (%) et CA journalier moyen de chaque vendeur sur
+    [start, end] (par défaut les `days` derniers jours), comme
+    MobileVendor.calculate_performance. Le total du marché porte toujours
+    sur tous les vendeurs ; `vendor_ids` limite seulement les lignes écrites.
+    Retourne le nombre de vendeurs mis à jour.
+    """
+    end = end or timezone.now()
+    start = start or end - datetime.timedelta(days=days)
+    days = max((end - start).total_seconds() / 86400, 1)
+
+    totals = dict(
+        Sale.objects
+        .filter(created_at__gte=start, created_at__lte=end)
+        .order_by()
+        .values('vendor_id')
+        .annotate(total=Sum('total_amount'))
+        .values_list('vendor_id', 'total')
+    )
+    market = sum(total or 0 for total in totals.values())
+
+    vendors = MobileVendor.objects.order_by('pk')
+    if vendor_ids is not None:
+        vendors = vendors.filter(pk__in=vendor_ids)
+
+    cent = Decimal('0.01')
+    updates = []
+    for vendor_id in vendors.values_list('pk', flat=True):
+        total = totals.get(vendor_id) or Decimal(0)
+        updates.append(MobileVendor(
+            pk=vendor_id,
+            performance=round(float(total / market * 100), 2) if market else 0.0,
+            average_daily_sales=(total / Decimal(days)).quantize(cent, rounding=ROUND_HALF_UP),
+        ))
+
+    with transaction.atomic():
+        MobileVendor.objects.bulk_update(
+            updates, ['performance', 'average_daily_sales'], batch_size=BATCH_SIZE
+        )
+    return len(updates)
@@ -0,0 +1,100 @@
+# renderers.py
+"""
+Renderer / parser JSON rapides pour DRF.
+
+Si `orjson` est installé, il est utilisé pour sérialiser et parser les
+payloads (Decimal, datetime, UUID, numpy gérés nativement ou via `_default`).
+Sinon on retombe sur le JSONRenderer / JSONParser standards de DRF : le
+contrat JSON reste le même dans les deux cas (Decimal → float comme l'encodeur
+DRF, datetime UTC suffixé par "Z").
+"""
+import datetime
+import decimal
+import uuid
+
+from django.conf import settings
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+ORJSON_OPTIONS = 0
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        orjson.OPT_UTC_Z
+        | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+def _default(obj):
+    """Types que orjson ne gère pas seul (alignés sur l'encodeur de DRF)."""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        # Scalaires / tableaux numpy ou pandas
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        cls = list if isinstance(obj, (list, tuple)) else dict
+        try:
+            return cls(obj)
+        except Exception:
+            pass
+    if hasattr(obj, '__iter__'):
+        # QuerySet, générateurs, sets...
+        return tuple(item for item in obj)
+    raise TypeError(f"Type {type(obj).__name__} non sérialisable en JSON")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer basé sur orjson quand il est disponible.
+
+    Les rendus indentés (API navigable, ?indent=) passent par le renderer
+    standard pour garder la même mise en forme.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser basé sur orjson quand il est disponible."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            raw = stream.read() if stream is not None else b''
+            if encoding.lower().replace('-', '') != 'utf8':
+                raw = raw.decode(encoding).encode('utf-8')
+            return orjson.loads(raw)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
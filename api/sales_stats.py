@@ -0,0 +1,198 @@
+# sales_stats.py
+"""
+Statistiques des ventes d'un vendeur, communes à Sale et SalePOS
+(SaleViewSet / SaleViewSetPOS, écran d'accueil de l'application vendeur).
+
+Le modèle de faits (Sale ou SalePOS) est un paramètre : les deux tables ont
+les mêmes colonnes (vendor, customer, product_variant, quantity,
+total_amount, created_at).
+
+`build_summary` : tous les scalaires des ventes en un seul aggregate(), les
+totaux d'activité en un second, puis une requête groupée par ventilation
+(produits, zones).
+
+`build_performance` : performances mensuelles du vendeur et part de marché,
+en une requête groupée par mois (sommes conditionnelles vendeur / total).
+"""
+from django.db.models import Count, DecimalField, IntegerField, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import VendorActivity
+from .timeseries import truncate
+
+TOP_PRODUCTS = 5
+TOP_ZONES = 3
+
+
+def _sum(field, output_field):
+    return Coalesce(Sum(field), 0, output_field=output_field)
+
+
+def sales_totals(queryset):
+    """Nombre de ventes, CA, quantité et clients distincts : une requête."""
+    return queryset.order_by().aggregate(
+        total_sales=Count('id'),
+        total_revenue=_sum('total_amount', DecimalField(max_digits=15, decimal_places=2)),
+        total_quantity=_sum('quantity', IntegerField()),
+        unique_customers=Count('customer', distinct=True),
+    )
+
+
+def top_products(queryset, limit=TOP_PRODUCTS):
+    return list(
+        queryset
+        .order_by()
+        .values('product_variant__product__name')
+        .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('total_amount'))
+        .order_by('-total_quantity')[:limit]
+    )
+
+
+def zones_breakdown(purchases, limit=TOP_ZONES):
+    """
+    (nombre d'achats, zones les plus actives) en une requête groupée : le
+    nombre de zones d'un vendeur reste petit, le total se fait en Python.
+    """
+    zones = list(
+        purchases
+        .order_by()
+        .values('zone')
+        .annotate(count=Count('id'), revenue=Sum('amount'))
+        .order_by('-count', 'zone')
+    )
+    return sum(zone['count'] for zone in zones), zones[:limit]
+
+
+def build_summary(fact_model, vendor, activities, purchases, zones=False):
+    """
+    Résumé des ventes de `vendor` dans `fact_model` (Sale ou SalePOS).
+
+    `activities` : VendorActivity déjà filtrées (date) ; `purchases` : queryset
+    compté dans purchase_count ; `zones` : ventilation par zone (Purchase).
+    """
+    sales = fact_model.objects.filter(vendor=vendor)
+    totals = sales_totals(sales)
+    activity = activities.order_by().aggregate(
+        total_quantity=Sum('quantity_assignes'),
+        total_quantite_restant=Sum('quantity_restante'),
+    )
+
+    if zones:
+        purchase_count, top_zones = zones_breakdown(purchases)
+    else:
+        purchase_count, top_zones = purchases.count(), None
+
+    total_sales = totals['total_sales']
+    total_revenue = totals['total_revenue']
+    total_quantity = totals['total_quantity']
+    data = {
+        'vendor_id': vendor.id,
+        'vendor_name': vendor.full_name,
+        'total_sales': total_sales,
+        'total_revenue': float(total_revenue),
+        'total_quantity': total_quantity,
+        'total_quantity_assigne': activity['total_quantity'] or 0,
+        'total_quantite_restant': activity['total_quantite_restant'] or 0,
+        'unique_customers': totals['unique_customers'],
+        'average_sale_amount': float(total_revenue / total_sales) if total_sales > 0 else 0,
+        'top_products': top_products(sales),
+        'purchase_count': purchase_count,
+        # Mêmes ventes que ci-dessus : champs gardés pour l'application
+        'sales_count': total_sales,
+        'total_amounts': float(total_revenue),
+        'total_quantitys': total_quantity,
+    }
+    if top_zones is not None:
+        data['top_zones'] = top_zones
+    return data
+
+
+def vendor_activities(vendor, target_date=None):
+    activities = VendorActivity.objects.filter(vendor=vendor)
+    if target_date is not None:
+        activities = activities.filter(created_at__date=target_date)
+    return activities
+
+
+# ── Performances mensuelles ─────────────────────────────────────────────────
+
+def monthly_totals(fact_model, vendor, start_date, end_date):
+    """
+    Une ligne par mois de la période : chiffres du vendeur et CA de tous les
+    vendeurs (part de marché), en une requête groupée à sommes conditionnelles.
+    """
+    mine = Q(vendor=vendor)
+    return (
+        fact_model.objects
+        .filter(created_at__date__gte=start_date, created_at__date__lte=end_date)
+        .annotate(period=truncate('created_at', 'month'))
+        .order_by()
+        .values('period')
+        .annotate(
+            total_customers=Count('customer', distinct=True, filter=mine),
+            total_revenue=Sum('total_amount', filter=mine),
+            total_products_sold=Sum('quantity', filter=mine),
+            total_sales=Count('id', filter=mine),
+            total_revenue_TT=Sum('total_amount'),
+        )
+        .order_by('period')
+    )
+
+
+def build_performance(fact_model, vendor, start_date, end_date):
+    """
+    (performances mensuelles, résumé de la période). Seuls les mois où le
+    vendeur a vendu apparaissent ; les totaux sont cumulés dans la même boucle.
+    """
+    performance_data = []
+    totals = {'total_customers': 0, 'total_revenue': 0, 'total_products_sold': 0, 'total_sales': 0}
+    revenue_tt = 0
+
+    for row in monthly_totals(fact_model, vendor, start_date, end_date):
+        if not row['total_sales']:
+            continue
+        month = row['period']
+        revenue = row['total_revenue'] or 0
+        customers = row['total_customers']
+        market = row['total_revenue_TT'] or 0
+
+        # PERFORMANCE : part du vendeur dans le CA de tous les vendeurs
+        # PANIER MOYEN : rapporté aux clients du vendeur
+        per_customer = float(revenue / customers) if customers > 0 else 0
+        entry = {
+            'month': month.strftime('%B %Y'),
+            'year': month.year,
+            'month_number': month.month,
+            'total_customers': customers,
+            'total_revenue': float(revenue),
+            'total_revenue_TT': float(market),
+            'total_products_sold': row['total_products_sold'] or 0,
+            'total_sales': row['total_sales'],
+            'performance_ratio': float(revenue / market) if market > 0 else 0.0,
+            'average_basket': per_customer,
+            'revenue_per_customer': per_customer,
+        }
+        performance_data.append(entry)
+
+        for key in totals:
+            totals[key] += entry[key]
+        revenue_tt += entry['total_revenue_TT']
+
+    summary = {
+        'period_start': start_date.isoformat(),
+        'period_end': end_date.isoformat(),
+        **totals,
+        'overall_performance': totals['total_revenue'] / revenue_tt if revenue_tt > 0 else 0,
+    }
+    return performance_data, summary
+
+
+def growth_rate(performance_data):
+    """Évolution (%) du CA entre le premier et le dernier mois."""
+    if len(performance_data) < 2:
+        return 0
+    first_month = performance_data[0]['total_revenue']
+    last_month = performance_data[-1]['total_revenue']
+    if first_month == 0:
+        return 0
+    return float((last_month - first_month) / first_month * 100)
@@ -0,0 +1,178 @@
+# scan.py
+"""
+Recherche de produits par code scanné (caisse, inventaire).
+
+Un code est d'abord cherché dans ProductVariant.barcode puis dans
+Product.sku (tous deux uniques). La fiche trouvée (produit + variantes) est
+gardée dans un cache LRU local au processus :
+
+- la clé est le code scanné, la valeur ne contient que des données
+  descriptives (nom, SKU, prix, format...) ; le stock est relu en base à
+  chaque appel, en une requête par lot ;
+- les codes inconnus sont aussi mis en cache, un inventaire rescanne
+  souvent les mêmes étiquettes ;
+- les signaux de Product / ProductVariant (signals.py) invalident les
+  entrées du produit modifié dans le processus courant ; settings.SCAN_CACHE_TTL
+  borne le délai de propagation aux autres workers.
+
+    SCAN_CACHE_SIZE = 4096   # entrées par processus
+    SCAN_CACHE_TTL = 300     # secondes
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .models import Product, ProductVariant
+
+SCAN_MAX_CODES = 500
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Cache LRU thread-safe avec expiration et index inverse par produit."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._by_product = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return _MISSING
+            expires, value, _ = item
+            if expires < time.monotonic():
+                self._discard(key)
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, product_id=None):
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, product_id)
+            if product_id is not None:
+                self._by_product.setdefault(product_id, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+
+    def invalidate(self, keys=(), product_id=None):
+        with self._lock:
+            for key in keys:
+                self._discard(key)
+            for key in self._by_product.pop(product_id, ()):
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_product.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _discard(self, key):
+        item = self._data.pop(key, _MISSING)
+        if item is _MISSING or item[2] is None:
+            return
+        keys = self._by_product.get(item[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_product[item[2]]
+
+
+cache = LRUCache(
+    getattr(settings, 'SCAN_CACHE_SIZE', 4096),
+    getattr(settings, 'SCAN_CACHE_TTL', 300),
+)
+
+
+def invalidate_product(product_id, *codes):
+    """Appelé par les signaux : retire la fiche du produit et les codes donnés."""
+    cache.invalidate(keys=[code for code in codes if code], product_id=product_id)
+
+
+def normalize_code(value):
+    return str(value).strip() if value is not None else ''
+
+
+# ── Construction des fiches ─────────────────────────────────────────────────
+
+def _variant_entry(variant):
+    return {
+        'id': variant.id,
+        'barcode': variant.barcode,
+        'format': variant.format.name if variant.format_id else None,
+        'price': variant.price,
+        'image': variant.image.name or None,
+    }
+
+
+def _product_entry(product, variants):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'sku': product.sku,
+        'point_of_sale_id': product.point_of_sale_id,
+        'variants': [_variant_entry(variant) for variant in variants],
+    }
+
+
+def _fetch(codes):
+    """Résout les codes absents du cache en deux requêtes au plus."""
+    found = {}
+    variants = (
+        ProductVariant.objects
+        .filter(barcode__in=codes)
+        .select_related('product', 'format')
+    )
+    for variant in variants:
+        found[variant.barcode] = ('barcode', variant.id, _product_entry(variant.product, [variant]))
+
+    remaining = [code for code in codes if code not in found]
+    if remaining:
+        products = Product.objects.filter(sku__in=remaining).prefetch_related(
+            Prefetch('variants', queryset=ProductVariant.objects.select_related('format').order_by('id'))
+        )
+        for product in products:
+            found[product.sku] = ('sku', None, _product_entry(product, product.variants.all()))
+    return found
+
+
+def lookup(codes):
+    """
+    {code: (type, variant_id, fiche) ou None} pour une liste de codes.
+    `variant_id` désigne la variante scannée (None pour un SKU).
+    """
+    results, misses = {}, []
+    for code in codes:
+        value = cache.get(code)
+        if value is _MISSING:
+            misses.append(code)
+        else:
+            results[code] = value
+
+    if misses:
+        found = _fetch(misses)
+        for code in misses:
+            value = found.get(code)
+            results[code] = value
+            cache.set(code, value, product_id=value[2]['id'] if value else None)
+    return results
+
+
+def current_stocks(variant_ids):
+    """Stock en temps réel, jamais mis en cache."""
+    if not variant_ids:
+        return {}
+    return dict(
+        ProductVariant.objects.filter(pk__in=variant_ids).values_list('id', 'current_stock')
+    )
@@ -0,0 +1,134 @@
+# scope.py
+"""
+Périmètre de l'utilisateur connecté : profil, rôle et points de vente.
+
+Les vues recalculaient `request.user.profile.points_of_sale.all()` plusieurs
+fois par requête. On résout ce périmètre une seule fois par requête
+(attaché à `request.user_scope`) et on le garde quelques secondes dans le
+cache Django pour les requêtes suivantes du même utilisateur.
+
+Le cache est invalidé par les signaux (voir signals.py) dès que
+`UserProfile.points_of_sale`, le profil ou un point de vente change. Il doit
+être partagé entre les workers (settings.CACHES) : sinon un autre processus
+garde l'ancien périmètre jusqu'à USER_SCOPE_CACHE_TTL secondes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import PointOfSale, UserProfile
+
+USER_SCOPE_CACHE_PREFIX = 'user_scope'
+
+
+def _cache_key(user_id):
+    return f'{USER_SCOPE_CACHE_PREFIX}:{user_id}'
+
+
+def _cache_ttl():
+    return getattr(settings, 'USER_SCOPE_CACHE_TTL', 60)
+
+
+class UserScope:
+    """
+    Périmètre résolu d'un utilisateur.
+
+    Seuls des identifiants sont mis en cache (profile_id, role_id, pos_ids) ;
+    le profil complet n'est chargé qu'à la demande, une fois par requête.
+    """
+
+    def __init__(self, user_id, profile_id=None, role_id=None, pos_ids=()):
+        self.user_id = user_id
+        self.profile_id = profile_id
+        self.role_id = role_id
+        self.pos_ids = frozenset(pos_ids)
+        self._profile = None
+
+    @classmethod
+    def for_user(cls, user):
+        if user is None or not user.is_authenticated:
+            return cls(user_id=None)
+
+        key = _cache_key(user.pk)
+        data = cache.get(key)
+        if data is None:
+            profile = (
+                UserProfile.objects
+                .select_related('role')
+                .filter(user_id=user.pk)
+                .first()
+            )
+            data = {'profile_id': None, 'role_id': None, 'pos_ids': []}
+            if profile is not None:
+                data = {
+                    'profile_id': profile.pk,
+                    'role_id': profile.role_id,
+                    'pos_ids': list(profile.points_of_sale.values_list('id', flat=True)),
+                }
+            cache.set(key, data, _cache_ttl())
+            scope = cls(user.pk, **data)
+            scope._profile = profile
+            return scope
+
+        return cls(user.pk, **data)
+
+    # ── Accès ─────────────────────────────────────────────────────────────
+    @property
+    def has_profile(self):
+        return self.profile_id is not None
+
+    @property
+    def profile(self):
+        """Profil (avec rôle) chargé au plus une fois ; None si absent."""
+        if self._profile is None and self.profile_id is not None:
+            self._profile = (
+                UserProfile.objects
+                .select_related('role')
+                .filter(pk=self.profile_id)
+                .first()
+            )
+        return self._profile
+
+    @property
+    def role(self):
+        profile = self.profile
+        return profile.role if profile else None
+
+    def get_profile(self):
+        """Comme `profile` mais lève UserProfile.DoesNotExist si absent."""
+        profile = self.profile
+        if profile is None:
+            raise UserProfile.DoesNotExist("Aucun profil pour cet utilisateur")
+        return profile
+
+    def points_of_sale(self):
+        return PointOfSale.objects.filter(id__in=self.pos_ids)
+
+    def has_pos(self, point_of_sale):
+        """Accepte une instance PointOfSale ou un identifiant (int/str)."""
+        pos_id = getattr(point_of_sale, 'pk', point_of_sale)
+        try:
+            return int(pos_id) in self.pos_ids
+        except (TypeError, ValueError):
+            return False
+
+
+def get_user_scope(request):
+    """
+    Retourne le périmètre de `request.user`, résolu une seule fois par requête.
+
+    Fonctionne avec une requête DRF ou une HttpRequest Django : le résultat est
+    posé sur la HttpRequest sous-jacente, donc partagé entre les deux.
+    """
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    scope = getattr(http_request, 'user_scope', None)
+    if scope is None or scope.user_id != getattr(user, 'pk', None):
+        scope = UserScope.for_user(user)
+        http_request.user_scope = scope
+    return scope
+
+
+def invalidate_user_scope(*user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,120 @@
+# search.py
+"""
+Recherche plein texte des points de vente.
+
+Texte indexé : name, owner, commune, quartier, address, marque_brander
+(SEARCH_FIELDS). La recherche est insensible à la casse et aux accents, et
+chaque mot saisi est un préfixe : "Yop", "yopougon" et "Yopougon"
+trouvent "Yopougon".
+
+- SQLite : table FTS5 `api_pointofsale_fts` (contenu externe, triggers,
+  migration 0006) ; toutes les lignes qui correspondent sont renvoyées, les
+  SEARCH_RANKED_RESULTS meilleures par bm25 pondéré (name d'abord) en tête,
+  les suivantes par nom.
+- Autres bases : colonne normalisée `search_text` (" mot1 mot2 ... ")
+  recalculée au save(), indexée en trigrammes sur PostgreSQL ; les noms
+  qui commencent par le premier mot passent devant.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ['name', 'owner', 'commune', 'quartier', 'address', 'marque_brander']
+# Poids bm25, dans l'ordre de SEARCH_FIELDS
+FTS_WEIGHTS = [10.0, 5.0, 3.0, 3.0, 1.0, 2.0]
+# FTS5 : nombre de résultats classés par bm25, les suivants sont triés par nom
+SEARCH_RANKED_RESULTS = 200
+
+_non_word = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(value):
+    """Minuscules, sans accents, mots séparés par une espace."""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return _non_word.sub(' ', value.lower()).strip()
+
+
+def search_terms(query):
+    return normalize(query).split()
+
+
+def search_document(instance):
+    """Valeur de `search_text` : mots bordés d'espaces pour le préfixe " mot"."""
+    words = ' '.join(normalize(getattr(instance, field)) for field in SEARCH_FIELDS).split()
+    return f" {' '.join(words)} " if words else ''
+
+
+_fts_tables = {}
+
+
+def fts_table(model):
+    """Nom de la table FTS5 du modèle si elle existe (SQLite uniquement)."""
+    if connection.vendor != 'sqlite':
+        return None
+    table = f'{model._meta.db_table}_fts'
+    if table not in _fts_tables:
+        _fts_tables[table] = table in connection.introspection.table_names()
+    return table if _fts_tables[table] else None
+
+
+def _ranked(queryset, matched, ids):
+    """Lignes de `matched`, `ids` d'abord dans cet ordre puis les autres par
+    nom. CASE écrit à la main : 200 When() coûtent plus cher à compiler que
+    la requête elle-même."""
+    if not ids:
+        return queryset.none()
+    quote = connection.ops.quote_name
+    column = f'{quote(queryset.model._meta.db_table)}.{quote(queryset.model._meta.pk.column)}'
+    params = []
+    for position, pk in enumerate(ids):
+        params.extend((pk, position))
+    params.append(len(ids))
+    order = RawSQL(f"CASE {column} {' '.join(['WHEN %s THEN %s'] * len(ids))} ELSE %s END", params)
+    return queryset.filter(pk__in=matched).order_by(order, 'name', 'pk')
+
+
+def search_queryset(queryset, query):
+    """Filtre `queryset` sur `query` et le trie par pertinence."""
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    table = fts_table(queryset.model)
+    if table is not None:
+        match = ' '.join(f'"{term}"*' for term in terms)
+        candidates, params = queryset.order_by().values('pk').query.sql_with_params()
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        # Filtre : sous-requête IN non corrélée, évaluée une seule fois
+        matched = RawSQL(f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s', (match,))
+        # Classement : CTE matérialisée (SQLite >= 3.35) ; sans elle, SQLite
+        # pousse la contrainte d'id dans FTS5 et relance la recherche par candidat
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH matches AS MATERIALIZED ('
+                f'SELECT rowid AS id, bm25("{table}", {weights}) AS score '
+                f'FROM "{table}" WHERE "{table}" MATCH %s) '
+                f'SELECT matches.id FROM matches JOIN ({candidates}) AS candidates '
+                f'ON candidates.pk = matches.id '
+                f'ORDER BY matches.score LIMIT {SEARCH_RANKED_RESULTS}',
+                (match, *params),
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        return _ranked(queryset, matched, ids)
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(search_text__contains=f' {term}')
+    # Le nom ouvre search_text : un nom qui commence par le premier mot d'abord
+    return queryset.filter(condition).annotate(
+        search_rank=Case(
+            When(search_text__startswith=f' {terms[0]}', then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('search_rank', 'name')
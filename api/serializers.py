@@ -8,6 +8,8 @@ from django.contrib.auth.models import User
 from django.db.models import Count, Sum
 from datetime import datetime, timedelta
 from django.utils import timezone
+from .fieldsets import SparseFieldsetMixin
+from .fast_serializers import ValuesSerializer, integer
 
 
 
@@ -454,7 +456,7 @@ class StockMovementSerializer(serializers.ModelSerializer):
 
         
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product_variant = ProductVariantSerializer(read_only=True)
     product_variant_id = serializers.PrimaryKeyRelatedField(
         queryset=ProductVariant.objects.all(),
@@ -475,6 +477,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'price': {'required': False}
         }
         read_only_fields = ['quantity_affecte']
+        expandable_fields = ['product_variant']
 
     def validate(self, data):
         product_variant = data.get('product_variant')
@@ -495,7 +498,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         
         return data
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     point_of_sale = serializers.PrimaryKeyRelatedField(
         queryset=PointOfSale.objects.all(),
@@ -516,6 +519,15 @@ class OrderSerializer(serializers.ModelSerializer):
             'updated_at', 'items','customer'
         ]
         read_only_fields = ['status', 'total', 'created_at', 'updated_at','customer']
+        # ?fields= / ?expand= (voir fieldsets.py)
+        expandable_fields = ['items', 'point_of_sale_details']
+        sparse_relations = {
+            'point_of_sale_details': {'select_related': ['point_of_sale']},
+            'items': {'prefetch_related': [
+                'items__product_variant__product',
+                'items__product_variant__format',
+            ]},
+        }
 
     def validate(self, data):
         items = data.get('items', [])
@@ -595,7 +607,7 @@ class OrderSerializer(serializers.ModelSerializer):
 
         return instance
 
-class DisputeSerializer(serializers.ModelSerializer):
+class DisputeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     order = OrderSerializer(read_only=True)
     order_id = serializers.IntegerField(source='order.id', write_only=True, allow_null=True)
     complainant = serializers.CharField(source='complainant.username', read_only=True)
@@ -609,6 +621,17 @@ class DisputeSerializer(serializers.ModelSerializer):
             'id', 'order', 'order_id', 'complainant', 'complainant_id',
             'description', 'status', 'resolution_details', 'created_at', 'updated_at'
         ]
+        expandable_fields = ['order']
+        sparse_relations = {
+            'complainant': {'select_related': ['complainant']},
+            'order': {
+                'select_related': ['order__point_of_sale'],
+                'prefetch_related': [
+                    'order__items__product_variant__product',
+                    'order__items__product_variant__format',
+                ],
+            },
+        }
 
 class TokenSerializer(serializers.ModelSerializer):
     user = serializers.CharField(source='user.username', read_only=True)
@@ -700,7 +723,7 @@ class StockOverviewSerializer(serializers.Serializer):
 from .models import MobileVendor, VendorActivity, VendorPerformance
 from .models import PointOfSale
 
-class MobileVendorSerializer(serializers.ModelSerializer):
+class MobileVendorSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     point_of_sale_name = serializers.CharField(source='point_of_sale.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     vehicle_type_display = serializers.CharField(source='get_vehicle_type_display', read_only=True)
@@ -827,6 +850,28 @@ class VendorActivitySummarySerializer(serializers.ModelSerializer):
         return "0.00"
 
 
+class VendorActivitySummaryValuesSerializer(ValuesSerializer):
+    """Même contrat que VendorActivitySummarySerializer, en une seule requête."""
+
+    class Meta:
+        model = VendorActivity
+        fields = ['id', 'total_products', 'total_amount']
+        annotations = {
+            'items_quantity': Sum('related_order__items__quantity'),
+            'items_total': Sum('related_order__items__total'),
+        }
+        extra_values = ['related_order_id', 'items_quantity', 'items_total']
+
+    def get_total_products(self, row):
+        return row['items_quantity'] or 0
+
+    def get_total_amount(self, row):
+        if row['related_order_id'] is None:
+            return "0.00"
+        # sum() d'une commande sans article renvoyait l'entier 0
+        return str(row['items_total'] if row['items_total'] is not None else 0)
+
+
 from decimal import Decimal
 
 class VendorActivityCumulativeSerializer(serializers.Serializer):
@@ -864,12 +909,28 @@ class VendorPerformanceSerializer(serializers.ModelSerializer):
     def get_month_formatted(self, obj):
         return obj.month.strftime("%B %Y")
 
+class GPSPointSerializer(serializers.Serializer):
+    """Point d'une trace GPS envoyée en lot (voir trails.py)."""
+    timestamp = serializers.DateTimeField()
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    accuracy = serializers.FloatField(min_value=0, required=False, allow_null=True)
+
+
 class MobileVendorDetailSerializer(MobileVendorSerializer):
     activities = VendorActivitySerializer(many=True, read_only=True)
     performances = VendorPerformanceSerializer(many=True, read_only=True)
     
     class Meta(MobileVendorSerializer.Meta):
         fields = MobileVendorSerializer.Meta.fields + ['activities', 'performances']
+        expandable_fields = ['activities', 'performances']
+        sparse_relations = {
+            'activities': {'prefetch_related': [
+                'activities__related_order__items__product_variant__product',
+                'activities__related_order__items__product_variant__format',
+            ]},
+            'performances': {'prefetch_related': ['performances']},
+        }
 
 from .models import Purchase, MobileVendor
 
@@ -1101,4 +1162,31 @@ class DistrictSerializer(serializers.ModelSerializer):
         fields = ['id', 'nom', 'villes_count', 'date_creation']
     
     def get_villes_count(self, obj):
-        return obj.villes.count()
\ No newline at end of file
+        return obj.villes.count()
+
+
+# ── Versions .values() pour les listes (voir fast_serializers.py) ──────────
+
+class QuartierValuesSerializer(ValuesSerializer):
+    class Meta:
+        model = Quartier
+        fields = QuartierSerializer.Meta.fields
+        sources = {'ville_nom': 'ville__nom', 'district_nom': 'ville__district__nom'}
+
+
+class VilleValuesSerializer(ValuesSerializer):
+    class Meta:
+        model = Ville
+        fields = VilleSerializer.Meta.fields
+        annotations = {'quartiers_count_annotated': Count('quartiers')}
+        sources = {'district_nom': 'district__nom', 'quartiers_count': 'quartiers_count_annotated'}
+        formats = {'quartiers_count': integer}
+
+
+class DistrictValuesSerializer(ValuesSerializer):
+    class Meta:
+        model = District
+        fields = DistrictSerializer.Meta.fields
+        annotations = {'villes_count_annotated': Count('villes')}
+        sources = {'villes_count': 'villes_count_annotated'}
+        formats = {'villes_count': integer}
@@ -135,4 +135,50 @@ class PurchaseSummarySerializerPOS(serializers.ModelSerializer):
     def get_average_sale_amount(self, obj):
         if obj.sales_count > 0:
             return obj.total_sales_amount / obj.sales_count
-        return 0
\ No newline at end of file
+        return 0
+
+# ── Versions .values() pour les listes (voir fast_serializers.py) ──────────
+# vendor_name (source 'vendor.name', attribut inexistant) n'a jamais été
+# renvoyé par les serializers DRF ci-dessus : il est omis ici aussi.
+from .fast_serializers import ValuesSerializer, decimal, integer
+
+
+def _average_sale_amount(row):
+    if row['sales_count'] > 0:
+        return row['total_sales_amount'] / row['sales_count']
+    return 0
+
+
+class PurchaseSummaryValuesSerializer(ValuesSerializer):
+    class Meta:
+        model = Purchase
+        fields = [
+            name for name in PurchaseSummarySerializer.Meta.fields if name != 'vendor_name'
+        ]
+        formats = {
+            'total_sales_amount': decimal(2),
+            'total_sales_quantity': integer,
+            'sales_count': integer,
+            'total_products': integer,
+            'total_variants': integer,
+        }
+        extra_values = ['first_name', 'last_name', 'total_sales_amount', 'sales_count']
+
+    def get_full_name(self, row):
+        return f"{row['first_name']} {row['last_name']}"
+
+    def get_average_sale_amount(self, row):
+        return _average_sale_amount(row)
+
+
+class PurchaseSummaryValuesSerializerPOS(ValuesSerializer):
+    class Meta:
+        model = PointOfSale
+        fields = [
+            name for name in PurchaseSummarySerializerPOS.Meta.fields if name != 'vendor_name'
+        ]
+        formats = PurchaseSummaryValuesSerializer.Meta.formats
+        extra_values = ['total_sales_amount', 'sales_count']
+
+    def get_average_sale_amount(self, row):
+        return _average_sale_amount(row)
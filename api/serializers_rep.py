@@ -111,7 +111,11 @@ class VendorGeoSerializer(serializers.ModelSerializer):
     point_of_sale_name = serializers.CharField(source='point_of_sale.name')
     point_of_sale_region = serializers.CharField(source='point_of_sale.region')
     point_of_sale_commune = serializers.CharField(source='point_of_sale.commune')
-    last_activity = serializers.DateTimeField(source='activities.last().timestamp', allow_null=True)
+    # Dernière position connue (MobileVendor.last_location*)
+    last_activity = serializers.DateTimeField(source='last_location_at', allow_null=True)
+    latitude = serializers.FloatField(source='last_location.latitude', allow_null=True)
+    longitude = serializers.FloatField(source='last_location.longitude', allow_null=True)
+    # Annotation du queryset (voir viewser.vendor_geo_data)
     total_sales_today = serializers.DecimalField(max_digits=10, decimal_places=2)
 
     class Meta:
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from .fast_serializers import ValuesSerializer
+from .fieldsets import SparseFieldsetMixin
 from .models import PointOfSale, PointOfSalePhoto
 
 
@@ -34,7 +36,7 @@ class PhotoSerializer(serializers.ModelSerializer):
 # Point de vente – Liste (allégé, sans photos)
 # ─────────────────────────────────────────────────────────────────────────────
 
-class PointOfSaleListSerializer(serializers.ModelSerializer):
+class PointOfSaleListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Utilisé pour GET /api/points-vente/
     Tous les champs consommés par LanfiaLinkDashboard.tsx sont présents.
@@ -125,6 +127,28 @@ class PointOfSaleListSerializer(serializers.ModelSerializer):
         return None
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Point de vente – Liste en lecture seule via .values()
+# Même JSON que PointOfSaleListSerializer, sans instancier les modèles
+# ─────────────────────────────────────────────────────────────────────────────
+
+class PointOfSaleListValuesSerializer(ValuesSerializer):
+    POTENTIEL_LABELS = dict(PointOfSale.POTENTIEL_CHOICES)
+
+    class Meta:
+        model = PointOfSale
+        fields = PointOfSaleListSerializer.Meta.fields
+        # photos_count_annotated est posé par PointOfSaleViewSet.get_queryset
+        sources = {'photos_count': 'photos_count_annotated'}
+        extra_values = ['potentiel', 'agent_name']
+
+    def get_potentiel_label(self, row):
+        return self.POTENTIEL_LABELS.get(row['potentiel'], 'Standard')
+
+    def get_agent(self, row):
+        return row['agent_name'] or ''
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Point de vente – Détail complet avec photos[]
 # Utilisé pour GET /api/points-vente/{id}/  (lightbox dashboard)
@@ -136,6 +160,8 @@ class PointOfSaleDetailSerializer(PointOfSaleListSerializer):
 
     class Meta(PointOfSaleListSerializer.Meta):
         fields = PointOfSaleListSerializer.Meta.fields + ['photos', 'branding_image']
+        expandable_fields = ['photos']
+        sparse_relations = {'photos': {'prefetch_related': ['photos']}}
 
     def get_branding_image(self, obj):
         request = self.context.get('request')
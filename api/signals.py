@@ -1,10 +1,15 @@
 # signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed, pre_delete, pre_save
 from django.dispatch import receiver
 from django.db.models import Sum
 from django.utils import timezone
 from django.db import transaction
-from .models import Order, PointOfSale
+from .models import (
+    MobileVendor, Order, PointOfSale, Product, ProductVariant, UserProfile, VendorActivity,
+)
+from . import scan
+from .facets import invalidate_facets
+from .scope import invalidate_user_scope
 
 @receiver([post_save, post_delete], sender=Order)
 def update_point_of_sale_stats(sender, instance, **kwargs):
@@ -54,6 +59,88 @@ def update_point_of_sale_stats(sender, instance, **kwargs):
         # Loguer l'erreur mais ne pas bloquer l'application
         print(f"Erreur lors de la mise à jour des stats du point de vente: {e}")
 
+# ── Invalidation du périmètre utilisateur (voir scope.py) ──────────────────
+
+@receiver(m2m_changed, sender=UserProfile.points_of_sale.through)
+def invalidate_scope_on_pos_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Ajout/retrait de points de vente sur un profil (dans les deux sens).
+    En sens inverse (pos.users.clear()), pk_set est vide : on lit les
+    profils concernés avant la suppression.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+
+    if not reverse:
+        if action != 'pre_clear':
+            invalidate_user_scope(instance.user_id)
+        return
+
+    if action == 'pre_clear':
+        user_ids = instance.users.values_list('user_id', flat=True)
+    elif action == 'post_clear':
+        return
+    else:
+        user_ids = UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+    invalidate_user_scope(*user_ids)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_scope_on_profile_change(sender, instance, **kwargs):
+    invalidate_user_scope(instance.user_id)
+
+
+@receiver(pre_delete, sender=PointOfSale)
+def invalidate_scope_on_pos_delete(sender, instance, **kwargs):
+    # La suppression en cascade des lignes M2M n'émet pas m2m_changed
+    invalidate_user_scope(*instance.users.values_list('user_id', flat=True))
+
+
+# ── Dernière position connue des vendeurs ───────────────────────────────────
+
+@receiver(post_save, sender=VendorActivity)
+def record_vendor_location(sender, instance, **kwargs):
+    """Alimente MobileVendor.last_location pour la carte en temps réel."""
+    location = instance.location
+    if not isinstance(location, dict) or not location:
+        return
+    MobileVendor.record_location(instance.vendor_id, location, instance.timestamp)
+
+
+# ── Facettes des points de vente (voir facets.py) ───────────────────────────
+
+@receiver(pre_save, sender=PointOfSale)
+def remember_pos_owner(sender, instance, update_fields=None, **kwargs):
+    """
+    Propriétaire en base avant l'enregistrement : un point de vente réaffecté
+    sort aussi des facettes de l'ancien utilisateur.
+    """
+    if instance.pk is None or (update_fields is not None and 'user' not in update_fields):
+        instance._previous_user_id = instance.user_id
+        return
+    instance._previous_user_id = (
+        PointOfSale.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+    )
+
+
+@receiver([post_save, post_delete], sender=PointOfSale)
+def invalidate_facets_on_pos_change(sender, instance, **kwargs):
+    invalidate_facets(instance.user_id, getattr(instance, '_previous_user_id', None))
+
+
+# ── Cache des codes scannés (voir scan.py) ──────────────────────────────────
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_scan_product(sender, instance, **kwargs):
+    # Le SKU a pu changer : l'index par produit couvre l'ancien code
+    scan.invalidate_product(instance.pk, instance.sku)
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def invalidate_scan_variant(sender, instance, **kwargs):
+    # Couvre aussi un code inconnu mis en cache avant la création de la variante
+    scan.invalidate_product(instance.product_id, instance.barcode)
+
 # # signals.py
 # from django.db.models.signals import pre_save, post_save
 # from django.dispatch import receiver
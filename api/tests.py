@@ -1,3 +1,740 @@
-from django.test import TestCase
+import gzip
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import geo, scan, trails
+from .middleware import CompressionMiddleware, brotli, no_compression
+from .models import (
+    MobileVendor, Order, OrderItem, PointOfSale, Product, ProductVariant, Purchase, Sale,
+    UserProfile, VendorActivity, VendorGPSPoint, VendorPerformance,
+)
+from .performance import current_month
+from .search import SEARCH_RANKED_RESULTS, search_queryset
+
+# Cache local aux tests : le cache fichier des settings est partagé avec le serveur
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_point_of_sale(user, **kwargs):
+    values = dict(
+        name='Boutique Test', owner='Kouassi', phone='0700000000', email='pdv@test.ci',
+        address='Rue 12', latitude=5.33, longitude=-4.02, district='Abidjan',
+        region='Lagunes', commune='Cocody', type='boutique', status='actif',
+        registration_date='2024-01-01', user=user,
+    )
+    values.update(kwargs)
+    return PointOfSale.objects.create(**values)
+
+
+class SalesFixtureMixin:
+    """Point de vente, vendeur, activité (10 unités assignées), client et variante."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('gerant', password='secret')
+        cls.pos = create_point_of_sale(cls.user)
+        cls.vendor = MobileVendor.objects.create(
+            point_of_sale=cls.pos, first_name='Awa', last_name='Koné', phone='0701010101'
+        )
+        product = Product.objects.create(name='Glace', sku='TEST-1', point_of_sale=cls.pos)
+        cls.variant = ProductVariant.objects.create(
+            product=product, price=Decimal('500'), current_stock=100, max_stock=100
+        )
+        cls.customer = Purchase.objects.create(
+            vendor=cls.vendor, first_name='Client', last_name='Test', zone='Cocody',
+            amount=Decimal('0'), phone='0702020202',
+        )
+        cls.activity = VendorActivity.objects.create(
+            vendor=cls.vendor, activity_type='check_in',
+            quantity_assignes=10, quantity_restante=10,
+        )
+
+    def make_sale(self, quantity, activity=None):
+        return Sale(
+            product_variant=self.variant, customer=self.customer, quantity=quantity,
+            total_amount=Decimal(500 * quantity), vendor=self.vendor,
+            vendor_activity=activity or self.activity,
+        )
+
+
+# ── Vente avec UPDATE conditionnel (VendorActivity.vendre_avec_verrouillage) ──
+
+class VendreAvecVerrouillageTests(SalesFixtureMixin, TestCase):
+
+    def test_vente_met_a_jour_le_stock(self):
+        self.make_sale(4).save()
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.quantity_sales, 4)
+        self.assertEqual(self.activity.quantity_restante, 6)
+
+    def test_refuse_la_survente(self):
+        self.make_sale(8).save()
+        with self.assertRaisesMessage(ValidationError, 'Disponible: 2'):
+            self.make_sale(3).save()
+        self.make_sale(2).save()
+        with self.assertRaisesMessage(ValidationError, 'Stock épuisé'):
+            self.make_sale(1).save()
+        self.assertEqual(Sale.objects.count(), 2)
+
+    def test_deux_instances_de_la_meme_activite(self):
+        # Deux requêtes qui ont chargé l'activité avant toute vente
+        first = VendorActivity.objects.get(pk=self.activity.pk)
+        second = VendorActivity.objects.get(pk=self.activity.pk)
+        first.vendre_avec_verrouillage(7)
+        # L'instance périmée ne voit pas les 7 unités, l'UPDATE conditionnel si
+        with self.assertRaises(ValidationError):
+            second.vendre_avec_verrouillage(4)
+        second.vendre_avec_verrouillage(3)
+        # Instance relue après la vente, pas incrémentée en mémoire
+        self.assertEqual(second.quantity_sales, 10)
+        self.assertEqual(second.quantity_restante, 0)
+
+    def test_echec_de_l_insertion_annule_le_decompte(self):
+        sale = self.make_sale(2)
+        sale.total_amount = None
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            sale.save()
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.quantity_sales, 0)
+        self.assertEqual(self.activity.quantity_restante, 10)
+
+
+# ── Affectation d'un réapprovisionnement aux articles de la commande ─────────
+
+class AffecterQuantiteCommandeTests(SalesFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        profile = UserProfile.objects.create(
+            user=cls.user, establishment_name='Boutique Test',
+            establishment_address='Rue 12', establishment_type='boutique',
+        )
+        cls.order = Order.objects.create(
+            customer=profile, point_of_sale=cls.pos, total=Decimal('0'), date='2026-10-01'
+        )
+        # Ordre de création = ordre des clés : 4 à affecter, déjà complet, 5 à affecter
+        cls.items = [
+            OrderItem.objects.create(
+                order=cls.order, product_variant=cls.variant, name=f'Article {quantity}',
+                quantity=quantity, quantity_affecte=affecte, price=Decimal('500'),
+                total=Decimal('0'),
+            )
+            for quantity, affecte in [(4, 0), (3, 3), (5, 0)]
+        ]
+
+    def replenish(self, quantity):
+        return VendorActivity.objects.create(
+            vendor=self.vendor, activity_type='stock_replenishment',
+            quantity_assignes=quantity, related_order=self.order,
+        )
+
+    def test_affectation_dans_l_ordre_des_articles(self):
+        stock = ProductVariant.objects.get(pk=self.variant.pk).current_stock
+        with CaptureQueriesContext(connection) as queries:
+            activity = self.replenish(7)
+
+        affectes = list(
+            OrderItem.objects.filter(order=self.order).order_by('pk')
+            .values_list('quantity_affecte', flat=True)
+        )
+        self.assertEqual(affectes, [4, 3, 3])
+        activity.refresh_from_db()
+        self.assertEqual(activity.quantity_restante, 0)
+
+        # Un seul UPDATE des articles, sans passer par OrderItem.save()
+        item_updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "api_orderitem"')
+        ]
+        self.assertEqual(len(item_updates), 1)
+        self.assertFalse(any('api_productvariant' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(ProductVariant.objects.get(pk=self.variant.pk).current_stock, stock)
+
+    def test_plafond_par_article(self):
+        activity = self.replenish(20)
+        affectes = list(
+            OrderItem.objects.filter(order=self.order).order_by('pk')
+            .values_list('quantity_affecte', flat=True)
+        )
+        self.assertEqual(affectes, [4, 3, 5])
+        activity.refresh_from_db()
+        self.assertEqual(activity.quantity_restante, 11)
+
+    def test_commande_deja_affectee(self):
+        OrderItem.objects.filter(order=self.order).update(quantity_affecte=F('quantity'))
+        with self.assertRaises(ValidationError):
+            self.replenish(2)
+        self.assertFalse(VendorActivity.objects.filter(activity_type='stock_replenishment').exists())
+
+
+# ── Trace GPS : accès et distance incrémentale (trails.py) ───────────────────
+
+@override_settings(CACHES=LOCAL_CACHE)
+class VendorTrailTests(SalesFixtureMixin, TestCase):
+    start = datetime(2026, 3, 10, 9, 0, tzinfo=dt_timezone.utc)
+    month = date(2026, 3, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.owner = User.objects.create_user('vendeur', password='secret')
+        MobileVendor.objects.filter(pk=cls.vendor.pk).update(user=cls.owner)
+        cls.stranger = User.objects.create_user('autre', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = f'/api/mobile-vendors/{self.vendor.pk}/trail/'
+
+    def points(self, first, count):
+        return [
+            {
+                'timestamp': self.start + timedelta(seconds=10 * index),
+                'latitude': 5.30 + index * 1e-4,
+                'longitude': -4.0,
+                'accuracy': 150.0 if index % 7 == 3 else 5.0,
+            }
+            for index in range(first, first + count)
+        ]
+
+    def test_acces_a_la_trace(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.post(self.url, {'points': []}, format='json').status_code, 403)
+
+        # Périmètre : le gérant du point de vente du vendeur
+        profile = UserProfile.objects.create(
+            user=self.user, establishment_name='Boutique Test',
+            establishment_address='Rue 12', establishment_type='boutique',
+        )
+        profile.points_of_sale.add(self.pos)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.post(self.url, {'points': []}, format='json').status_code, 403)
+
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.post(
+            self.url,
+            {'points': [dict(point, timestamp=point['timestamp'].isoformat()) for point in self.points(0, 3)]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def stored_distance(self):
+        return VendorPerformance.objects.get(vendor=self.vendor, month=self.month).distance_covered
+
+    def test_distance_incrementale_egale_au_recalcul(self):
+        for first in range(0, 50, 10):
+            distances = trails.store_points(self.vendor, self.points(first, 10))
+        incremental = self.stored_distance()
+        self.assertGreater(incremental, 0)
+        self.assertEqual(distances[self.month.isoformat()], round(incremental, 3))
+
+        trails.update_distance_covered(self.vendor.pk, self.month)
+        self.assertAlmostEqual(self.stored_distance(), incremental, places=9)
+
+    def test_verrou_avant_lecture_de_la_trace(self):
+        trails.store_points(self.vendor, self.points(0, 10))
+        with CaptureQueriesContext(connection) as queries:
+            trails.store_points(self.vendor, self.points(10, 10))
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if 'api_vendorperformance' in query['sql'] or 'api_vendorgpspoint' in query['sql']
+        ]
+        # Le dernier point enregistré n'est lu qu'une fois la ligne du mois verrouillée
+        self.assertTrue(statements[0].startswith('UPDATE "api_vendorperformance"'))
+
+    def test_lot_intercale_recalcule_le_mois(self):
+        trails.store_points(self.vendor, self.points(0, 30))
+        late = [
+            dict(point, timestamp=point['timestamp'] + timedelta(seconds=5))
+            for point in self.points(10, 2)
+        ]
+        trails.store_points(self.vendor, late)
+        self.assertEqual(VendorGPSPoint.objects.filter(vendor=self.vendor).count(), 32)
+
+        stored = self.stored_distance()
+        trails.update_distance_covered(self.vendor.pk, self.month)
+        self.assertAlmostEqual(self.stored_distance(), stored, places=9)
+
+
+# ── Recherche plein texte : tous les résultats, les meilleurs d'abord ────────
+
+@override_settings(CACHES=LOCAL_CACHE)
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('gerant', password='secret')
+        total = SEARCH_RANKED_RESULTS + 50
+        PointOfSale.objects.bulk_create([
+            PointOfSale(
+                name=f'Boutique {index}', owner='Kouassi', phone='0700000000',
+                email='pdv@test.ci', address='Rue 12', district='Abidjan', region='Lagunes',
+                commune='Yopougon', type='boutique', status='actif',
+                registration_date='2024-01-01', user=cls.user,
+            )
+            for index in range(total)
+        ])
+        cls.best = create_point_of_sale(cls.user, name='Yopougon Market')
+        cls.total = total + 1
+
+    def test_resultats_au_dela_du_classement(self):
+        results = search_queryset(PointOfSale.objects.all(), 'yop')
+        self.assertEqual(results.count(), self.total)
+        self.assertEqual(len(set(results.values_list('pk', flat=True))), self.total)
+        # Le nom pèse le plus dans bm25
+        self.assertEqual(results.first().pk, self.best.pk)
+
+    def test_liste_et_facettes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get('/api/points-of-vente/', {'search': 'yop', 'include': 'facets'}).json()
+        self.assertEqual(data['count'], self.total)
+        self.assertEqual(data['facets']['total'], self.total)
+
+
+# ── Filtre géographique sans R*Tree (préfixes de geohash) ────────────────────
+
+class GeohashBboxTests(TestCase):
+    bbox = (-4.03, 5.32, -4.01, 5.34)
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('gerant', password='secret')
+        # Grille qui déborde de la zone : points dedans, au bord et dehors
+        for row in range(12):
+            for column in range(12):
+                create_point_of_sale(
+                    user, name=f'PDV {row}-{column}',
+                    latitude=5.315 + row * 0.0025, longitude=-4.035 + column * 0.0025,
+                )
+
+    def test_prefixes_et_filtre_exact(self):
+        west, south, east, north = self.bbox
+        expected = set(
+            PointOfSale.objects.filter(
+                latitude__gte=south, latitude__lte=north,
+                longitude__gte=west, longitude__lte=east,
+            ).values_list('pk', flat=True)
+        )
+        self.assertTrue(expected)
+        with mock.patch.object(geo, 'rtree_table', return_value=None):
+            queryset = geo.filter_bbox(PointOfSale.objects.all(), self.bbox)
+            self.assertIn('LIKE', str(queryset.query))
+            self.assertEqual(set(queryset.values_list('pk', flat=True)), expected)
+        # Même résultat par l'index R*Tree (SQLite)
+        self.assertEqual(
+            set(geo.filter_bbox(PointOfSale.objects.all(), self.bbox).values_list('pk', flat=True)),
+            expected,
+        )
+
+
+# ── Performances mensuelles : lecture seule, calculées par la commande ───────
+
+@override_settings(CACHES=LOCAL_CACHE)
+class MonthlyPerformanceTests(SalesFixtureMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_without_writes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(writes, [])
+        return response.json()
+
+    def test_get_ne_calcule_pas_le_mois(self):
+        self.make_sale(4).save()
+        data = self.get_without_writes(f'/api/vendors/{self.vendor.pk}/performance/')
+        self.assertEqual(data['statistics']['vendor_sales_count'], 0)
+        self.get_without_writes(f'/api/mobile-vendors/{self.vendor.pk}/stats/')
+        self.assertFalse(VendorPerformance.objects.exists())
+
+        call_command('materialize_vendor_performance', stdout=StringIO())
+        data = self.get_without_writes(f'/api/vendors/{self.vendor.pk}/performance/')
+        self.assertEqual(data['statistics']['vendor_sales_count'], 1)
+        self.assertEqual(data['performance_percentage'], 100.0)
+        stats = self.get_without_writes(f'/api/mobile-vendors/{self.vendor.pk}/stats/')
+        self.assertEqual(stats['current_performance'], 100.0)
+        self.assertEqual(
+            VendorPerformance.objects.get(vendor=self.vendor).month, current_month()
+        )
+
+
+# ── Lecture de codes scannés (scan.py, ProductScanView) ──────────────────────
+
+class LRUCacheTests(TestCase):
+
+    def test_eviction_du_moins_recent(self):
+        cache = scan.LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIs(cache.get('b'), scan._MISSING)
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(len(cache), 2)
+
+    def test_expiration(self):
+        cache = scan.LRUCache(maxsize=10, ttl=60)
+        with mock.patch.object(scan.time, 'monotonic', return_value=1000.0):
+            cache.set('a', 1, product_id=7)
+        with mock.patch.object(scan.time, 'monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch.object(scan.time, 'monotonic', return_value=1061.0):
+            self.assertIs(cache.get('a'), scan._MISSING)
+        self.assertEqual(cache._by_product, {})
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ProductScanTests(TestCase):
+    url = '/api/products/scan/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('caissier', password='secret')
+        pos = create_point_of_sale(cls.user)
+        profile = UserProfile.objects.create(
+            user=cls.user, establishment_name='Boutique Test',
+            establishment_address='Rue 12', establishment_type='boutique',
+        )
+        profile.points_of_sale.add(pos)
+        cls.product = Product.objects.create(name='Glace', sku='GLACE-1', point_of_sale=pos)
+        cls.variant = ProductVariant.objects.create(
+            product=cls.product, price=Decimal('500'), current_stock=12, max_stock=100,
+            barcode='3017620422003',
+        )
+        # Produit d'un point de vente hors du périmètre
+        other = create_point_of_sale(User.objects.create_user('autre', password='secret'))
+        Product.objects.create(name='Savon', sku='SAVON-1', point_of_sale=other)
+
+    def setUp(self):
+        scan.cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scan(self, code):
+        return self.client.get(self.url, {'code': code})
+
+    def test_code_barre_et_stock_en_direct(self):
+        response = self.scan('3017620422003')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['match'], 'barcode')
+        ProductVariant.objects.filter(pk=self.variant.pk).update(current_stock=3)
+        # Fiche en cache, stock relu
+        with self.assertNumQueries(1):
+            response = self.scan('3017620422003')
+        self.assertEqual(response.json()['variants'][0]['current_stock'], 3)
+
+    def test_changement_de_code_barre(self):
+        self.assertEqual(self.scan('3017620422003').status_code, 200)
+        self.assertEqual(self.scan('3017620422010').status_code, 404)
+        self.variant.barcode = '3017620422010'
+        self.variant.save()
+        self.assertEqual(self.scan('3017620422003').status_code, 404)
+        self.assertEqual(self.scan('3017620422010').status_code, 200)
+
+    def test_changement_de_sku(self):
+        self.assertEqual(self.scan('GLACE-1').json()['match'], 'sku')
+        self.product.sku = 'GLACE-2'
+        self.product.save()
+        self.assertEqual(self.scan('GLACE-1').status_code, 404)
+        self.assertEqual(self.scan('GLACE-2').status_code, 200)
+
+    def test_code_inconnu_puis_cree(self):
+        self.assertEqual(self.scan('6111000000017').status_code, 404)
+        ProductVariant.objects.create(
+            product=self.product, price=Decimal('700'), current_stock=5, max_stock=50,
+            barcode='6111000000017',
+        )
+        self.assertEqual(self.scan('6111000000017').status_code, 200)
+
+    def test_hors_perimetre(self):
+        self.assertEqual(self.scan('SAVON-1').status_code, 404)
+        data = self.client.post(self.url, {'codes': ['SAVON-1', 'GLACE-1']}, format='json').json()
+        self.assertEqual((data['count'], data['found']), (2, 1))
+
+    def test_taille_du_lot(self):
+        codes = [f'CODE-{index}' for index in range(scan.SCAN_MAX_CODES + 1)]
+        response = self.client.post(self.url, {'codes': codes}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, {'codes': codes[:-1]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+# ── Statistiques : séries complétées (timeseries.py, StatisticsViewSet) ──────
+
+@override_settings(CACHES=LOCAL_CACHE)
+class SalesTimeseriesTests(SalesFixtureMixin, TestCase):
+    url = '/api/statistics/sales_timeseries/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_vendor = MobileVendor.objects.create(
+            point_of_sale=cls.pos, first_name='Yao', last_name='Kouassi', phone='0703030303'
+        )
+        cls.other_activity = VendorActivity.objects.create(
+            vendor=cls.other_vendor, activity_type='check_in',
+            quantity_assignes=10, quantity_restante=10,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sale_at(self, when, quantity=1, activity=None):
+        sale = self.make_sale(quantity, activity)
+        if activity is not None:
+            sale.vendor = activity.vendor
+        sale.save()
+        Sale.objects.filter(pk=sale.pk).update(created_at=when)
+
+    def test_par_vendeur(self):
+        self.sale_at(datetime(2026, 4, 1, 10, tzinfo=dt_timezone.utc))
+        self.sale_at(datetime(2026, 4, 3, 10, tzinfo=dt_timezone.utc), quantity=2)
+        self.sale_at(datetime(2026, 4, 2, 10, tzinfo=dt_timezone.utc), activity=self.other_activity)
+
+        response = self.client.get(self.url, {
+            'start_date': '2026-04-01', 'end_date': '2026-04-03',
+            'split_by': 'vendor', 'series': 'revenue',
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['labels'], ['2026-04-01', '2026-04-02', '2026-04-03'])
+        self.assertEqual(data['total']['revenue'], [500, 500, 1000])
+        # Vendeurs classés par chiffre d'affaires, jours sans vente à 0
+        self.assertEqual(
+            [(group['key'], group['label'], group['revenue']) for group in data['groups']],
+            [
+                (self.vendor.pk, 'Awa Koné', [500, 0, 1000]),
+                (self.other_vendor.pk, 'Yao Kouassi', [0, 500, 0]),
+            ],
+        )
+
+    def test_dates_inversees(self):
+        response = self.client.get(self.url, {'start_date': '2026-04-03', 'end_date': '2026-04-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_date', response.json())
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class SalesChartTests(SalesFixtureMixin, TestCase):
+    url = '/api/statistics/sales_chart/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sale_at(self, when, quantity=1):
+        sale = self.make_sale(quantity)
+        sale.save()
+        Sale.objects.filter(pk=sale.pk).update(created_at=when)
+
+    def chart(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['labels'], data['datasets'][1]['data']
+
+    def test_semaines_et_trimestres_a_cheval_sur_deux_mois(self):
+        self.sale_at(datetime(2026, 3, 30, 10, tzinfo=dt_timezone.utc))
+        self.sale_at(datetime(2026, 4, 2, 10, tzinfo=dt_timezone.utc))
+        self.sale_at(datetime(2026, 4, 14, 10, tzinfo=dt_timezone.utc))
+        dates = {'start_date': '2026-03-25', 'end_date': '2026-04-15'}
+
+        self.assertEqual(
+            self.chart(group_by='week', **dates),
+            (['2026-S13', '2026-S14', '2026-S15', '2026-S16'], [0, 2, 0, 1]),
+        )
+        self.assertEqual(
+            self.chart(group_by='quarter', **dates),
+            (['2026-T1', '2026-T2'], [1, 2]),
+        )
+
+    @override_settings(BUSINESS_TIME_ZONE='Asia/Tokyo')
+    def test_mois_dans_le_fuseau_metier(self):
+        # 31 mars 23:30 UTC = 1er avril 08:30 à Tokyo
+        self.sale_at(datetime(2026, 3, 31, 23, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            self.chart(group_by='month', start_date='2026-03-01', end_date='2026-04-30'),
+            (['2026-03', '2026-04'], [0, 1]),
+        )
+
+    def test_dates_inversees(self):
+        response = self.client.get(
+            self.url, {'start_date': '2026-04-15', 'end_date': '2026-03-25'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_date', response.json())
+
+
+# ── Résumé des ventes (SalesStatsMixin.summary) ──────────────────────────────
+
+@override_settings(CACHES=LOCAL_CACHE)
+class SalesSummaryTests(SalesFixtureMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other_user = User.objects.create_user('autre', password='secret')
+        other_vendor = MobileVendor.objects.create(
+            point_of_sale=create_point_of_sale(other_user),
+            first_name='Yao', last_name='Kouassi', phone='0703030303',
+        )
+        Purchase.objects.create(
+            vendor=other_vendor, first_name='Autre', last_name='Client', zone='Plateau',
+            amount=Decimal('0'), phone='0704040404',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def purchase_count(self, url):
+        response = self.client.get(url, {'vendor_id': self.vendor.pk})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['purchase_count']
+
+    def test_achats_du_vendeur(self):
+        self.assertEqual(self.purchase_count('/api/sales/summary/'), 1)
+
+    def test_points_de_vente_de_l_utilisateur(self):
+        create_point_of_sale(self.user)
+        self.assertEqual(self.purchase_count('/api/salespos/summary/'), 2)
+
+
+# ── Facettes des points de vente (facets.py, invalidation par signaux) ───────
+
+@override_settings(CACHES=LOCAL_CACHE)
+class FilterOptionsTests(TestCase):
+    url = '/api/points-of-vente/filter-options/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('gerant', password='secret')
+        cls.other = User.objects.create_user('autre', password='secret')
+        cls.pos = create_point_of_sale(cls.user, commune='Cocody')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def communes(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['counts']['communes']
+
+    def test_effectifs_apres_modifications(self):
+        self.assertEqual(self.communes(self.user), {'Cocody': 1})
+        self.assertEqual(self.communes(self.other), {})
+
+        create_point_of_sale(self.user, commune='Yopougon')
+        self.assertEqual(self.communes(self.user), {'Cocody': 1, 'Yopougon': 1})
+
+        # Réaffectation : les deux propriétaires sont recalculés
+        self.pos.user = self.other
+        self.pos.save()
+        self.assertEqual(self.communes(self.user), {'Yopougon': 1})
+        self.assertEqual(self.communes(self.other), {'Cocody': 1})
+
+        self.pos.delete()
+        self.assertEqual(self.communes(self.other), {})
+
+
+# ── Compression des réponses (middleware.py) ─────────────────────────────────
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"name": "Boutique Test", "commune": "Cocody"}' * 50
+
+    def compress(self, response, accept='gzip, deflate, br', path='/api/points-of-vente/'):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    @skipUnless(brotli, 'module brotli absent')
+    def test_brotli_prefere(self):
+        response = self.compress(HttpResponse(self.body, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+        self.assertEqual(response['X-Uncompressed-Length'], str(len(self.body)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_gzip(self):
+        response = self.compress(HttpResponse(self.body, content_type='application/json'), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_sans_accept_encoding(self):
+        response = self.compress(HttpResponse(self.body, content_type='application/json'), '')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_sous_le_seuil(self):
+        response = self.compress(HttpResponse(b'{"ok": true}', content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_streaming_compresse_quelle_que_soit_la_taille(self):
+        response = self.compress(
+            StreamingHttpResponse([b'{"ok": ', b'true}'], content_type='application/json'), 'gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'{"ok": true}')
+
+    def test_hors_api_et_no_compression(self):
+        response = self.compress(HttpResponse(self.body), path='/admin/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        view = no_compression(lambda request: HttpResponse(self.body, content_type='text/csv'))
+        response = self.compress(view(None))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ExportCompressionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('gerant', password='secret')
+        for index in range(20):
+            create_point_of_sale(cls.user, name=f'Boutique {index}')
+
+    def setUp(self):
+        self.client = APIClient(HTTP_ACCEPT_ENCODING='gzip')
+        self.client.force_authenticate(self.user)
+
+    def test_export_csv_non_compresse(self):
+        response = self.client.get('/api/points-of-vente/')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        response = self.client.post(
+            '/api/statistics/export_data/', {'format': 'csv', 'report_type': 'pos'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertGreater(len(response.content), 1024)
@@ -0,0 +1,343 @@
+# timeseries.py
+"""
+Séries temporelles des ventes (statistics/sales_timeseries et
+statistics/performance_metrics).
+
+La base ne renvoie qu'une ligne par (jour, entité) : une requête groupée,
+quel que soit le nombre de ventes. Tout le reste est fait avec pandas,
+toutes entités en même temps (une colonne par entité) :
+
+- complétion des jours sans vente (0) sur toute la plage demandée ;
+- regroupement en jour / semaine ISO (lundi) / mois / trimestre / année ;
+- moyenne mobile et croissance d'une période sur l'autre ;
+- indicateurs de performance (panier moyen, jours actifs, tendance...).
+
+Séries disponibles : revenue (Sum total_amount), quantity, count.
+Découpage : aucun (total), vendor, point_of_sale ou product.
+
+Le regroupement temporel est partagé par tous les graphiques : les bornes
+et les troncatures (jour, semaine ISO, mois, trimestre, année) sont
+calculées dans le fuseau métier settings.BUSINESS_TIME_ZONE, et `bucketed`
+renvoie des périodes ordonnées, complétées par 0 quand elles sont vides.
+"""
+import datetime
+import zoneinfo
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Count, DateField, DecimalField, F, IntegerField, Sum, Value
+from django.db.models.functions import (
+    Coalesce, Concat, TruncDay, TruncMonth, TruncQuarter, TruncWeek, TruncYear,
+)
+from rest_framework.exceptions import ValidationError
+
+SERIES = {
+    'revenue': Coalesce(Sum('total_amount'), 0, output_field=DecimalField(max_digits=15, decimal_places=2)),
+    'quantity': Coalesce(Sum('quantity'), 0, output_field=IntegerField()),
+    'count': Count('id'),
+}
+INTEGER_SERIES = ('quantity', 'count')
+
+# Découpage : (clé, libellé) lus dans la même requête groupée
+SPLITS = {
+    'vendor': ('vendor_id', Concat('vendor__first_name', Value(' '), 'vendor__last_name')),
+    'point_of_sale': ('point_of_sale_id', F('point_of_sale__name')),
+    'product': ('product_variant__product_id', F('product_variant__product__name')),
+}
+
+# Période pandas pour chaque regroupement (semaine ISO : du lundi au dimanche)
+INTERVALS = {'day': 'D', 'week': 'W-SUN', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+TRUNCATES = {
+    'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth,
+    'quarter': TruncQuarter, 'year': TruncYear,
+}
+DEFAULT_WINDOWS = {'day': 7, 'week': 4, 'month': 3, 'quarter': 4, 'year': 2}
+DEFAULT_TOP = 10
+MAX_TOP = 50
+
+TOTAL_KEY = 'total'
+
+
+# ── Regroupement temporel ───────────────────────────────────────────────────
+
+def business_timezone():
+    return zoneinfo.ZoneInfo(getattr(settings, 'BUSINESS_TIME_ZONE', 'Africa/Abidjan'))
+
+
+def local_date(value, tz=None):
+    """Date d'un datetime (aware) dans le fuseau métier."""
+    return value.astimezone(tz or business_timezone()).date()
+
+
+def day_bounds(start, end, tz=None):
+    """[start 00:00, lendemain de end 00:00[ en datetimes aware du fuseau métier."""
+    tz = tz or business_timezone()
+    lower = datetime.datetime.combine(start, datetime.time.min, tzinfo=tz)
+    upper = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz)
+    return lower, upper
+
+
+def truncate(field, interval, tz=None):
+    """Début de période (date) de `field` dans le fuseau métier."""
+    return TRUNCATES[interval](field, output_field=DateField(), tzinfo=tz or business_timezone())
+
+
+def bucket_starts(start, end, interval):
+    """Débuts de toutes les périodes qui recouvrent [start, end], dans l'ordre."""
+    periods = pd.period_range(start, end, freq=INTERVALS[interval])
+    return [period.start_time.date() for period in periods]
+
+
+def bucket_label(day, interval):
+    if interval == 'week':
+        year, week, _ = day.isocalendar()
+        return f'{year}-S{week:02d}'
+    if interval == 'month':
+        return day.strftime('%Y-%m')
+    if interval == 'quarter':
+        return f'{day.year}-T{(day.month - 1) // 3 + 1}'
+    if interval == 'year':
+        return str(day.year)
+    return day.isoformat()
+
+
+def bucketed(queryset, interval, start, end, field='created_at', **aggregates):
+    """
+    [(début de période, {agrégat: valeur})] sur [start, end] (dates du fuseau
+    métier), une requête groupée ; les périodes sans ligne valent 0.
+    """
+    tz = business_timezone()
+    lower, upper = day_bounds(start, end, tz)
+    rows = (
+        queryset
+        .filter(**{f'{field}__gte': lower, f'{field}__lt': upper})
+        .order_by()
+        .values(bucket=truncate(field, interval, tz))
+        .annotate(**aggregates)
+    )
+    found = {row.pop('bucket'): row for row in rows}
+    empty = dict.fromkeys(aggregates, 0)
+    return [(day, found.get(day, empty)) for day in bucket_starts(start, end, interval)]
+
+
+# ── Paramètres ──────────────────────────────────────────────────────────────
+
+def parse_series(value):
+    if not value:
+        return list(SERIES)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SERIES]
+    if unknown or not names:
+        raise ValidationError({'series': f"Séries possibles : {', '.join(SERIES)}"})
+    return list(dict.fromkeys(names))
+
+
+def parse_choice(value, choices, name, default):
+    if not value:
+        return default
+    if value not in choices:
+        raise ValidationError({name: f"Valeurs possibles : {', '.join(choices)}"})
+    return value
+
+
+def parse_positive_int(value, name, default, maximum):
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Entier attendu"})
+    if number < 1:
+        raise ValidationError({name: "Doit être supérieur ou égal à 1"})
+    return min(number, maximum)
+
+
+# ── Lecture ─────────────────────────────────────────────────────────────────
+
+def daily_frame(queryset, series, split=None):
+    """
+    DataFrame (day, key, label, <séries>) : une ligne par jour et par entité.
+    Sans découpage, key vaut TOTAL_KEY.
+    """
+    group = {'day': truncate('created_at', 'day')}
+    if split is not None:
+        key, label = SPLITS[split]
+        group.update(key=F(key), label=label)
+
+    rows = (
+        queryset
+        .order_by()
+        .values(**group)
+        .annotate(**{name: SERIES[name] for name in series})
+    )
+    frame = pd.DataFrame.from_records(
+        list(rows), columns=['day', 'key', 'label', *series] if split else ['day', *series]
+    )
+    if split is None:
+        frame['key'] = TOTAL_KEY
+        frame['label'] = None
+    frame = frame.dropna(subset=['key'])
+    frame['day'] = pd.to_datetime(frame['day'])
+    for name in series:
+        frame[name] = frame[name].astype(float)
+    return frame
+
+
+def _daily_table(frame, name, days):
+    """Jours x entités, jours sans vente complétés par 0."""
+    if frame.empty:
+        return pd.DataFrame(index=days)
+    table = frame.pivot_table(index='day', columns='key', values=name, aggfunc='sum')
+    return table.reindex(days).fillna(0.0)
+
+
+def _bucket(table, interval):
+    periods = table.index.to_period(INTERVALS[interval])
+    return table.groupby(periods).sum()
+
+
+def _labels(frame):
+    return frame.drop_duplicates('key').set_index('key')['label'].to_dict()
+
+
+def _values(series, integer=False):
+    """Série pandas → liste JSON (NaN / inf → None, arrondi à 2 décimales)."""
+    if integer:
+        return [int(value) for value in series]
+    series = series.replace([np.inf, -np.inf], np.nan).round(2)
+    return [None if pd.isna(value) else float(value) for value in series]
+
+
+# ── Séries temporelles ──────────────────────────────────────────────────────
+
+def _derive(table, window):
+    moving = table.rolling(window, min_periods=1).mean()
+    growth = table.pct_change(fill_method=None) * 100
+    return moving, growth
+
+
+def build_timeseries(frame, series, start, end, interval='day', window=None, top=DEFAULT_TOP):
+    """
+    Séries regroupées par `interval` pour chaque entité et pour le total.
+    Les entités sont limitées aux `top` premières selon la première série.
+    """
+    window = window or DEFAULT_WINDOWS[interval]
+    days = pd.date_range(start, end, freq='D', name='day')
+
+    tables = {name: _bucket(_daily_table(frame, name, days), interval) for name in series}
+    ranking = tables[series[0]].sum().sort_values(ascending=False)
+    keys = list(ranking.index[:top])
+    labels = _labels(frame)
+
+    periods = next(iter(tables.values())).index
+    result = {
+        'interval': interval,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'window': window,
+        'series': series,
+        'labels': [period.start_time.date().isoformat() for period in periods],
+        'total': {},
+        'groups': [{'key': key, 'label': labels.get(key)} for key in keys],
+    }
+
+    for name, table in tables.items():
+        total = table.sum(axis=1) if len(table.columns) else pd.Series(0.0, index=table.index)
+        total_moving, total_growth = _derive(total, window)
+        result['total'].update({
+            name: _values(total, name in INTEGER_SERIES),
+            f'{name}_moving_average': _values(total_moving),
+            f'{name}_growth': _values(total_growth),
+        })
+
+        table = table[keys]
+        moving, growth = _derive(table, window)
+        for group in result['groups']:
+            key = group['key']
+            group.update({
+                name: _values(table[key], name in INTEGER_SERIES),
+                f'{name}_moving_average': _values(moving[key]),
+                f'{name}_growth': _values(growth[key]),
+            })
+
+    if frame['key'].eq(TOTAL_KEY).all():
+        # Sans découpage, le total suffit
+        result['groups'] = []
+    return result
+
+
+# ── Indicateurs de performance ──────────────────────────────────────────────
+
+def build_performance(frame, start, end, previous_start, top=DEFAULT_TOP):
+    """
+    Indicateurs par entité sur [start, end], comparés à [previous_start, start[.
+    `frame` couvre les deux périodes (revenue, quantity et count requis).
+    """
+    current_days = pd.date_range(start, end, freq='D', name='day')
+    previous_days = pd.date_range(previous_start, start - pd.Timedelta(days=1), freq='D', name='day')
+    current = frame[frame['day'] >= pd.Timestamp(start)]
+    previous = frame[frame['day'] < pd.Timestamp(start)]
+
+    revenue = _daily_table(current, 'revenue', current_days)
+    count = _daily_table(current, 'count', current_days).reindex(columns=revenue.columns, fill_value=0.0)
+    quantity = _daily_table(current, 'quantity', current_days).reindex(columns=revenue.columns, fill_value=0.0)
+    previous_revenue = (
+        _daily_table(previous, 'revenue', previous_days)
+        .sum()
+        .reindex(revenue.columns, fill_value=0.0)
+    )
+
+    total_revenue = revenue.sum()
+    total_count = count.sum()
+    metrics = pd.DataFrame({
+        'revenue': total_revenue,
+        'quantity': quantity.sum(),
+        'count': total_count,
+        'average_basket': total_revenue / total_count.replace(0, np.nan),
+        'active_days': (count > 0).sum(),
+        'average_daily_revenue': total_revenue / len(current_days),
+        'previous_revenue': previous_revenue,
+        'growth': (total_revenue - previous_revenue) / previous_revenue.replace(0, np.nan) * 100,
+        # Écart-type / moyenne du CA journalier : régularité de l'activité
+        'volatility': revenue.std(ddof=0) / revenue.mean().replace(0, np.nan),
+    })
+
+    if len(revenue.columns) and len(current_days) > 1:
+        # Pente de la régression linéaire du CA journalier (FCFA / jour),
+        # toutes les entités d'un coup
+        x = np.arange(len(current_days), dtype=float)
+        metrics['trend'] = np.polyfit(x, revenue.to_numpy(), 1)[0]
+    else:
+        metrics['trend'] = 0.0
+    if len(revenue.columns):
+        best = revenue.idxmax()
+        metrics['best_day'] = [
+            day.date().isoformat() if total else None
+            for day, total in zip(best, total_revenue)
+        ]
+    else:
+        metrics['best_day'] = []
+
+    metrics = metrics.sort_values('revenue', ascending=False).head(top)
+    labels = _labels(frame)
+    numeric = [column for column in metrics.columns if column != 'best_day']
+    rounded = metrics[numeric].replace([np.inf, -np.inf], np.nan).round(2)
+
+    results = []
+    for key, row in rounded.iterrows():
+        item = {'key': key, 'label': labels.get(key)}
+        item.update({name: None if pd.isna(value) else float(value) for name, value in row.items()})
+        item['quantity'] = int(item['quantity'])
+        item['count'] = int(item['count'])
+        item['active_days'] = int(item['active_days'])
+        item['best_day'] = metrics.at[key, 'best_day']
+        results.append(item)
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'previous_start': previous_start.isoformat(),
+        'days': len(current_days),
+        'results': results,
+    }
@@ -0,0 +1,206 @@
+# trails.py
+"""
+Traces GPS des vendeurs ambulants (VendorGPSPoint).
+
+Les points arrivent par paquets depuis l'application mobile. La distance
+parcourue est calculée avec numpy sur les segments consécutifs d'une même
+journée ; les segments aberrants (vitesse impossible, précision trop faible)
+sont ignorés. Le total mensuel alimente VendorPerformance.distance_covered
+(en kilomètres).
+
+Un paquet qui prolonge la trace (cas normal) n'ajoute que ses propres
+segments, à partir du dernier point déjà enregistré : le coût d'un envoi ne
+dépend pas du nombre de points du mois. Un paquet qui s'intercale dans la
+trace existante (envoi tardif, doublons) fait recalculer le mois entier.
+distance_covered est stocké sans arrondi, pour que la somme des paquets ne
+dérive pas du recalcul ; store_points et update_distance_covered renvoient
+des kilomètres arrondis au mètre.
+Journées et mois sont découpés dans le fuseau métier (BUSINESS_TIME_ZONE).
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .geo import EARTH_RADIUS_M
+from .models import MobileVendor, VendorGPSPoint, VendorPerformance
+from .timeseries import business_timezone, day_bounds, local_date
+
+# Au-delà, le segment est considéré comme un saut GPS (≈ 126 km/h)
+MAX_SPEED_MS = 35.0
+# Points dont la précision annoncée est moins bonne : ignorés
+MAX_ACCURACY_M = 100.0
+MAX_UPLOAD_POINTS = 5000
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Distance en mètres, vectorisée sur des tableaux numpy."""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _arrays(rows):
+    """(secondes epoch, latitudes, longitudes, précisions) depuis values_list."""
+    if not rows:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+    timestamps, lats, lngs, accuracies = zip(*rows)
+    seconds = np.fromiter((ts.timestamp() for ts in timestamps), dtype=float, count=len(rows))
+    accuracy = np.array([np.nan if acc is None else acc for acc in accuracies], dtype=float)
+    return seconds, np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float), accuracy
+
+
+def trail_distance_m(seconds, lats, lngs, accuracy=None):
+    """
+    Distance cumulée d'une trace triée par horodatage. Les segments à
+    cheval sur deux journées (fuseau métier) ne comptent pas.
+    """
+    if accuracy is not None and len(accuracy):
+        keep = ~(accuracy > MAX_ACCURACY_M)
+        seconds, lats, lngs = seconds[keep], lats[keep], lngs[keep]
+    if len(seconds) < 2:
+        return 0.0
+
+    segments = haversine_m(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    elapsed = np.diff(seconds)
+    offset = datetime.fromtimestamp(seconds[0], business_timezone()).utcoffset().total_seconds()
+    days = np.floor((seconds + offset) / 86400)
+    valid = (elapsed > 0) & (np.diff(days) == 0)
+    valid &= segments <= MAX_SPEED_MS * np.where(elapsed > 0, elapsed, 1)
+    return float(segments[valid].sum())
+
+
+def _month_bounds(month):
+    next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return day_bounds(month, next_month - timedelta(days=1))
+
+
+def points_between(vendor_id, start, end):
+    return (
+        VendorGPSPoint.objects
+        .filter(vendor_id=vendor_id, timestamp__gte=start, timestamp__lt=end)
+        .order_by('timestamp')
+        .values_list('timestamp', 'latitude', 'longitude', 'accuracy')
+    )
+
+
+def update_distance_covered(vendor_id, month):
+    """Recalcule distance_covered (km) du mois `month` (premier jour)."""
+    start, end = _month_bounds(month)
+    distance_km = trail_distance_m(*_arrays(list(points_between(vendor_id, start, end)))) / 1000
+    VendorPerformance.objects.update_or_create(
+        vendor_id=vendor_id, month=month, defaults={'distance_covered': distance_km}
+    )
+    return round(distance_km, 3)
+
+
+def _row(point):
+    return point['timestamp'], point['latitude'], point['longitude'], point.get('accuracy')
+
+
+def _append_distance(vendor_id, month, points):
+    """
+    Distance (km) ajoutée par `points` (triés, pas encore enregistrés) s'ils
+    prolongent la trace du mois ; None s'ils s'intercalent dans la trace.
+    """
+    start, end = _month_bounds(month)
+    stored = VendorGPSPoint.objects.filter(vendor_id=vendor_id, timestamp__gte=start, timestamp__lt=end)
+    last_timestamp = stored.aggregate(last=Max('timestamp'))['last']
+    if last_timestamp is not None and last_timestamp >= points[0]['timestamp']:
+        return None
+
+    # Dernier point exploitable (précision suffisante) : origine du premier segment
+    previous = (
+        stored
+        .filter(Q(accuracy__isnull=True) | Q(accuracy__lte=MAX_ACCURACY_M))
+        .order_by('-timestamp')
+        .values_list('timestamp', 'latitude', 'longitude', 'accuracy')
+        .first()
+    )
+    rows = ([previous] if previous else []) + [_row(point) for point in points]
+    return trail_distance_m(*_arrays(rows)) / 1000
+
+
+def _lock_month(vendor_id, month):
+    """
+    Verrouille la ligne VendorPerformance du mois avant toute lecture de la
+    trace : deux envois simultanés du même vendeur passent l'un après
+    l'autre, le second part du dernier point du premier. Un UPDATE plutôt
+    que select_for_update : sur SQLite, c'est la première écriture de la
+    transaction qui prend le verrou.
+    """
+    locked = (
+        VendorPerformance.objects
+        .filter(vendor_id=vendor_id, month=month)
+        .update(updated_at=timezone.now())
+    )
+    if not locked:
+        VendorPerformance.objects.get_or_create(vendor_id=vendor_id, month=month)
+
+
+def _add_distance_covered(vendor_id, month, distance_km):
+    performance = VendorPerformance.objects.filter(vendor_id=vendor_id, month=month)
+    performance.update(distance_covered=F('distance_covered') + distance_km, updated_at=timezone.now())
+    return round(performance.values_list('distance_covered', flat=True).get(), 3)
+
+
+@transaction.atomic
+def store_points(vendor, points):
+    """
+    Enregistre un paquet de points validés ({timestamp, latitude, longitude,
+    accuracy}). Les doublons (même horodatage) sont ignorés. Retourne la
+    distance du mois par mois touché.
+    """
+    unique = {}
+    for point in sorted(points, key=lambda point: point['timestamp']):
+        unique.setdefault(point['timestamp'], point)
+    points = list(unique.values())
+
+    months = {}
+    for point in points:
+        months.setdefault(local_date(point['timestamp']).replace(day=1), []).append(point)
+    # Verrous dans l'ordre des mois, puis distance ajoutée calculée avant
+    # l'insertion : les segments ajoutés partent de la trace existante
+    for month in sorted(months):
+        _lock_month(vendor.pk, month)
+    added = {month: _append_distance(vendor.pk, month, batch) for month, batch in months.items()}
+
+    VendorGPSPoint.objects.bulk_create(
+        [VendorGPSPoint(vendor=vendor, **point) for point in points],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+    latest = points[-1]
+    MobileVendor.record_location(
+        vendor.pk,
+        {'latitude': latest['latitude'], 'longitude': latest['longitude']},
+        latest['timestamp'],
+    )
+
+    distances = {}
+    for month in sorted(months):
+        if added[month] is None:
+            distances[month.isoformat()] = update_distance_covered(vendor.pk, month)
+        else:
+            distances[month.isoformat()] = _add_distance_covered(vendor.pk, month, added[month])
+    return distances
+
+
+def day_trail(vendor_id, day):
+    """Trace d'une journée en colonnes, pour rejouer le parcours côté carte."""
+    start, end = day_bounds(day, day)
+    rows = list(points_between(vendor_id, start, end))
+    seconds, lats, lngs, accuracy = _arrays(rows)
+    return {
+        'date': day.isoformat(),
+        'count': len(rows),
+        'distance_km': round(trail_distance_m(seconds, lats, lngs, accuracy) / 1000, 3),
+        'timestamps': [row[0].isoformat() for row in rows],
+        'latitudes': lats.tolist(),
+        'longitudes': lngs.tolist(),
+    }
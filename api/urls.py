@@ -15,7 +15,8 @@ from .views import (
     NotificationListCreateView, NotificationDetailView,
     DashboardView, StockOverviewView,PurchaseViewSetDataPOS,
     ProductFormatListCreateView,ProductFormatDetailView, SaleViewSet,SaleViewSetPOS,
-    ProductVariantListCreateView, ProductVariantDetailView  # Nouveaux endpoints ajoutés
+    ProductVariantListCreateView, ProductVariantDetailView,  # Nouveaux endpoints ajoutés
+    ProductScanView,
 )
 from .views import MobileVendorViewSet, VendorActivityViewSet, VendorPerformanceViewSet, PurchaseViewSet,VendorActivitySummaryViewSet,PurchaseViewSetData
 
@@ -90,6 +91,7 @@ urlpatterns = [
     
     # Produits
     path('products/', ProductListCreateView.as_view(), name='product-list-create'),
+    path('products/scan/', ProductScanView.as_view(), name='product-scan'),
     path('products/<int:id>/', ProductDetailView.as_view(), name='product-detail'),
     
     # Produits-formats
@@ -138,6 +140,9 @@ urlpatterns = [
     path('category-sales/', CategorySalesView.as_view(), name='category-sales'),
     path('sales-trend/', SalesTrendView.as_view(), name='sales-trend'),
     path('carte/', views.get_customer_sales, name='customer-sales-sales'),
+    path('carte/clusters/', views.get_map_clusters, name='map-clusters'),
+    path('carte/nearest/', views.get_nearest, name='map-nearest'),
+    path('carte/heatmap/<int:z>/<int:x>/<int:y>/', views.get_sales_heatmap, name='sales-heatmap'),
     path('pointsaleorders/', views.get_point_of_sale_orders_simple, name='pos-orders-simple'),
 
     # Routes spécifiques pour un accès rapide
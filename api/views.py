@@ -23,6 +23,12 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from decimal import Decimal
 from rest_framework import serializers
+from .scope import get_user_scope
+from .fieldsets import SparseFieldsetViewMixin, sparse_queryset
+from .fast_serializers import ValuesListMixin
+from .geo import GeoAreaFilter
+from . import scan
+from django.core.files.storage import default_storage
 
 
 
@@ -201,9 +207,10 @@ class UserProfileDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user_profile = self.request.user.profile
+        scope = get_user_scope(self.request)
+        user_profile = scope.get_profile()
         return UserProfile.objects.filter(
-            points_of_sale__in=user_profile.points_of_sale.all(),
+            points_of_sale__in=scope.pos_ids,
             establishment_name=user_profile.establishment_name
         ).select_related(
             'user', 'role'
@@ -239,9 +246,9 @@ class ProductListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
+        user_pos_ids = get_user_scope(self.request).pos_ids
         return Product.objects.filter(
-            point_of_sale__in=user_pos
+            point_of_sale_id__in=user_pos_ids
         ).select_related('category', 'supplier', 'point_of_sale')
 
     def perform_create(self, serializer):
@@ -249,8 +256,7 @@ class ProductListCreateView(generics.ListCreateAPIView):
         point_of_sale = serializer.validated_data.get('point_of_sale')
         
         if point_of_sale:
-            user_pos_ids = [pos.id for pos in self.request.user.profile.points_of_sale.all()]
-            if point_of_sale.id not in user_pos_ids:
+            if not get_user_scope(self.request).has_pos(point_of_sale):
                 raise serializers.ValidationError(
                     {"point_of_sale": "Vous n'avez pas accès à ce point de vente"}
                 )
@@ -263,17 +269,16 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
+        user_pos_ids = get_user_scope(self.request).pos_ids
         return Product.objects.filter(
-            point_of_sale__in=user_pos
+            point_of_sale_id__in=user_pos_ids
         ).select_related('category', 'supplier', 'point_of_sale')
 
     def perform_update(self, serializer):
         # Vérifier que le nouveau POS fait partie de ceux de l'utilisateur
         point_of_sale_id = serializer.validated_data.get('point_of_sale', {}).get('id')
         if point_of_sale_id:
-            user_pos_ids = [str(pos.id) for pos in self.request.user.profile.points_of_sale.all()]
-            if str(point_of_sale_id) not in user_pos_ids:
+            if not get_user_scope(self.request).has_pos(point_of_sale_id):
                 raise serializers.ValidationError(
                     {"point_of_sale": "Vous n'avez pas accès à ce point de vente"}
                 )
@@ -300,27 +305,25 @@ class StockMovementListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
+        user_pos_ids = get_user_scope(self.request).pos_ids
         return StockMovement.objects.filter(
-            product_variant__product__point_of_sale__in=user_pos
+            product_variant__product__point_of_sale_id__in=user_pos_ids
         ).select_related('product_variant__product', 'user').order_by('-date')
 
     def get_serializer(self, *args, **kwargs):
         # Filtrer les ProductVariant disponibles pour l'utilisateur
         serializer = super().get_serializer(*args, **kwargs)
         if hasattr(serializer, 'fields') and 'product_variant_id' in serializer.fields:
-            user_pos = self.request.user.profile.points_of_sale.all()
+            user_pos_ids = get_user_scope(self.request).pos_ids
             serializer.fields['product_variant_id'].queryset = ProductVariant.objects.filter(
-                product__point_of_sale__in=user_pos
+                product__point_of_sale_id__in=user_pos_ids
             )
         return serializer
 
     def perform_create(self, serializer):
         # Vérifier que le produit fait partie d'un POS accessible
         product_variant = serializer.validated_data.get('product_variant')
-        user_pos_ids = [str(pos.id) for pos in self.request.user.profile.points_of_sale.all()]
-        
-        if str(product_variant.product.point_of_sale.id) not in user_pos_ids:
+        if not get_user_scope(self.request).has_pos(product_variant.product.point_of_sale_id):
             raise serializers.ValidationError(
                 {"product_variant": "Vous n'avez pas accès à ce produit"}
             )
@@ -334,17 +337,16 @@ class StockMovementDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
+        user_pos_ids = get_user_scope(self.request).pos_ids
         return StockMovement.objects.filter(
-            product_variant__product__point_of_sale__in=user_pos
+            product_variant__product__point_of_sale_id__in=user_pos_ids
         ).select_related('product_variant__product', 'user')
 
     def perform_update(self, serializer):
         # Vérifier que le nouveau produit fait partie d'un POS accessible
         product_variant = serializer.validated_data.get('product_variant')
         if product_variant:
-            user_pos_ids = [str(pos.id) for pos in self.request.user.profile.points_of_sale.all()]
-            if str(product_variant.product.point_of_sale.id) not in user_pos_ids:
+            if not get_user_scope(self.request).has_pos(product_variant.product.point_of_sale_id):
                 raise serializers.ValidationError(
                     {"product_variant": "Vous n'avez pas accès à ce produit"}
                 )
@@ -359,17 +361,15 @@ class ProductVariantListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
+        user_pos_ids = get_user_scope(self.request).pos_ids
         return ProductVariant.objects.filter(
-            product__point_of_sale__in=user_pos
+            product__point_of_sale_id__in=user_pos_ids
         ).select_related('product', 'format')
 
     def perform_create(self, serializer):
         # Vérifier que le produit parent fait partie d'un POS accessible
         product = serializer.validated_data.get('product')
-        user_pos_ids = [str(pos.id) for pos in self.request.user.profile.points_of_sale.all()]
-        
-        if str(product.point_of_sale.id) not in user_pos_ids:
+        if not get_user_scope(self.request).has_pos(product.point_of_sale_id):
             raise serializers.ValidationError(
                 {"product": "Vous n'avez pas accès à ce produit"}
             )
@@ -383,22 +383,100 @@ class ProductVariantDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
+        user_pos_ids = get_user_scope(self.request).pos_ids
         return ProductVariant.objects.filter(
-            product__point_of_sale__in=user_pos
+            product__point_of_sale_id__in=user_pos_ids
         ).select_related('product', 'format')
 
     def perform_update(self, serializer):
         # Vérifier que le nouveau produit parent fait partie d'un POS accessible
         product = serializer.validated_data.get('product')
         if product:
-            user_pos_ids = [str(pos.id) for pos in self.request.user.profile.points_of_sale.all()]
-            if str(product.point_of_sale.id) not in user_pos_ids:
+            if not get_user_scope(self.request).has_pos(product.point_of_sale_id):
                 raise serializers.ValidationError(
                     {"product": "Vous n'avez pas accès à ce produit"}
                 )
         serializer.save()
 
+
+class ProductScanView(APIView):
+    """
+    Lecture de codes-barres / SKU (voir scan.py).
+
+        GET  /api/products/scan/?code=3017620422003
+        POST /api/products/scan/  {"codes": ["3017620422003", "SKU-001", ...]}
+
+    Les codes hors du périmètre de l'utilisateur sont renvoyés comme inconnus.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        code = scan.normalize_code(request.query_params.get('code'))
+        if not code:
+            return Response({"error": "Paramètre 'code' requis"}, status=400)
+        result = self._resolve(request, [code])[0]
+        if not result['found']:
+            return Response(result, status=404)
+        return Response(result)
+
+    def post(self, request):
+        codes = request.data.get('codes') if isinstance(request.data, dict) else None
+        if not isinstance(codes, list) or not codes:
+            return Response({"error": "'codes' doit être une liste non vide"}, status=400)
+        if len(codes) > scan.SCAN_MAX_CODES:
+            return Response(
+                {"error": f"{scan.SCAN_MAX_CODES} codes maximum par lot"}, status=400
+            )
+        codes = list(dict.fromkeys(filter(None, map(scan.normalize_code, codes))))
+        results = self._resolve(request, codes)
+        return Response({
+            'count': len(results),
+            'found': sum(1 for result in results if result['found']),
+            'results': results,
+        })
+
+    def _resolve(self, request, codes):
+        scope = get_user_scope(request)
+        matches = scan.lookup(codes)
+        matches = {
+            code: match for code, match in matches.items()
+            if match is not None and scope.has_pos(match[2]['point_of_sale_id'])
+        }
+        stocks = scan.current_stocks([
+            variant['id'] for match in matches.values() for variant in match[2]['variants']
+        ])
+
+        results = []
+        for code in codes:
+            match = matches.get(code)
+            if match is None:
+                results.append({'code': code, 'found': False})
+                continue
+            kind, variant_id, product = match
+            results.append({
+                'code': code,
+                'found': True,
+                'match': kind,
+                'variant_id': variant_id,
+                'product': {
+                    key: product[key] for key in ('id', 'name', 'sku', 'point_of_sale_id')
+                },
+                'variants': [
+                    {
+                        'id': variant['id'],
+                        'barcode': variant['barcode'],
+                        'format': variant['format'],
+                        'price': str(variant['price']),
+                        'current_stock': stocks.get(variant['id']),
+                        'image': request.build_absolute_uri(default_storage.url(variant['image']))
+                        if variant['image'] else None,
+                    }
+                    for variant in product['variants']
+                ],
+            })
+        return results
+
+
 class OrderListCreateView(generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -408,14 +486,14 @@ class OrderListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
-        return Order.objects.filter(
-            point_of_sale__in=user_pos
-        ).select_related('point_of_sale').prefetch_related('items')
+        user_pos_ids = get_user_scope(self.request).pos_ids
+        queryset = Order.objects.filter(point_of_sale_id__in=user_pos_ids)
+        # point_of_sale_details / items chargés seulement s'ils sont renvoyés
+        return sparse_queryset(queryset, self.get_serializer_class(), self.request)
 
     def perform_create(self, serializer):
         # Récupérer le profil de l'utilisateur connecté comme customer
-        user_profile = self.request.user.profile  # ← Ajouter .profile ici
+        user_profile = get_user_scope(self.request).get_profile()
         
         # Récupérer le point de vente depuis les données validées
         point_of_sale = serializer.validated_data.get('point_of_sale')
@@ -423,7 +501,7 @@ class OrderListCreateView(generics.ListCreateAPIView):
         # Si point_of_sale est fourni (cas où vous voulez le surcharger)
         if point_of_sale:
             # Vérifier que l'utilisateur a accès à ce POS
-            if not self.request.user.profile.points_of_sale.filter(id=point_of_sale.id).exists():
+            if not get_user_scope(self.request).has_pos(point_of_sale):
                 raise serializers.ValidationError(
                     {"point_of_sale": "Vous n'avez pas accès à ce point de vente"}
                 )
@@ -445,10 +523,9 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         # Récupérer les POS de l'utilisateur connecté
-        user_pos = self.request.user.profile.points_of_sale.all()
-        return Order.objects.filter(
-            point_of_sale__in=user_pos
-        ).select_related('point_of_sale')
+        user_pos_ids = get_user_scope(self.request).pos_ids
+        queryset = Order.objects.filter(point_of_sale_id__in=user_pos_ids)
+        return sparse_queryset(queryset, self.get_serializer_class(), self.request)
 
     def perform_update(self, serializer):
         point_of_sale = serializer.validated_data.get('point_of_sale')
@@ -460,7 +537,7 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
             else:
                 point_of_sale_id = point_of_sale
             
-            has_access = self.request.user.profile.points_of_sale.filter(id=point_of_sale_id).exists()
+            has_access = get_user_scope(self.request).has_pos(point_of_sale_id)
             
             if not has_access:
                 raise serializers.ValidationError(
@@ -469,16 +546,16 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
         
         serializer.save()
 
-class DisputeListCreateView(generics.ListCreateAPIView):
-    queryset = Dispute.objects.select_related('order', 'complainant')
+class DisputeListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
+    queryset = Dispute.objects.all()
     serializer_class = DisputeSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['order', 'complainant', 'status']
     search_fields = ['description']
 
-class DisputeDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Dispute.objects.select_related('order', 'complainant')
+class DisputeDetailView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Dispute.objects.all()
     serializer_class = DisputeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -547,8 +624,10 @@ class DashboardView(APIView):
     def get(self, request):
         try:
             # Get POS associated with the user
-            user_profile = UserProfile.objects.get(user=request.user)
-            user_pos = user_profile.points_of_sale.all()
+            scope = get_user_scope(request)
+            if not scope.has_profile:
+                raise UserProfile.DoesNotExist
+            user_pos = scope.points_of_sale()
             if not user_pos.exists():
                 return Response(
                     {"error": "Aucun point de vente associé à cet utilisateur"},
@@ -862,8 +941,10 @@ class StockOverviewView(APIView):
 
     def get(self, request):
         try:
-            user_profile = UserProfile.objects.get(user=request.user)
-            user_pos = user_profile.points_of_sale.all()
+            scope = get_user_scope(request)
+            if not scope.has_profile:
+                raise UserProfile.DoesNotExist
+            user_pos = scope.points_of_sale()
 
             if not user_pos.exists():
                 return Response(
@@ -976,8 +1057,14 @@ from .serializers import (
     VendorActivitySummarySerializer,
     PurchaseSerializer1  # Vous devrez créer ce serializer
 )
+from django.shortcuts import get_object_or_404
+from .serializers import GPSPointSerializer
+from . import trails
+from .timeseries import local_date
+from .performance import current_month, previous_month
+from . import sales_stats
 
-class MobileVendorViewSet(viewsets.ModelViewSet):
+class MobileVendorViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = MobileVendor.objects.select_related('point_of_sale', 'user').prefetch_related(
         Prefetch('purchases', queryset=Purchase.objects.annotate(
             total_sales=Sum('purchases__total_amount')
@@ -1034,16 +1121,25 @@ class MobileVendorViewSet(viewsets.ModelViewSet):
             total=Sum('total_amount')
         )['total'] or 0
         
+        # Performances du mois en cours et du mois précédent : lignes
+        # matérialisées par la commande planifiée (voir performance.py),
+        # lues en une requête
+        month = current_month()
+        last_month = previous_month(month)
+        scores = dict(
+            VendorPerformance.objects.filter(
+                vendor=vendor, month__in=[month, last_month]
+            ).values_list('month', 'performance_score')
+        )
+        
         stats = {
             'total_sales': total_sales,  # Utilisation du vrai total des ventes
             'active_days': VendorActivity.objects.filter(
                 vendor=vendor,
                 activity_type__in=['check_in', 'sale']
             ).dates('timestamp', 'day').distinct().count(),
-            'current_performance': vendor.performance,
-            'last_month_performance': VendorPerformance.objects.filter(
-                vendor=vendor
-            ).order_by('-month').first().performance_score if VendorPerformance.objects.filter(vendor=vendor).exists() else 0
+            'current_performance': scores.get(month, 0),
+            'last_month_performance': scores.get(last_month, 0)
         }
         return Response(stats)
 
@@ -1059,6 +1155,53 @@ class MobileVendorViewSet(viewsets.ModelViewSet):
         vendors = MobileVendor.objects.filter(point_of_sale_id=pos_id)
         serializer = self.get_serializer(vendors, many=True)
         return Response(serializer.data)
+
+    @action(detail=True, methods=['get', 'post'], permission_classes=[permissions.IsAuthenticated])
+    def trail(self, request, pk=None):
+        """
+        Trace GPS du vendeur.
+
+        POST {"points": [{"timestamp", "latitude", "longitude", "accuracy"}, ...]}
+            ajoute un lot de points (doublons ignorés) et met à jour
+            distance_covered des mois concernés. Réservé au vendeur lui-même.
+        GET ?date=AAAA-MM-JJ (aujourd'hui par défaut)
+            renvoie la trace du jour en colonnes pour la rejouer. Réservé au
+            vendeur et aux utilisateurs dont le périmètre couvre son point de vente.
+        """
+        vendor = get_object_or_404(
+            MobileVendor.objects.only('id', 'user_id', 'point_of_sale_id'), pk=pk
+        )
+        is_owner = vendor.user_id is not None and vendor.user_id == request.user.pk
+
+        if request.method == 'GET':
+            if not (is_owner or get_user_scope(request).has_pos(vendor.point_of_sale_id)):
+                return Response({'error': "Vous n'avez pas accès à la trace de ce vendeur"},
+                                status=status.HTTP_403_FORBIDDEN)
+            day = request.query_params.get('date')
+            try:
+                day = datetime.strptime(day, '%Y-%m-%d').date() if day else local_date(timezone.now())
+            except ValueError:
+                return Response({'error': 'Invalid date format. Use YYYY-MM-DD'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response(dict(trails.day_trail(vendor.pk, day), vendor=vendor.pk))
+
+        if not is_owner:
+            return Response({'error': 'Seul le vendeur peut envoyer sa trace GPS'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        points = request.data.get('points') if isinstance(request.data, dict) else None
+        if not isinstance(points, list) or not points:
+            return Response({'error': 'Le champ points (liste non vide) est requis'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(points) > trails.MAX_UPLOAD_POINTS:
+            return Response({'error': f'{trails.MAX_UPLOAD_POINTS} points maximum par envoi'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = GPSPointSerializer(data=points, many=True)
+        serializer.is_valid(raise_exception=True)
+        distance = trails.store_points(vendor, serializer.validated_data)
+        return Response({'received': len(points), 'distance_covered': distance},
+                        status=status.HTTP_201_CREATED)
     
 
 # ============================================
@@ -1144,12 +1287,15 @@ from django_filters.rest_framework import DjangoFilterBackend
 import rest_framework.filters as filters
 from .models import VendorActivity, MobileVendor
 from .serializers import VendorActivitySummarySerializer, VendorActivityCumulativeSerializer
+from .serializers import VendorActivitySummaryValuesSerializer
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.functions import ExtractYear, ExtractMonth  # <-- Ajoutez cette ligne
 
-class VendorActivitySummaryViewSet(viewsets.ReadOnlyModelViewSet):
+class VendorActivitySummaryViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = VendorActivity.objects.select_related('related_order').prefetch_related('related_order__items').all()
     serializer_class = VendorActivitySummarySerializer
+    # list() passe par .values() + agrégats SQL (même JSON)
+    values_serializer_class = VendorActivitySummaryValuesSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['activity_type', 'related_order']  # Remove 'vendor' from filterset_fields
     ordering_fields = ['timestamp']
@@ -1226,6 +1372,8 @@ class PurchaseViewSet(viewsets.ModelViewSet):
     queryset = Purchase.objects.all()
     serializer_class = PurchaseSerializer
     permission_classes = [IsAuthenticated]
+    # ?bbox=ouest,sud,est,nord ou ?lat=&lng=&radius= (voir geo.py)
+    filter_backends = [DjangoFilterBackend, GeoAreaFilter]
 
     def perform_create(self, serializer):
         """
@@ -1259,9 +1407,135 @@ from django.utils import timezone
 from datetime import datetime
 from rest_framework import status
 
-class SaleViewSet(viewsets.ModelViewSet):
+class SalesStatsMixin:
+    """
+    Actions statistiques communes à SaleViewSet et SaleViewSetPOS,
+    paramétrées par le modèle de faits (voir sales_stats.py).
+    """
+    sales_model = None
+    # Comptés dans purchase_count : lignes de purchase_model dont le champ
+    # purchase_owner vaut le vendeur ('vendor') ou l'utilisateur connecté ('user')
+    purchase_model = Purchase
+    purchase_owner = 'vendor'
+    # Ventilation des achats par zone (Purchase uniquement)
+    summary_zones = False
+
+    def summary_purchases(self, request, vendor):
+        """Queryset compté dans purchase_count"""
+        owner = request.user if self.purchase_owner == 'user' else vendor
+        return self.purchase_model.objects.filter(**{self.purchase_owner: owner})
+
+    def get_stats_vendor(self, request):
+        """
+        Vendeur demandé (vendor_id) ou vendeur de l'utilisateur connecté.
+        Retourne (vendeur, réponse d'erreur ou None).
+        """
+        vendor_id = request.query_params.get('vendor_id', None)
+        if not vendor_id:
+            return self.request.user.mobile_vendor, None
+        try:
+            return MobileVendor.objects.get(id=vendor_id), None
+        except MobileVendor.DoesNotExist:
+            return None, Response(
+                {"error": "Vendeur non trouvé"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except ValueError:
+            return None, Response(
+                {"error": "ID de vendeur invalide"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Retourne un résumé des ventes
+        Permet de filtrer par date (format: YYYY-MM-DD) et par vendeur (vendor_id)
+        Par défaut: date d'aujourd'hui et utilisateur connecté
+        """
+        vendor, error = self.get_stats_vendor(request)
+        if error is not None:
+            return error
+
+        # La date ne filtre que les activités (quantités assignées / restantes)
+        date_param = request.query_params.get('date', None)
+        target_date = None
+        if date_param:
+            try:
+                target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {"error": "Format de date invalide. Utilisez YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        data = sales_stats.build_summary(
+            self.sales_model,
+            vendor,
+            sales_stats.vendor_activities(vendor, target_date),
+            self.summary_purchases(request, vendor),
+            zones=self.summary_zones,
+        )
+        return Response({'date': date_param or timezone.now().date().isoformat(), **data})
+
+    @action(detail=False, methods=['get'])
+    def performance(self, request):
+        """
+        Retourne les performances mensuelles avec:
+        - Nombre de clients par mois
+        - Montant total vendu par mois
+        - Nombre de produits vendus par mois
+        - Calculs de performance mensuels
+        Permet de filtrer par vendeur (vendor_id) et par période
+        """
+        vendor, error = self.get_stats_vendor(request)
+        if error is not None:
+            return error
+
+        start_date_param = request.query_params.get('start_date')
+        end_date_param = request.query_params.get('end_date')
+
+        # Définir la période par défaut (6 derniers mois)
+        if not start_date_param or not end_date_param:
+            end_date = timezone.now().date()
+            start_date = end_date - timedelta(days=180)
+        else:
+            try:
+                start_date = datetime.strptime(start_date_param, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date_param, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {"error": "Format de date invalide. Utilisez YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        performance_data, total_summary = sales_stats.build_performance(
+            self.sales_model, vendor, start_date, end_date
+        )
+
+        return Response({
+            'vendor_id': vendor.id,
+            'vendor_name': vendor.full_name,
+            'period': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            },
+            'monthly_performance': performance_data,
+            'summary': total_summary,
+            'performance_indicators': {
+                'best_month': max(performance_data, key=lambda x: x['total_revenue']) if performance_data else None,
+                'worst_month': min(performance_data, key=lambda x: x['total_revenue']) if performance_data else None,
+                'growth_rate': sales_stats.growth_rate(performance_data)
+            }
+        })
+
+
+class SaleViewSet(SalesStatsMixin, viewsets.ModelViewSet):
     serializer_class = SaleSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, GeoAreaFilter]
+    sales_model = Sale
+    summary_zones = True
 
     def get_queryset(self):
         """
@@ -1345,321 +1619,13 @@ class SaleViewSet(viewsets.ModelViewSet):
         sales = self.get_queryset().filter(product_variant_id=product_variant_id)
         serializer = self.get_serializer(sales, many=True)
         return Response(serializer.data)
-    @action(detail=False, methods=['get'])
-    def summary(self, request):
-        """
-        Retourne un résumé des ventes
-        Permet de filtrer par date (format: YYYY-MM-DD) et par vendeur (vendor_id)
-        Par défaut: date d'aujourd'hui et utilisateur connecté
-        """
-        # Récupérer l'ID du vendeur depuis les paramètres de requête
-        vendor_id = request.query_params.get('vendor_id', None)
-        
-        # Déterminer quel vendeur utiliser
-        if vendor_id:
-            try:
-                vendor = MobileVendor.objects.get(id=vendor_id)
-                # Vérifier les permissions si nécessaire
-                # if not request.user.has_perm('app.view_vendor_summary', vendor):
-                #     return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-            except MobileVendor.DoesNotExist:
-                return Response(
-                    {"error": "Vendeur non trouvé"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            except ValueError:
-                return Response(
-                    {"error": "ID de vendeur invalide"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            # Utiliser l'utilisateur connecté par défaut
-            vendor = self.request.user.mobile_vendor
-        
-        # Récupérer le queryset de base filtré par vendeur
-        queryset = VendorActivity.objects.filter(vendor=vendor)
-        queryset2 = Sale.objects.filter(vendor=vendor)
-        
-        # Récupérer la date depuis les paramètres de requête
-        date_param = request.query_params.get('date', None)
-        
-        if date_param:
-            try:
-                # Convertir la date string en objet date
-                target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-                # Filtrer les ventes pour la date spécifiée
-                queryset = queryset.filter(created_at__date=target_date)
-            except ValueError:
-                return Response(
-                    {"error": "Format de date invalide. Utilisez YYYY-MM-DD"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            # Par défaut, utiliser la date d'aujourd'hui
-            today = timezone.now().date()
-            #queryset = queryset.filter(created_at__date=today)
-        
-        # Calculer les statistiques
-        total_sales = queryset2.count()
-
-        total_revenue = queryset2.aggregate(total=Sum('total_amount'))['total'] or 0
-        total_quantity = queryset2.aggregate(total=Sum('quantity'))['total'] or 0
-
-        # Calcul des totaux à partir du queryset
-        totals = queryset.aggregate(
-            total_quantity=Sum('quantity_assignes'),
-            total_quantite_restant=Sum('quantity_restante')
-        )
-
-        total_quantity_assigne = totals['total_quantity'] or 0
-        total_quantite_restant = totals['total_quantite_restant'] or 0
-        
-        # Calculer le nombre de clients uniques
-        unique_customers = queryset2.values('customer').distinct().count()
-        
-        # Produits les plus vendus (top 5)
-        top_products = (
-            queryset2.values('product_variant__product__name')
-            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('total_amount'))
-            .order_by('-total_quantity')[:5]
-        )
-
-        # CORRECTION: Utiliser l'objet vendor au lieu de vendor_id pour les filtres
-        purchases = Purchase.objects.filter(vendor=vendor)
-        sales = Sale.objects.filter(vendor=vendor)
-        purchase_count = purchases.count()
-        sales_count = sales.count()  # On peut réutiliser le queryset existant
-
-        # CORRECTION: Utiliser le queryset existant au lieu de refaire le filtre
-        total_amounts = sales.aggregate(total=Sum('total_amount'))['total'] or 0
-        total_quantitys = sales.aggregate(total=Sum('quantity'))['total'] or 0
-
-        # Zones les plus actives (top 3)
-        top_zones = (
-            purchases.values('zone')
-            .annotate(count=Count('id'), revenue=Sum('amount'))
-            .order_by('-count')[:3]
-        )
-        
-        return Response({
-            'date': date_param or timezone.now().date().isoformat(),
-            'vendor_id': vendor.id,
-            'vendor_name': vendor.full_name,
-            'total_sales': total_sales,
-            'total_revenue': float(total_revenue),
-            'total_quantity': total_quantity,
-            'total_quantity_assigne':total_quantity_assigne,
-            'total_quantite_restant': total_quantite_restant,
-            'unique_customers': unique_customers,
-            'average_sale_amount': float(total_revenue / total_sales) if total_sales > 0 else 0,
-            'top_products': list(top_products),
-            'top_zones': list(top_zones),
-            'purchase_count': purchase_count,
-            'sales_count': sales_count,
-            'total_amounts': float(total_amounts),
-            'total_quantitys': total_quantitys
-        })
-    @action(detail=False, methods=['get'])
-    def performance(self, request):
-        """
-        Retourne les performances mensuelles avec:
-        - Nombre de clients par mois
-        - Montant total vendu par mois
-        - Nombre de produits vendus par mois
-        - Calculs de performance mensuels
-        Permet de filtrer par vendeur (vendor_id) et par période
-        """
-        # Récupérer l'ID du vendeur depuis les paramètres de requête
-        vendor_id = request.query_params.get('vendor_id', None)
-        
-        # Déterminer quel vendeur utiliser
-        if vendor_id:
-            try:
-                vendor = MobileVendor.objects.get(id=vendor_id)
-            except MobileVendor.DoesNotExist:
-                return Response(
-                    {"error": "Vendeur non trouvé"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            except ValueError:
-                return Response(
-                    {"error": "ID de vendeur invalide"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            # Utiliser l'utilisateur connecté par défaut
-            vendor = self.request.user.mobile_vendor
-        
-        # Récupérer les dates de début et fin depuis les paramètres de requête
-        start_date_param = request.query_params.get('start_date')
-        end_date_param = request.query_params.get('end_date')
-        
-        # Définir la période par défaut (6 derniers mois)
-        if not start_date_param or not end_date_param:
-            end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=180)  # 6 mois
-        else:
-            try:
-                start_date = datetime.strptime(start_date_param, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date_param, '%Y-%m-%d').date()
-            except ValueError:
-                return Response(
-                    {"error": "Format de date invalide. Utilisez YYYY-MM-DD"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        sales_queryset = Sale.objects.filter(
-        vendor=vendor,
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-        )
-        
-        # Données globales (tous vendeurs)
-        sales_queryset_TT = Sale.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
-        
-        # Agrégation des données du vendeur par mois
-        monthly_data = (
-            sales_queryset
-            .annotate(
-                year=ExtractYear('created_at'),
-                month=ExtractMonth('created_at')
-            )
-            .values('year', 'month')
-            .annotate(
-                total_customers=Count('customer', distinct=True),
-                total_revenue=Sum('total_amount'),
-                total_products_sold=Sum('quantity'),
-                total_sales=Count('id')
-            )
-            .order_by('year', 'month')
-        )
-        
-        # Agrégation des données globales par mois
-        monthly_data_TT = (
-            sales_queryset_TT
-            .annotate(
-                year=ExtractYear('created_at'),
-                month=ExtractMonth('created_at')
-            )
-            .values('year', 'month')
-            .annotate(
-                total_customers_TT=Count('customer', distinct=True),
-                total_revenue_TT=Sum('total_amount'),
-                total_products_sold_TT=Sum('quantity'),
-                total_sales_TT=Count('id')
-            )
-            .order_by('year', 'month')
-        )
-        
-        # Convertir monthly_data_TT en dictionnaire pour accès facile
-        tt_dict = {
-            (item['year'], item['month']): {
-                'total_revenue_TT': item['total_revenue_TT'],
-                'total_customers_TT': item['total_customers_TT'],
-                'total_products_sold_TT': item['total_products_sold_TT'],
-                'total_sales_TT': item['total_sales_TT']
-            }
-            for item in monthly_data_TT
-        }
-        
-        # Calcul des indicateurs de performance mensuels
-        performance_data = []
-        for data in monthly_data:
-            month_date = date(data['year'], data['month'], 1)
-            month_name = month_date.strftime('%B %Y')
-            
-            # Récupérer les données TT correspondantes
-            tt_data = tt_dict.get((data['year'], data['month']), {})
-            
-            # PERFORMANCE: Ratio entre les revenus du vendeur et les revenus globaux
-            # Indique la part de marché du vendeur
-            performance_ratio = (
-                data['total_revenue'] / tt_data.get('total_revenue_TT', 1) 
-                if tt_data.get('total_revenue_TT', 0) > 0 else 0
-            )
-            
-            # PANIER MOYEN: Basé sur les clients du vendeur (logique métier)
-            average_basket = (
-                data['total_revenue'] / data['total_customers'] 
-                if data['total_customers'] > 0 else 0
-            )
-            
-            performance_data.append({
-                'month': month_name,
-                'year': data['year'],
-                'month_number': data['month'],
-                'total_customers': data['total_customers'],
-                'total_revenue': float(data['total_revenue'] or 0),
-                'total_revenue_TT': float(tt_data.get('total_revenue_TT', 0) or 0),  # Utiliser tt_data
-                'total_products_sold': data['total_products_sold'] or 0,
-                'total_sales': data['total_sales'],
-                'performance_ratio': float(performance_ratio),
-                'average_basket': float(average_basket),
-                'revenue_per_customer': (
-                    float(data['total_revenue'] / data['total_customers']) 
-                    if data['total_customers'] > 0 else 0
-                )
-            })
-        
-        # Calcul des totaux globaux
-        total_summary = {
-            'period_start': start_date.isoformat(),
-            'period_end': end_date.isoformat(),
-            'total_customers': sum(item['total_customers'] for item in performance_data),
-            'total_revenue': sum(item['total_revenue'] for item in performance_data),
-            'total_products_sold': sum(item['total_products_sold'] for item in performance_data),
-            'total_sales': sum(item['total_sales'] for item in performance_data),
-            'overall_performance': (
-                sum(item['total_revenue'] for item in performance_data) / 
-                sum(item['total_revenue_TT'] for item in performance_data) 
-                if sum(item['total_revenue_TT'] for item in performance_data) > 0 else 0
-            )
-        }
-        
-        return Response({
-            'vendor_id': vendor.id,
-            'vendor_name': vendor.full_name,
-            'period': {
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat()
-            },
-            'monthly_performance': performance_data,
-            'summary': total_summary,
-            'performance_indicators': {
-                'best_month': max(performance_data, key=lambda x: x['total_revenue']) if performance_data else None,
-                'worst_month': min(performance_data, key=lambda x: x['total_revenue']) if performance_data else None,
-                'growth_rate': self.calculate_growth_rate(performance_data) if len(performance_data) >= 2 else 0
-            }
-        })
-
-    def calculate_growth_rate(self, performance_data):
-        """
-        Calcule le taux de croissance entre le premier et le dernier mois
-        """
-        if len(performance_data) < 2:
-            return 0
-        
-        # Trier par année et mois pour être sûr de l'ordre
-        sorted_data = sorted(performance_data, key=lambda x: (x['year'], x['month_number']))
-        
-        first_month = sorted_data[0]['total_revenue']
-        last_month = sorted_data[-1]['total_revenue']
-        
-        if first_month == 0:
-            return 0
-        
-        growth_rate = ((last_month - first_month) / first_month) * 100
-        return float(growth_rate)
     
 from django.db.models import Sum
 from django.utils import timezone
 from datetime import datetime
 from django.http import JsonResponse
 from .models import Purchase, Sale, MobileVendor
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from django.db.models import Prefetch
 
 
@@ -1668,7 +1634,7 @@ def get_customer_sales(request):
     try:
         # Vérifier l'authentification
         if not request.user.is_authenticated:
-            return JsonResponse({'error': 'Authentication required'}, status=401)
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
         # Récupérer les dates de début et fin
         start_date_str = request.GET.get('start_date')
@@ -1695,10 +1661,12 @@ def get_customer_sales(request):
         end_datetime = timezone.make_aware(datetime.combine(end_date, datetime.max.time()))
         
         # Récupérer les points de vente de l'utilisateur connecté
-        user_points_of_sale = request.user.profile.points_of_sale.all()
+        user_points_of_sale = get_user_scope(request).points_of_sale()
         
         # Récupérer les MobileVendor associés à ces points de vente
-        vendors = MobileVendor.objects.filter(point_of_sale__in=user_points_of_sale)
+        vendors = MobileVendor.objects.filter(
+            point_of_sale_id__in=get_user_scope(request).pos_ids
+        ).select_related('point_of_sale')
         
         all_customer_data = []
         grand_total_sales = 0
@@ -1788,7 +1756,7 @@ def get_customer_sales(request):
                 'total_quantity': sum(customer['total_quantity'] for customer in vendor_purchases)
             })
         
-        return JsonResponse({
+        return Response({
             'period': {
                 'start_date': start_date.strftime('%Y-%m-%d'),
                 'end_date': end_date.strftime('%Y-%m-%d'),
@@ -1804,9 +1772,250 @@ def get_customer_sales(request):
         })
         
     except ValueError:
-        return JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        return JsonResponse({'error': f'Server error: {str(e)}'}, status=500)
+        return Response({'error': f'Server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ── Clustering des cartes ───────────────────────────────────────────────────
+from django.db.models import DecimalField, OuterRef, Subquery
+from .models import PointOfSale, SalePOS
+from .geo import (
+    CLUSTER_POINTS_ZOOM, NEAREST_MAX_RADIUS_M, cluster_queryset, filter_bbox, nearest,
+    parse_bbox, parse_zoom, zoom_precision,
+)
+from . import heatmap
+
+# Au zoom "points", on borne tout de même la réponse
+MAP_MAX_POINTS = 5000
+
+
+def _map_period(request):
+    """Bornes datetime optionnelles (start_date / end_date, AAAA-MM-JJ)."""
+    start_date_str = request.GET.get('start_date')
+    end_date_str = request.GET.get('end_date')
+    start = end = None
+    if start_date_str:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    if end_date_str:
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        end = timezone.make_aware(datetime.combine(end_date, datetime.max.time()))
+    return start, end
+
+
+def _period_filter(field, start, end):
+    lookups = {}
+    if start is not None:
+        lookups[f'{field}__gte'] = start
+    if end is not None:
+        lookups[f'{field}__lte'] = end
+    return lookups
+
+
+def _map_pos_ids(request):
+    """Points de vente du profil, plus celui du vendeur ambulant connecté."""
+    pos_ids = set(get_user_scope(request).pos_ids)
+    vendor = MobileVendor.objects.filter(user=request.user).only('point_of_sale_id').first()
+    if vendor is not None and vendor.point_of_sale_id:
+        pos_ids.add(vendor.point_of_sale_id)
+    return pos_ids
+
+
+def _map_layer(pos_ids, layer, start, end):
+    """
+    (queryset, agrégation du CA, colonnes renvoyées au zoom "points") pour
+    les points de vente `pos_ids` (voir _map_pos_ids).
+    """
+    if layer == 'points_of_sale':
+        queryset = PointOfSale.objects.filter(pk__in=pos_ids)
+        return queryset, Sum('monthly_turnover'), {
+            'name': 'name', 'status': 'status', 'revenue': 'monthly_turnover',
+        }
+
+    if layer == 'customers':
+        sales = Sale.objects.filter(customer=OuterRef('pk'), **_period_filter('created_at', start, end))
+        sales_total = Subquery(
+            sales.order_by().values('customer').annotate(total=Sum('total_amount')).values('total'),
+            output_field=DecimalField(),
+        )
+        queryset = (
+            Purchase.objects
+            .filter(vendor__point_of_sale_id__in=pos_ids, **_period_filter('purchase_date', start, end))
+            .annotate(sales_total=sales_total)
+        )
+        return queryset, Sum('sales_total'), {
+            'first_name': 'first_name', 'last_name': 'last_name', 'zone': 'zone',
+            'revenue': 'sales_total',
+        }
+
+    if layer == 'sales':
+        queryset = Sale.objects.filter(point_of_sale_id__in=pos_ids)
+    else:
+        queryset = SalePOS.objects.filter(vendor__point_of_sale_id__in=pos_ids)
+    queryset = queryset.filter(**_period_filter('created_at', start, end))
+    return queryset, Sum('total_amount'), {
+        'quantity': 'quantity', 'revenue': 'total_amount', 'created_at': 'created_at',
+    }
+
+
+MAP_LAYERS = ('points_of_sale', 'customers', 'sales', 'salespos')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_map_clusters(request):
+    """
+    Clusters pour les cartes : GET /api/carte/clusters/?layer=customers&zoom=12&bbox=ouest,sud,est,nord
+
+    Regroupement SQL par préfixe de geohash (longueur fonction du zoom) :
+    nombre, CA et centroïde par cellule. À partir de CLUSTER_POINTS_ZOOM
+    les points sont renvoyés individuellement.
+    Couches : points_of_sale, customers, sales, salespos.
+    """
+    layer = request.GET.get('layer', 'customers')
+    if layer not in MAP_LAYERS:
+        return Response(
+            {'error': f"Couche inconnue. Valeurs possibles : {', '.join(MAP_LAYERS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not request.GET.get('bbox'):
+        return Response({'error': 'Le paramètre bbox est requis'}, status=status.HTTP_400_BAD_REQUEST)
+
+    bbox = parse_bbox(request.GET['bbox'])
+    zoom = parse_zoom(request.GET.get('zoom'))
+    try:
+        start, end = _map_period(request)
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset, revenue, columns = _map_layer(_map_pos_ids(request), layer, start, end)
+
+    if zoom >= CLUSTER_POINTS_ZOOM:
+        rows = list(
+            filter_bbox(queryset, bbox)
+            .order_by('pk')
+            .values('id', 'latitude', 'longitude', *columns.values())[:MAP_MAX_POINTS + 1]
+        )
+        points = []
+        for row in rows[:MAP_MAX_POINTS]:
+            point = {'id': row['id'], 'latitude': row['latitude'], 'longitude': row['longitude']}
+            for name, source in columns.items():
+                point[name] = row[source]
+            point['revenue'] = float(point['revenue'] or 0)
+            points.append(point)
+        return Response({
+            'layer': layer,
+            'zoom': zoom,
+            'mode': 'points',
+            'points': points,
+            'truncated': len(rows) > MAP_MAX_POINTS,
+        })
+
+    precision = zoom_precision(zoom)
+    clusters = cluster_queryset(queryset, bbox, precision, revenue=revenue)
+    return Response({
+        'layer': layer,
+        'zoom': zoom,
+        'mode': 'clusters',
+        'precision': precision,
+        'clusters': clusters,
+        'total_count': sum(cluster['count'] for cluster in clusters),
+        'total_revenue': sum(cluster['revenue'] for cluster in clusters),
+    })
+
+NEAREST_LAYERS = ('points_of_sale', 'customers')
+NEAREST_MAX_K = 100
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_nearest(request):
+    """
+    Plus proches voisins : GET /api/carte/nearest/?layer=customers&lat=5.35&lng=-4.0&k=10
+
+    `max_distance` (mètres) borne la recherche. Les lignes sont triées par
+    distance croissante, `distance_m` en mètres.
+    """
+    layer = request.GET.get('layer', 'points_of_sale')
+    if layer not in NEAREST_LAYERS:
+        return Response(
+            {'error': f"Couche inconnue. Valeurs possibles : {', '.join(NEAREST_LAYERS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lng'])
+        k = int(request.GET.get('k', 10))
+        max_distance = float(request.GET.get('max_distance', NEAREST_MAX_RADIUS_M))
+    except KeyError:
+        return Response({'error': 'Les paramètres lat et lng sont requis'}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response({'error': 'lat, lng, k et max_distance doivent être numériques'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or max_distance <= 0:
+        return Response({'error': 'Coordonnées ou distance invalides'}, status=status.HTTP_400_BAD_REQUEST)
+    k = max(1, min(k, NEAREST_MAX_K))
+    max_distance = min(max_distance, NEAREST_MAX_RADIUS_M)
+
+    queryset, _, columns = _map_layer(_map_pos_ids(request), layer, None, None)
+    results = []
+    for obj in nearest(queryset, latitude, longitude, k, max_distance):
+        item = {
+            'id': obj.pk,
+            'latitude': obj.latitude,
+            'longitude': obj.longitude,
+            'distance_m': round(obj.distance_m, 1),
+        }
+        for name, source in columns.items():
+            item[name] = getattr(obj, source)
+        item['revenue'] = float(item['revenue'] or 0)
+        results.append(item)
+
+    return Response({
+        'layer': layer,
+        'origin': {'latitude': latitude, 'longitude': longitude},
+        'count': len(results),
+        'results': results,
+    })
+
+
+HEATMAP_LAYERS = ('sales', 'salespos')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_sales_heatmap(request, z, x, y):
+    """
+    Tuile de heatmap des ventes : GET /api/carte/heatmap/<z>/<x>/<y>/?metric=revenue&start_date=&end_date=
+
+    metric : count (nombre de ventes) ou revenue (CA). bins : taille de la
+    grille (64 par défaut). Voir heatmap.py.
+    """
+    layer = request.GET.get('layer', 'sales')
+    metric = request.GET.get('metric', 'count')
+    if layer not in HEATMAP_LAYERS or metric not in heatmap.METRICS:
+        return Response(
+            {'error': f"layer parmi {', '.join(HEATMAP_LAYERS)}, metric parmi {', '.join(heatmap.METRICS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    z, x, y = heatmap.parse_tile(z, x, y)
+    try:
+        bins = int(request.GET.get('bins', heatmap.DEFAULT_BINS))
+        start, end = _map_period(request)
+    except ValueError:
+        return Response({'error': 'bins entier, dates au format YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    bins = max(1, min(bins, heatmap.MAX_BINS))
+
+    pos_ids = _map_pos_ids(request)
+    queryset, _, _ = _map_layer(pos_ids, layer, start, end)
+    key = heatmap.cache_key(
+        layer, metric, (z, x, y), bins,
+        request.GET.get('start_date'), request.GET.get('end_date'), pos_ids,
+    )
+    amount_field = 'total_amount' if metric == 'revenue' else None
+    data = heatmap.cached_heatmap_tile(key, queryset, z, x, y, bins, amount_field)
+    return Response(dict(data, layer=layer, metric=metric))
+
 
 def get_customer_sales_optimized(request):
     start_date_str = request.GET.get('start_date')
@@ -1995,15 +2204,17 @@ from .models import Purchase, Sale, ProductVariant, Product
 from .serializers_rapports import (
     PurchaseSummarySerializer, 
     SaleDetailSerializer,
-    ProductVariantDetailSerializer,PurchaseSummarySerializerPOS
+    ProductVariantDetailSerializer,PurchaseSummarySerializerPOS,
+    PurchaseSummaryValuesSerializer, PurchaseSummaryValuesSerializerPOS
 )
 
-class PurchaseViewSetData(viewsets.ModelViewSet):
+class PurchaseViewSetData(ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les achats avec statistiques des ventes
     """
     queryset = Purchase.objects.all()
     serializer_class = PurchaseSummarySerializer
+    values_serializer_class = PurchaseSummaryValuesSerializer
 
     def get_queryset(self):
         """
@@ -2075,7 +2286,7 @@ class PurchaseViewSetData(viewsets.ModelViewSet):
             total_variants_sold=Count('product_variant', distinct=True)
         )
         
-        serializer = self.get_serializer(purchases, many=True)
+        serializer = self.get_values_serializer(purchases)
         
         return Response({
             'purchases': serializer.data,
@@ -2083,12 +2294,13 @@ class PurchaseViewSetData(viewsets.ModelViewSet):
         })
     
 
-class PurchaseViewSetDataPOS(viewsets.ModelViewSet):
+class PurchaseViewSetDataPOS(ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les achats avec statistiques des ventes
     """
     queryset = PointOfSale.objects.all()
     serializer_class = PurchaseSummarySerializerPOS
+    values_serializer_class = PurchaseSummaryValuesSerializerPOS
 
     def get_queryset(self):
         """
@@ -2159,16 +2371,20 @@ class PurchaseViewSetDataPOS(viewsets.ModelViewSet):
             total_variants_sold=Count('product_variant', distinct=True)
         )
         
-        serializer = self.get_serializer(purchases, many=True)
+        serializer = self.get_values_serializer(purchases)
         
         return Response({
             'purchases': serializer.data,
             'global_statistics': global_stats
         })
     
-class SaleViewSetPOS(viewsets.ModelViewSet):
+class SaleViewSetPOS(SalesStatsMixin, viewsets.ModelViewSet):
     serializer_class = SaleSerializerPOS
     permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, GeoAreaFilter]
+    sales_model = SalePOS
+    purchase_model = PointOfSale
+    purchase_owner = 'user'
 
     def get_queryset(self):
         """
@@ -2252,316 +2468,6 @@ class SaleViewSetPOS(viewsets.ModelViewSet):
         sales = self.get_queryset().filter(product_variant_id=product_variant_id)
         serializer = self.get_serializer(sales, many=True)
         return Response(serializer.data)
-    @action(detail=False, methods=['get'])
-    def summary(self, request):
-        """
-        Retourne un résumé des ventes
-        Permet de filtrer par date (format: YYYY-MM-DD) et par vendeur (vendor_id)
-        Par défaut: date d'aujourd'hui et utilisateur connecté
-        """
-        # Récupérer l'ID du vendeur depuis les paramètres de requête
-        vendor_id = request.query_params.get('vendor_id', None)
-        
-        # Déterminer quel vendeur utiliser
-        if vendor_id:
-            try:
-                vendor = MobileVendor.objects.get(id=vendor_id)
-                # Vérifier les permissions si nécessaire
-                # if not request.user.has_perm('app.view_vendor_summary', vendor):
-                #     return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-            except MobileVendor.DoesNotExist:
-                return Response(
-                    {"error": "Vendeur non trouvé"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            except ValueError:
-                return Response(
-                    {"error": "ID de vendeur invalide"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            # Utiliser l'utilisateur connecté par défaut
-            vendor = self.request.user.mobile_vendor
-        
-        # Récupérer le queryset de base filtré par vendeur
-        queryset = VendorActivity.objects.filter(vendor=vendor)
-        queryset2 = SalePOS.objects.filter(vendor=vendor)
-        
-        # Récupérer la date depuis les paramètres de requête
-        date_param = request.query_params.get('date', None)
-        
-        if date_param:
-            try:
-                # Convertir la date string en objet date
-                target_date = datetime.strptime(date_param, '%Y-%m-%d').date()
-                # Filtrer les ventes pour la date spécifiée
-                queryset = queryset.filter(created_at__date=target_date)
-            except ValueError:
-                return Response(
-                    {"error": "Format de date invalide. Utilisez YYYY-MM-DD"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            # Par défaut, utiliser la date d'aujourd'hui
-            today = timezone.now().date()
-            #queryset = queryset.filter(created_at__date=today)
-        
-        # Calculer les statistiques
-        total_sales = queryset2.count()
-
-        total_revenue = queryset2.aggregate(total=Sum('total_amount'))['total'] or 0
-        total_quantity = queryset2.aggregate(total=Sum('quantity'))['total'] or 0
-
-        # Calcul des totaux à partir du queryset
-        totals = queryset.aggregate(
-            total_quantity=Sum('quantity_assignes'),
-            total_quantite_restant=Sum('quantity_restante')
-        )
-
-        total_quantity_assigne = totals['total_quantity'] or 0
-        total_quantite_restant = totals['total_quantite_restant'] or 0
-        
-        # Calculer le nombre de clients uniques
-        unique_customers = queryset2.values('customer').distinct().count()
-        
-        # Produits les plus vendus (top 5)
-        top_products = (
-            queryset2.values('product_variant__product__name')
-            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('total_amount'))
-            .order_by('-total_quantity')[:5]
-        )
-
-        vendorID = self.request.user.id
-
-        # CORRECTION: Utiliser l'objet vendor au lieu de vendor_id pour les filtres
-        purchases = PointOfSale.objects.filter(user=vendorID)
-        sales = SalePOS.objects.filter(vendor=vendor)
-        purchase_count = purchases.count()
-        sales_count = sales.count()  # On peut réutiliser le queryset existant
-
-        # CORRECTION: Utiliser le queryset existant au lieu de refaire le filtre
-        total_amounts = sales.aggregate(total=Sum('total_amount'))['total'] or 0
-        total_quantitys = sales.aggregate(total=Sum('quantity'))['total'] or 0
-
-        # Zones les plus actives (top 3)
-        # top_zones = (
-        #     purchases.values('zone')
-        #     .annotate(count=Count('id'), revenue=Sum('amount'))
-        #     .order_by('-count')[:3]
-        # )
-        
-        return Response({
-            'date': date_param or timezone.now().date().isoformat(),
-            'vendor_id': vendor.id,
-            'vendor_name': vendor.full_name,
-            'total_sales': total_sales,
-            'total_revenue': float(total_revenue),
-            'total_quantity': total_quantity,
-            'total_quantity_assigne':total_quantity_assigne,
-            'total_quantite_restant': total_quantite_restant,
-            'unique_customers': unique_customers,
-            'average_sale_amount': float(total_revenue / total_sales) if total_sales > 0 else 0,
-            'top_products': list(top_products),
-            # 'top_zones': list(top_zones),
-            'purchase_count': purchase_count,
-            'sales_count': sales_count,
-            'total_amounts': float(total_amounts),
-            'total_quantitys': total_quantitys
-        })
-    @action(detail=False, methods=['get'])
-    def performance(self, request):
-        """
-        Retourne les performances mensuelles avec:
-        - Nombre de clients par mois
-        - Montant total vendu par mois
-        - Nombre de produits vendus par mois
-        - Calculs de performance mensuels
-        Permet de filtrer par vendeur (vendor_id) et par période
-        """
-        # Récupérer l'ID du vendeur depuis les paramètres de requête
-        vendor_id = request.query_params.get('vendor_id', None)
-        
-        # Déterminer quel vendeur utiliser
-        if vendor_id:
-            try:
-                vendor = MobileVendor.objects.get(id=vendor_id)
-            except MobileVendor.DoesNotExist:
-                return Response(
-                    {"error": "Vendeur non trouvé"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            except ValueError:
-                return Response(
-                    {"error": "ID de vendeur invalide"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        else:
-            # Utiliser l'utilisateur connecté par défaut
-            vendor = self.request.user.mobile_vendor
-        
-        # Récupérer les dates de début et fin depuis les paramètres de requête
-        start_date_param = request.query_params.get('start_date')
-        end_date_param = request.query_params.get('end_date')
-        
-        # Définir la période par défaut (6 derniers mois)
-        if not start_date_param or not end_date_param:
-            end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=180)  # 6 mois
-        else:
-            try:
-                start_date = datetime.strptime(start_date_param, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date_param, '%Y-%m-%d').date()
-            except ValueError:
-                return Response(
-                    {"error": "Format de date invalide. Utilisez YYYY-MM-DD"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        sales_queryset = SalePOS.objects.filter(
-        vendor=vendor,
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-        )
-        
-        # Données globales (tous vendeurs)
-        sales_queryset_TT = SalePOS.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
-        
-        # Agrégation des données du vendeur par mois
-        monthly_data = (
-            sales_queryset
-            .annotate(
-                year=ExtractYear('created_at'),
-                month=ExtractMonth('created_at')
-            )
-            .values('year', 'month')
-            .annotate(
-                total_customers=Count('customer', distinct=True),
-                total_revenue=Sum('total_amount'),
-                total_products_sold=Sum('quantity'),
-                total_sales=Count('id')
-            )
-            .order_by('year', 'month')
-        )
-        
-        # Agrégation des données globales par mois
-        monthly_data_TT = (
-            sales_queryset_TT
-            .annotate(
-                year=ExtractYear('created_at'),
-                month=ExtractMonth('created_at')
-            )
-            .values('year', 'month')
-            .annotate(
-                total_customers_TT=Count('customer', distinct=True),
-                total_revenue_TT=Sum('total_amount'),
-                total_products_sold_TT=Sum('quantity'),
-                total_sales_TT=Count('id')
-            )
-            .order_by('year', 'month')
-        )
-        
-        # Convertir monthly_data_TT en dictionnaire pour accès facile
-        tt_dict = {
-            (item['year'], item['month']): {
-                'total_revenue_TT': item['total_revenue_TT'],
-                'total_customers_TT': item['total_customers_TT'],
-                'total_products_sold_TT': item['total_products_sold_TT'],
-                'total_sales_TT': item['total_sales_TT']
-            }
-            for item in monthly_data_TT
-        }
-        
-        # Calcul des indicateurs de performance mensuels
-        performance_data = []
-        for data in monthly_data:
-            month_date = date(data['year'], data['month'], 1)
-            month_name = month_date.strftime('%B %Y')
-            
-            # Récupérer les données TT correspondantes
-            tt_data = tt_dict.get((data['year'], data['month']), {})
-            
-            # PERFORMANCE: Ratio entre les revenus du vendeur et les revenus globaux
-            # Indique la part de marché du vendeur
-            performance_ratio = (
-                data['total_revenue'] / tt_data.get('total_revenue_TT', 1) 
-                if tt_data.get('total_revenue_TT', 0) > 0 else 0
-            )
-            
-            # PANIER MOYEN: Basé sur les clients du vendeur (logique métier)
-            average_basket = (
-                data['total_revenue'] / data['total_customers'] 
-                if data['total_customers'] > 0 else 0
-            )
-            
-            performance_data.append({
-                'month': month_name,
-                'year': data['year'],
-                'month_number': data['month'],
-                'total_customers': data['total_customers'],
-                'total_revenue': float(data['total_revenue'] or 0),
-                'total_revenue_TT': float(tt_data.get('total_revenue_TT', 0) or 0),  # Utiliser tt_data
-                'total_products_sold': data['total_products_sold'] or 0,
-                'total_sales': data['total_sales'],
-                'performance_ratio': float(performance_ratio),
-                'average_basket': float(average_basket),
-                'revenue_per_customer': (
-                    float(data['total_revenue'] / data['total_customers']) 
-                    if data['total_customers'] > 0 else 0
-                )
-            })
-        
-        # Calcul des totaux globaux
-        total_summary = {
-            'period_start': start_date.isoformat(),
-            'period_end': end_date.isoformat(),
-            'total_customers': sum(item['total_customers'] for item in performance_data),
-            'total_revenue': sum(item['total_revenue'] for item in performance_data),
-            'total_products_sold': sum(item['total_products_sold'] for item in performance_data),
-            'total_sales': sum(item['total_sales'] for item in performance_data),
-            'overall_performance': (
-                sum(item['total_revenue'] for item in performance_data) / 
-                sum(item['total_revenue_TT'] for item in performance_data) 
-                if sum(item['total_revenue_TT'] for item in performance_data) > 0 else 0
-            )
-        }
-        
-        return Response({
-            'vendor_id': vendor.id,
-            'vendor_name': vendor.full_name,
-            'period': {
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat()
-            },
-            'monthly_performance': performance_data,
-            'summary': total_summary,
-            'performance_indicators': {
-                'best_month': max(performance_data, key=lambda x: x['total_revenue']) if performance_data else None,
-                'worst_month': min(performance_data, key=lambda x: x['total_revenue']) if performance_data else None,
-                'growth_rate': self.calculate_growth_rate(performance_data) if len(performance_data) >= 2 else 0
-            }
-        })
-
-    def calculate_growth_rate(self, performance_data):
-        """
-        Calcule le taux de croissance entre le premier et le dernier mois
-        """
-        if len(performance_data) < 2:
-            return 0
-        
-        # Trier par année et mois pour être sûr de l'ordre
-        sorted_data = sorted(performance_data, key=lambda x: (x['year'], x['month_number']))
-        
-        first_month = sorted_data[0]['total_revenue']
-        last_month = sorted_data[-1]['total_revenue']
-        
-        if first_month == 0:
-            return 0
-        
-        growth_rate = ((last_month - first_month) / first_month) * 100
-        return float(growth_rate)
     
 
 
@@ -2572,10 +2478,12 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter
 from .models import District, Ville, Quartier
 from .serializers import DistrictSerializer, VilleSerializer, QuartierSerializer
+from .serializers import DistrictValuesSerializer, VilleValuesSerializer, QuartierValuesSerializer
 
-class DistrictViewSet(viewsets.ModelViewSet):
+class DistrictViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = District.objects.all()
     serializer_class = DistrictSerializer
+    values_serializer_class = DistrictValuesSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     search_fields = ['nom']
     
@@ -2586,9 +2494,10 @@ class DistrictViewSet(viewsets.ModelViewSet):
         serializer = VilleSerializer(villes, many=True)
         return Response(serializer.data)
 
-class VilleViewSet(viewsets.ModelViewSet):
+class VilleViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Ville.objects.all()
     serializer_class = VilleSerializer
+    values_serializer_class = VilleValuesSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['district']
     search_fields = ['nom']
@@ -2600,9 +2509,10 @@ class VilleViewSet(viewsets.ModelViewSet):
         serializer = QuartierSerializer(quartiers, many=True)
         return Response(serializer.data)
 
-class QuartierViewSet(viewsets.ModelViewSet):
+class QuartierViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Quartier.objects.all()
     serializer_class = QuartierSerializer
+    values_serializer_class = QuartierValuesSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['ville']
     search_fields = ['nom']
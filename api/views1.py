@@ -4,10 +4,10 @@ import json
 from datetime import datetime, timedelta
 from django.http import HttpResponse
 from django.db.models import Q, F, ExpressionWrapper, DecimalField, IntegerField
-from django.db.models.functions import Coalesce, Cast, TruncDate, TruncMonth, TruncYear
+from django.db.models.functions import Coalesce, Cast
 from django.db.models import Sum, Count, Avg, Max, Min
 from django.utils import timezone
-from rest_framework import viewsets, status
+from rest_framework import exceptions, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from openpyxl import Workbook
@@ -17,6 +17,8 @@ import io
 
 from .models import *
 from .serializers1 import *
+from . import timeseries
+from .middleware import no_compression
 
 class StatisticsViewSet(viewsets.ViewSet):
     """
@@ -57,6 +59,8 @@ class StatisticsViewSet(viewsets.ViewSet):
             if hasattr(queryset.model, 'region'):
                 queryset = queryset.filter(region__in=filters['region'])
             elif hasattr(queryset.model, 'point_of_sale'):
+                # Sale.point_of_sale (0007) : ?region= filtre aussi les ventes,
+                # qui étaient renvoyées toutes régions confondues
                 queryset = queryset.filter(point_of_sale__region__in=filters['region'])
         
         # Filtres par zone
@@ -190,9 +194,7 @@ class StatisticsViewSet(viewsets.ViewSet):
             
             for pos in pos_qs:
                 # Ventes du POS
-                sales_qs = Sale.objects.filter(
-                    vendor_activity__vendor__point_of_sale=pos
-                )
+                sales_qs = Sale.objects.filter(point_of_sale=pos)
                 sales_qs = self._apply_filters(sales_qs, filters)
                 
                 sales_agg = sales_qs.aggregate(
@@ -268,50 +270,36 @@ class StatisticsViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def sales_chart(self, request):
-        """Données pour graphique des ventes"""
+        """
+        Données pour graphique des ventes.
+        Périodes (day, week, month, quarter, year) calculées dans le fuseau
+        métier, ordonnées et complétées par 0 (voir timeseries.bucketed).
+        """
+        # Paramètres invalides : 400 (hors du try, qui répond 500)
+        serializer = FilterSerializer(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+        
+        group_by = filters.get('group_by', 'day')
+        if group_by not in timeseries.TRUNCATES:
+            group_by = 'year'
+        start, end = self._series_range(filters)
+        
         try:
-            serializer = FilterSerializer(data=request.GET)
-            serializer.is_valid(raise_exception=True)
-            filters = serializer.validated_data
-            
-            group_by = filters.get('group_by', 'day')
-            period = filters.get('period', 'month')
+            sales_qs = self._apply_filters(Sale.objects.all(), self._without_dates(filters))
             
-            start_date, end_date = self._get_date_range(period)
-            
-            # Agrégation par période
-            if group_by == 'day':
-                trunc_func = TruncDate('created_at')
-                date_format = '%Y-%m-%d'
-            elif group_by == 'week':
-                trunc_func = TruncDate('created_at')  # Simplifié
-                date_format = 'Semaine %W'
-            elif group_by == 'month':
-                trunc_func = TruncMonth('created_at')
-                date_format = '%Y-%m'
-            else:  # year
-                trunc_func = TruncYear('created_at')
-                date_format = '%Y'
-            
-            sales_qs = Sale.objects.filter(
-                created_at__gte=start_date,
-                created_at__lte=end_date
-            )
-            sales_qs = self._apply_filters(sales_qs, filters)
-            
-            chart_data = sales_qs.annotate(
-                period=trunc_func
-            ).values('period').annotate(
+            chart_data = timeseries.bucketed(
+                sales_qs, group_by, start, end,
                 sales=Coalesce(Sum('total_amount'), 0, output_field=DecimalField(max_digits=15, decimal_places=2)),
                 count=Count('id')
-            ).order_by('period')
+            )
             
             labels = []
             sales_values = []
             count_values = []
             
-            for data in chart_data:
-                labels.append(data['period'].strftime(date_format))
+            for period, data in chart_data:
+                labels.append(timeseries.bucket_label(period, group_by))
                 sales_values.append(float(data['sales']))
                 count_values.append(data['count'])
             
@@ -343,6 +331,87 @@ class StatisticsViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def _series_range(self, filters):
+        """
+        (début, fin) en dates du fuseau métier : start_date/end_date sinon
+        la période demandée
+        """
+        start_date, end_date = self._get_date_range(filters.get('period', 'month'))
+        start = filters.get('start_date') or timeseries.local_date(start_date)
+        end = filters.get('end_date') or timeseries.local_date(end_date)
+        # exceptions.ValidationError : `from .models import *` importe celle de Django
+        if start > end:
+            raise exceptions.ValidationError({'start_date': "Doit précéder end_date"})
+        return start, end
+
+    def _without_dates(self, filters):
+        """Filtres sans start_date/end_date (bornes posées dans le fuseau métier)"""
+        return {k: v for k, v in filters.items() if k not in ('start_date', 'end_date')}
+
+    def _series_queryset(self, filters, start, end):
+        """Ventes filtrées sur [start, end] (les dates sont fixées ici)"""
+        lower, upper = timeseries.day_bounds(start, end)
+        sales_qs = Sale.objects.filter(created_at__gte=lower, created_at__lt=upper)
+        return self._apply_filters(sales_qs, self._without_dates(filters))
+
+    @action(detail=False, methods=['get'])
+    def sales_timeseries(self, request):
+        """
+        Séries temporelles complétées (jours sans vente à 0), regroupées par
+        jour / semaine / mois, avec moyenne mobile et croissance (timeseries.py).
+
+        ?group_by=day|week|month|quarter|year&series=revenue,quantity,count
+        &split_by=vendor|point_of_sale|product&window=7&top=10
+        """
+        serializer = FilterSerializer(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+
+        params = request.GET
+        interval = timeseries.parse_choice(
+            filters.get('group_by'), timeseries.INTERVALS, 'group_by', 'day'
+        )
+        split = timeseries.parse_choice(params.get('split_by'), timeseries.SPLITS, 'split_by', None)
+        series = timeseries.parse_series(params.get('series'))
+        window = timeseries.parse_positive_int(params.get('window'), 'window', None, 366)
+        top = timeseries.parse_positive_int(
+            params.get('top'), 'top', timeseries.DEFAULT_TOP, timeseries.MAX_TOP
+        )
+        start, end = self._series_range(filters)
+
+        frame = timeseries.daily_frame(self._series_queryset(filters, start, end), series, split)
+        data = timeseries.build_timeseries(frame, series, start, end, interval, window, top)
+        data['split_by'] = split
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def performance_metrics(self, request):
+        """
+        Indicateurs par vendeur / point de vente / produit sur la période,
+        comparés à la période précédente de même durée (timeseries.py).
+
+        ?split_by=vendor|point_of_sale|product&top=10
+        """
+        serializer = FilterSerializer(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+
+        split = timeseries.parse_choice(
+            request.GET.get('split_by'), timeseries.SPLITS, 'split_by', 'vendor'
+        )
+        top = timeseries.parse_positive_int(
+            request.GET.get('top'), 'top', timeseries.DEFAULT_TOP, timeseries.MAX_TOP
+        )
+        start, end = self._series_range(filters)
+        previous_start = start - (end - start) - timedelta(days=1)
+
+        frame = timeseries.daily_frame(
+            self._series_queryset(filters, previous_start, end), list(timeseries.SERIES), split
+        )
+        data = timeseries.build_performance(frame, start, end, previous_start, top)
+        data['split_by'] = split
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def performance_chart(self, request):
         """Graphique de performance par vendeur/point de vente"""
@@ -435,7 +504,10 @@ class StatisticsViewSet(viewsets.ViewSet):
     
     # ==================== EXPORTS ====================
     
+    # Fichiers en pièce jointe : envoyés tels quels, avec leur Content-Length
+    # (les gestionnaires de téléchargement enregistrent le corps reçu)
     @action(detail=False, methods=['post'])
+    @no_compression
     def export_data(self, request):
         """Export des données en CSV, Excel ou PDF"""
         try:
@@ -531,7 +603,7 @@ class StatisticsViewSet(viewsets.ViewSet):
         sales_qs = Sale.objects.select_related(
             'product_variant__product',
             'vendor',
-            'vendor_activity__vendor__point_of_sale'
+            'point_of_sale'
         )
         sales_qs = self._apply_filters(sales_qs, filters)
         
@@ -541,7 +613,7 @@ class StatisticsViewSet(viewsets.ViewSet):
                 'Date': sale.created_at.date().isoformat(),
                 'Produit': sale.product_variant.product.name if sale.product_variant and sale.product_variant.product else 'N/A',
                 'Vendeur': sale.vendor.full_name if sale.vendor else 'N/A',
-                'Point de vente': sale.vendor_activity.vendor.point_of_sale.name if sale.vendor_activity and sale.vendor_activity.vendor and sale.vendor_activity.vendor.point_of_sale else 'N/A',
+                'Point de vente': sale.point_of_sale.name if sale.point_of_sale else 'N/A',
                 'Quantité': sale.quantity,
                 'Prix unitaire': float(sale.total_amount / sale.quantity) if sale.quantity > 0 else 0,
                 'Montant total': float(sale.total_amount),
@@ -635,7 +707,7 @@ class StatisticsViewSet(viewsets.ViewSet):
         
         export_data = []
         for pos in pos_qs:
-            sales_qs = Sale.objects.filter(vendor_activity__vendor__point_of_sale=pos)
+            sales_qs = Sale.objects.filter(point_of_sale=pos)
             sales_qs = self._apply_filters(sales_qs, filters)
             
             sales_agg = sales_qs.aggregate(
@@ -2,11 +2,23 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Q, F, DecimalField, FilteredRelation, Window
+from django.db.models.functions import Coalesce, Rank, PercentRank
 from django.shortcuts import get_object_or_404
-from .models import MobileVendor, Sale
+from rest_framework.pagination import PageNumberPagination
+from .models import MobileVendor, Sale, VendorPerformance
 from .serializers_per import MobileVendorSerializer, VendorPerformanceSerializer
-from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
+from . import timeseries
+from .performance import current_month, next_month, recompute_vendor_stats
+from datetime import datetime, timedelta
+
+
+class VendorRankingPagination(PageNumberPagination):
+    """Classement paginé : ?page=2&page_size=100"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
 
 class VendorViewSet(viewsets.ModelViewSet):
     queryset = MobileVendor.objects.all()
@@ -16,16 +28,23 @@ class VendorViewSet(viewsets.ModelViewSet):
     def performance(self, request, pk=None):
         """
         Endpoint pour obtenir la performance d'un vendeur
+        
+        Par défaut (ou ?month=AAAA-MM) : lignes VendorPerformance matérialisées
+        (voir performance.py). Avec ?days= ou ?start_date=&end_date= : calcul
+        sur la période demandée.
         """
         vendor = self.get_object()
         
         # Récupérer les paramètres de période
-        days = request.query_params.get('days', 30)
+        days = request.query_params.get('days')
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         
+        if not days and not (start_date and end_date):
+            return self.monthly_performance(request, vendor)
+        
         try:
-            days = int(days)
+            days = int(days or 30)
         except ValueError:
             days = 30
         
@@ -50,10 +69,64 @@ class VendorViewSet(viewsets.ModelViewSet):
         
         return Response(data)
     
+    def monthly_performance(self, request, vendor):
+        """Performance mensuelle lue dans VendorPerformance"""
+        month_param = request.query_params.get('month')
+        if month_param:
+            try:
+                month = datetime.strptime(month_param, '%Y-%m').date()
+            except ValueError:
+                return Response(
+                    {'error': 'Format de mois invalide. Utilisez AAAA-MM'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            month = current_month()
+        
+        # Mois demandé et 11 précédents en une requête
+        history = list(
+            VendorPerformance.objects
+            .filter(vendor=vendor, month__lte=month)
+            .order_by('-month')[:12]
+        )
+        row = history[0] if history and history[0].month == month else None
+        # Mois en cours : moyenne sur les jours écoulés, pas sur tout le mois
+        last_day = min(next_month(month) - timedelta(days=1), timeseries.local_date(timezone.now()))
+        days_elapsed = max((last_day - month).days + 1, 1)
+        total_sales = float(row.total_sales) if row else 0.0
+        
+        return Response({
+            'vendor_id': vendor.id,
+            'vendor_name': f"{vendor.first_name} {vendor.last_name}",
+            'period': f"Mois: {month:%Y-%m}",
+            'performance_percentage': row.performance_score if row else 0.0,
+            'statistics': {
+                'vendor_sales_count': row.orders_completed if row else 0,
+                'vendor_total_sales': total_sales,
+                'market_share_percentage': row.performance_score if row else 0.0,
+                'average_daily_sales': total_sales / days_elapsed,
+                'days_worked': row.days_worked if row else 0,
+                'distance_covered': round(row.distance_covered, 3) if row else 0.0,
+                'bonus_earned': float(row.bonus_earned) if row else 0.0,
+                'period_start': month.isoformat(),
+                'period_end': (next_month(month) - timedelta(days=1)).isoformat(),
+            },
+            'history': [
+                {
+                    'month': item.month.strftime('%Y-%m'),
+                    'performance_percentage': item.performance_score,
+                    'total_sales': float(item.total_sales),
+                    'orders_completed': item.orders_completed,
+                    'days_worked': item.days_worked,
+                }
+                for item in history
+            ]
+        })
+    
     @action(detail=False, methods=['get'])
     def ranking(self, request):
         """
-        Endpoint pour obtenir le classement de tous les vendeurs
+        Endpoint pour obtenir le classement de tous les vendeurs (paginé)
         """
         days = request.query_params.get('days', 30)
         
@@ -62,11 +135,24 @@ class VendorViewSet(viewsets.ModelViewSet):
         except ValueError:
             days = 30
         
-        ranking = self.get_vendors_ranking(days)
+        end_date = timezone.now()
+        start_date = end_date - timezone.timedelta(days=days)
+        total_all_sales = self.get_total_sales(start_date, end_date)
+        
+        paginator = VendorRankingPagination()
+        rows = paginator.paginate_queryset(
+            self.get_ranking_queryset(start_date, end_date), request, view=self
+        )
+        ranking = [self.ranking_entry(row, total_all_sales, days) for row in rows]
         
         return Response({
             'period_days': days,
-            'total_vendors': len(ranking),
+            'total_vendors': paginator.page.paginator.count,
+            'total_all_vendors_sales': float(total_all_sales),
+            'page': paginator.page.number,
+            'page_size': paginator.get_page_size(request),
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
             'ranking': ranking
         })
     
@@ -93,6 +179,26 @@ class VendorViewSet(viewsets.ModelViewSet):
             'performance': vendor.performance
         })
     
+    @action(detail=False, methods=['post'])
+    def recompute_performance(self, request):
+        """
+        Recalcule performance et average_daily_sales de tous les vendeurs
+        (un agrégat groupé + bulk_update, voir performance.py)
+        """
+        days = request.data.get('days', 30)
+        try:
+            days = max(int(days), 1)
+        except (TypeError, ValueError):
+            days = 30
+        
+        updated = recompute_vendor_stats(days=days)
+        
+        return Response({
+            'message': 'Performances mises à jour avec succès',
+            'period_days': days,
+            'updated_vendors': updated
+        })
+    
     @action(detail=True, methods=['get'])
     def sales_history(self, request, pk=None):
         """
@@ -183,53 +289,75 @@ class VendorViewSet(viewsets.ModelViewSet):
             'period_end': end_date.strftime('%Y-%m-%d') if hasattr(end_date, 'strftime') else str(end_date),
         }
     
-    def get_vendors_ranking(self, days=30):
+    def get_total_sales(self, start_date, end_date):
+        """Ventes totales de tous les vendeurs sur la période"""
+        return Sale.objects.filter(
+            created_at__gte=start_date,
+            created_at__lte=end_date
+        ).aggregate(total=Sum('total_amount'))['total'] or 0
+    
+    def get_ranking_queryset(self, start_date, end_date):
+        """
+        Classement en une requête : ventes agrégées par vendeur (vendeurs sans
+        vente compris), rang avec ex æquo (Rank) et rang centile (PercentRank)
+        calculés par la base sur l'ensemble des vendeurs, avant pagination.
+        La période est dans la condition de jointure (FilteredRelation) : seules
+        les ventes de la période sont jointes, pas tout l'historique.
+        """
+        total_sales = F('total_sales')
+        return (
+            MobileVendor.objects
+            .order_by()
+            .annotate(period_sales=FilteredRelation(
+                'sales_vendors',
+                condition=Q(
+                    sales_vendors__created_at__gte=start_date,
+                    sales_vendors__created_at__lte=end_date
+                ),
+            ))
+            .values('id', 'first_name', 'last_name', 'point_of_sale__name')
+            .annotate(
+                total_sales=Coalesce(
+                    Sum('period_sales__total_amount'), 0,
+                    output_field=DecimalField(max_digits=15, decimal_places=2)
+                ),
+                sales_count=Count('period_sales'),
+            )
+            .annotate(
+                rank=Window(expression=Rank(), order_by=total_sales.desc()),
+                percent_rank=Window(expression=PercentRank(), order_by=total_sales.asc()),
+            )
+            .order_by('rank', 'id')
+        )
+    
+    def ranking_entry(self, row, total_all_sales, days):
+        total_sales = row['total_sales']
+        performance = (total_sales / total_all_sales * 100) if total_all_sales > 0 else 0
+        return {
+            'rank': row['rank'],
+            'vendor_id': row['id'],
+            'vendor_name': f"{row['first_name']} {row['last_name']}",
+            'point_of_sale': row['point_of_sale__name'],
+            'performance_percentage': round(float(performance), 2),
+            # Part des vendeurs qui vendent moins (100 = meilleur vendeur)
+            'percentile': round(row['percent_rank'] * 100, 1),
+            'total_sales': float(total_sales),
+            'sales_count': row['sales_count'],
+            'average_daily_sales': float(total_sales / days) if days > 0 else float(total_sales)
+        }
+    
+    def get_vendors_ranking(self, days=30, limit=None):
         """
         Méthode helper pour obtenir le classement des vendeurs
         """
         end_date = timezone.now()
         start_date = end_date - timezone.timedelta(days=days)
+        total_all_sales = self.get_total_sales(start_date, end_date)
         
-        vendors = MobileVendor.objects.all()
-        ranking = []
-        
-        # Obtenir le total des ventes de tous les vendeurs
-        total_all_sales = Sale.objects.filter(
-            created_at__gte=start_date,
-            created_at__lte=end_date
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        for vendor in vendors:
-            vendor_sales = Sale.objects.filter(
-                vendor=vendor,
-                created_at__gte=start_date,
-                created_at__lte=end_date
-            ).aggregate(
-                total_sales=Sum('total_amount'),
-                sales_count=Count('id')
-            )
-            
-            total_sales = vendor_sales['total_sales'] or 0
-            performance = (total_sales / total_all_sales * 100) if total_all_sales > 0 else 0
-            
-            ranking.append({
-                'rank': 0,  # À calculer après
-                'vendor_id': vendor.id,
-                'vendor_name': f"{vendor.first_name} {vendor.last_name}",
-                'point_of_sale': vendor.point_of_sale.name,
-                'performance_percentage': round(performance, 2),
-                'total_sales': float(total_sales),
-                'sales_count': vendor_sales['sales_count'] or 0,
-                'average_daily_sales': float(total_sales / days) if days > 0 else float(total_sales)
-            })
-        
-        # Trier par performance et attribuer les rangs
-        ranking.sort(key=lambda x: x['performance_percentage'], reverse=True)
-        
-        for i, vendor_data in enumerate(ranking):
-            vendor_data['rank'] = i + 1
-        
-        return ranking
+        rows = self.get_ranking_queryset(start_date, end_date)
+        if limit is not None:
+            rows = rows[:limit]
+        return [self.ranking_entry(row, total_all_sales, days) for row in rows]
     
     @action(detail=False, methods=['get'])
     def sales_evolution(self, request):
@@ -250,27 +378,62 @@ class VendorViewSet(viewsets.ModelViewSet):
         end_date = timezone.now()
         start_date = end_date - timezone.timedelta(days=days)
         
-        # Filtrer par vendeurs spécifiques ou tous les vendeurs
+        # Vendeurs demandés, sinon les meilleurs du classement (?top=10)
         if vendor_ids:
             vendor_ids = [int(id) for id in vendor_ids.split(',')]
-            vendors = MobileVendor.objects.filter(id__in=vendor_ids)
+            vendors = [
+                {'vendor_id': vendor['id'], 'vendor_name': f"{vendor['first_name']} {vendor['last_name']}"}
+                for vendor in MobileVendor.objects.filter(id__in=vendor_ids)
+                .order_by('id').values('id', 'first_name', 'last_name')
+            ]
         else:
-            vendors = MobileVendor.objects.all()
-        
-        # Déterminer la fonction de truncation selon la période
-        if period == 'weekly':
-            trunc_func = TruncWeek
-            period_format = 'Semaine %W'
-        elif period == 'monthly':
-            trunc_func = TruncMonth
-            period_format = '%B %Y'
-        else:  # daily par défaut
-            trunc_func = TruncDate
-            period_format = '%Y-%m-%d'
-        
-        # Données pour tous les vendeurs
-        chart_data = self.get_sales_evolution_data(
-            vendors, start_date, end_date, trunc_func, period_format
+            try:
+                top = min(max(int(request.query_params.get('top', 10)), 1), 50)
+            except ValueError:
+                top = 10
+            vendors = self.get_vendors_ranking(days, limit=top)
+        
+        # Regroupement partagé avec les graphiques (timeseries.py)
+        interval = {'weekly': 'week', 'monthly': 'month'}.get(period, 'day')
+        
+        chart_data = self.get_sales_evolution_data(vendors, start_date, end_date, interval)
+        chart_data['period'] = period
+        chart_data['period_days'] = days
+        
+        return Response(chart_data)
+    
+    def get_sales_evolution_data(self, vendors, start_date, end_date, interval):
+        """
+        Ventes par vendeur et par période en une requête groupée, périodes
+        vides complétées par 0
+        """
+        start = timeseries.local_date(start_date)
+        end = timeseries.local_date(end_date)
+        buckets = timeseries.bucket_starts(start, end, interval)
+        index = {bucket: position for position, bucket in enumerate(buckets)}
+        
+        series = {vendor['vendor_id']: [0.0] * len(buckets) for vendor in vendors}
+        lower, upper = timeseries.day_bounds(start, end)
+        rows = (
+            Sale.objects
+            .filter(vendor_id__in=list(series), created_at__gte=lower, created_at__lt=upper)
+            .order_by()
+            .values('vendor_id', bucket=timeseries.truncate('created_at', interval))
+            .annotate(total=Sum('total_amount'))
         )
+        for row in rows:
+            position = index.get(row['bucket'])
+            if position is not None:
+                series[row['vendor_id']][position] = float(row['total'] or 0)
         
-        return Response(chart_data)
\ No newline at end of file
+        return {
+            'labels': [timeseries.bucket_label(bucket, interval) for bucket in buckets],
+            'datasets': [
+                {
+                    'vendor_id': vendor['vendor_id'],
+                    'label': vendor['vendor_name'],
+                    'data': series[vendor['vendor_id']],
+                }
+                for vendor in vendors
+            ]
+        }
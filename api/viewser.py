@@ -2,7 +2,7 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, Count, Avg, F, Q, Value, DecimalField
+from django.db.models import Sum, Count, Avg, F, Q, Value, DecimalField, OuterRef, Subquery
 from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncYear
 from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
@@ -21,6 +21,22 @@ from .serializers_rep import (
     PurchaseSerializer, VendorGeoSerializer
 )
 
+def _vendor_sales(**filters):
+    """CA d'un vendeur (annotation sur MobileVendor), en sous-requête corrélée."""
+    return Coalesce(
+        Subquery(
+            Sale.objects
+            .filter(vendor_activity__vendor=OuterRef('pk'), **filters)
+            .order_by()
+            .values('vendor_activity__vendor')
+            .annotate(total=Sum('total_amount'))
+            .values('total'),
+            output_field=DecimalField()
+        ),
+        Value(0, output_field=DecimalField())
+    )
+
+
 class ReportViewSet(viewsets.ViewSet):
     """
     ViewSet pour générer différents types de rapports incluant MobileVendor
@@ -56,7 +72,7 @@ class ReportViewSet(viewsets.ViewSet):
         if vendor_id:
             sale_filter &= Q(vendor_id=vendor_id)
         if point_of_sale_id:
-            sale_filter &= Q(vendor__point_of_sale_id=point_of_sale_id)
+            sale_filter &= Q(point_of_sale_id=point_of_sale_id)
         
         # Calcul des métriques pour la période actuelle - Commandes POS
         pos_metrics = OrderItem.objects.filter(order_filter).aggregate(
@@ -87,7 +103,7 @@ class ReportViewSet(viewsets.ViewSet):
         
         if point_of_sale_id:
             prev_order_filter &= Q(order__point_of_sale_id=point_of_sale_id)
-            prev_sale_filter &= Q(vendor__point_of_sale_id=point_of_sale_id)
+            prev_sale_filter &= Q(point_of_sale_id=point_of_sale_id)
         if vendor_id:
             prev_sale_filter &= Q(vendor_id=vendor_id)
             
@@ -199,52 +215,18 @@ class ReportViewSet(viewsets.ViewSet):
         """
         Données géographiques des vendeurs pour la cartographie
         """
-        # Récupérer les vendeurs avec leur dernière position
+        # Vendeurs dont la dernière position connue date d'aujourd'hui
+        # (MobileVendor.last_location, tenu à jour par signals.py)
         today = timezone.now().date()
         
         vendors = (
             MobileVendor.objects
-            .filter(activities__timestamp__date=today)
-            .annotate(
-                last_activity=Max('activities__timestamp'),
-                total_sales_today=Coalesce(
-                    Sum('activities__sales__total_amount', 
-                        filter=Q(activities__timestamp__date=today)),
-                    Value(0, output_field=DecimalField())
-                )
-            )
-            .distinct()
+            .filter(last_location_at__date=today)
+            .select_related('point_of_sale')
+            .annotate(total_sales_today=_vendor_sales(vendor_activity__timestamp__date=today))
         )
         
-        # Pour chaque vendeur, trouver la dernière position connue
-        vendor_data = []
-        for vendor in vendors:
-            last_activity = (
-                VendorActivity.objects
-                .filter(vendor=vendor, timestamp__date=today)
-                .exclude(location__isnull=True)
-                .order_by('-timestamp')
-                .first()
-            )
-            
-            if last_activity and last_activity.location:
-                vendor_data.append({
-                    'id': vendor.id,
-                    'first_name': vendor.first_name,
-                    'last_name': vendor.last_name,
-                    'phone': vendor.phone,
-                    'point_of_sale_name': vendor.point_of_sale.name,
-                    'point_of_sale_region': vendor.point_of_sale.region,
-                    'point_of_sale_commune': vendor.point_of_sale.commune,
-                    'vehicle_type': vendor.vehicle_type,
-                    'status': vendor.status,
-                    'last_activity': last_activity.timestamp,
-                    'total_sales_today': vendor.total_sales_today or 0,
-                    'latitude': last_activity.location.get('latitude'),
-                    'longitude': last_activity.location.get('longitude')
-                })
-        
-        serializer = VendorGeoSerializer(vendor_data, many=True)
+        serializer = VendorGeoSerializer(vendors, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -493,48 +475,31 @@ class DashboardViewSet(viewsets.ViewSet):
         """
         Données pour la carte des vendeurs en temps réel
         """
-        # Vendeurs actifs aujourd'hui avec leur dernière position
+        # Vendeurs actifs dont la dernière position connue date d'aujourd'hui
         today = timezone.now().date()
         
         active_vendors = (
             MobileVendor.objects
-            .filter(status='actif')
-            .filter(activities__timestamp__date=today)
-            .distinct()
+            .filter(status='actif', last_location_at__date=today)
+            .select_related('point_of_sale')
+            .annotate(today_sales=_vendor_sales(created_at__date=today))
         )
         
         vendor_data = []
         for vendor in active_vendors:
-            # Dernière activité avec position
-            last_activity = (
-                VendorActivity.objects
-                .filter(vendor=vendor, timestamp__date=today)
-                .exclude(location__isnull=True)
-                .order_by('-timestamp')
-                .first()
-            )
-            
-            if last_activity and last_activity.location:
-                # Ventes du jour
-                today_sales = (
-                    Sale.objects
-                    .filter(vendor_activity__vendor=vendor, created_at__date=today)
-                    .aggregate(total=Coalesce(Sum('total_amount'), Value(0)))
-                )['total']
-                
-                vendor_data.append({
-                    'id': vendor.id,
-                    'name': vendor.full_name,
-                    'point_of_sale': vendor.point_of_sale.name,
-                    'region': vendor.point_of_sale.region,
-                    'commune': vendor.point_of_sale.commune,
-                    'vehicle_type': vendor.vehicle_type,
-                    'phone': vendor.phone,
-                    'status': vendor.status,
-                    'last_activity': last_activity.timestamp.isoformat() if last_activity else None,
-                    'today_sales': today_sales,
-                    'latitude': last_activity.location.get('latitude'),
-                    'longitude': last_activity.location.get('longitude')
-                })
+            vendor_data.append({
+                'id': vendor.id,
+                'name': vendor.full_name,
+                'point_of_sale': vendor.point_of_sale.name,
+                'region': vendor.point_of_sale.region,
+                'commune': vendor.point_of_sale.commune,
+                'vehicle_type': vendor.vehicle_type,
+                'phone': vendor.phone,
+                'status': vendor.status,
+                'last_activity': vendor.last_location_at.isoformat(),
+                'today_sales': vendor.today_sales,
+                'latitude': vendor.last_location.get('latitude'),
+                'longitude': vendor.last_location.get('longitude')
+            })
         
         return Response(vendor_data)
\ No newline at end of file
@@ -1,32 +1,49 @@
 from django.db.models import Count, Avg, Q, OuterRef, Subquery
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from .facets import facet_counts, filter_options_for_user
+from .fast_serializers import ValuesListMixin
+from .fieldsets import sparse_queryset
+from .geo import GeoAreaFilter
+from .search import search_queryset
 from .models import PointOfSale, PointOfSalePhoto
 from .serializerss import (
     PointOfSaleListSerializer,
+    PointOfSaleListValuesSerializer,
     PointOfSaleDetailSerializer,
     PointOfSaleWriteSerializer,
     PhotoSerializer,
 )
 
 
-class PointOfSaleViewSet(viewsets.ModelViewSet):
+class PointOfSaleViewSet(ValuesListMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    # GET /api/points-vente/ : lecture via .values(), même JSON que PointOfSaleListSerializer
+    values_serializer_class = PointOfSaleListValuesSerializer
+    # ?bbox=ouest,sud,est,nord ou ?lat=&lng=&radius= (voir geo.py)
+    filter_backends = [DjangoFilterBackend, GeoAreaFilter]
 
     # ─────────────────────────────────────────────────────────────────────
     # Queryset de base
     # FIX 3 : on annote photos_count_annotated pour éviter le N+1
+    # Le prefetch des photos est ajouté par sparse_queryset
+    # seulement quand le serializer les renvoie (détail, ?expand=photos)
     # ─────────────────────────────────────────────────────────────────────
     def get_queryset(self):
-        qs = (
-            PointOfSale.objects
-            .filter(user=self.request.user)
-            .prefetch_related('photos')
-            .annotate(photos_count_annotated=Count('photos', distinct=True))
-        )
+        return self.annotate_queryset(self.get_filtered_queryset())
+
+    def annotate_queryset(self, qs):
+        # Annotation après les filtres : la recherche part d'un queryset sans GROUP BY
+        qs = qs.annotate(photos_count_annotated=Count('photos', distinct=True))
+        return sparse_queryset(qs, self.get_serializer_class(), self.request)
+
+    def get_filtered_queryset(self):
+        """Points de vente de l'utilisateur après les filtres query string."""
+        qs = PointOfSale.objects.filter(user=self.request.user)
 
         # ── Filtres query string ──────────────────────────────────────────
         params = self.request.query_params
@@ -59,17 +76,40 @@ class PointOfSaleViewSet(viewsets.ModelViewSet):
         if marque:
             qs = qs.filter(marque_brander__icontains=marque)
         if search:
-            qs = qs.filter(
-                Q(name__icontains=search)
-                | Q(owner__icontains=search)
-                | Q(commune__icontains=search)
-                | Q(quartier__icontains=search)
-                | Q(address__icontains=search)
-                | Q(marque_brander__icontains=search)
-            )
-
+            # Index plein texte, préfixes sans accents, trié par pertinence (search.py)
+            qs = search_queryset(qs, search)
         return qs
 
+    # ─────────────────────────────────────────────────────────────────────
+    # GET /api/points-vente/?include=facets
+    #
+    # Renvoie la liste filtrée et, dans la même réponse, les effectifs par
+    # type, statut, potentiel, commune et branding (une requête groupée,
+    # voir facets.py) :
+    #   { "count": n, "results": [...], "facets": {...} }
+    # Sans ?include=facets la réponse reste la liste seule.
+    # ─────────────────────────────────────────────────────────────────────
+    def list(self, request, *args, **kwargs):
+        include = {
+            part.strip() for part in request.query_params.get('include', '').split(',')
+        }
+        # Filtres et recherche construits une fois, pour la page et les effectifs
+        filtered = self.filter_queryset(self.get_filtered_queryset())
+        response = self.values_response(self.annotate_queryset(filtered))
+        if 'facets' not in include:
+            return response
+
+        facets = facet_counts(filtered)
+        if isinstance(response.data, dict):
+            # Pagination DRF : on complète la réponse paginée
+            response.data['facets'] = facets
+            return response
+        return Response({
+            'count': len(response.data),
+            'results': response.data,
+            'facets': facets,
+        })
+
     # ─────────────────────────────────────────────────────────────────────
     # Choix du serializer
     # ─────────────────────────────────────────────────────────────────────
@@ -114,7 +154,9 @@ class PointOfSaleViewSet(viewsets.ModelViewSet):
     # ─────────────────────────────────────────────────────────────────────
     # GET /api/points-vente/filter-options/
     #
-    # Retourne les valeurs uniques pour peupler les <select> du dashboard.
+    # Retourne les valeurs uniques pour peupler les <select> du dashboard,
+    # avec leurs effectifs (une requête groupée, cache par utilisateur :
+    # voir facets.py).
     #
     # FIX : les potentiels sont triés dans l'ordre logique
     #       standard → developpement → fort_potentiel → premium
@@ -122,52 +164,7 @@ class PointOfSaleViewSet(viewsets.ModelViewSet):
     # ─────────────────────────────────────────────────────────────────────
     @action(detail=False, methods=['get'], url_path='filter-options')
     def filter_options(self, request):
-        qs = PointOfSale.objects.filter(user=request.user)
-
-        # Valeurs simples
-        communes = sorted(
-            qs.exclude(commune='').values_list('commune', flat=True).distinct()
-        )
-        districts = sorted(
-            qs.exclude(district='').values_list('district', flat=True).distinct()
-        )
-        regions = sorted(
-            qs.exclude(region='').values_list('region', flat=True).distinct()
-        )
-        marques = sorted(
-            qs.filter(brander=True)
-              .exclude(marque_brander='')
-              .exclude(marque_brander__isnull=True)
-              .values_list('marque_brander', flat=True)
-              .distinct()
-        )
-
-        # Types : uniquement ceux présents dans la base, avec label lisible
-        type_map = dict(PointOfSale.TYPE_CHOICES)
-        types_in_db = qs.values_list('type', flat=True).distinct()
-        types = [
-            {'value': t, 'label': type_map.get(t, t)}
-            for t in sorted(types_in_db) if t
-        ]
-
-        # FIX : potentiels dans l'ordre logique métier (pas alphabétique)
-        potentiel_order = ['standard', 'developpement', 'fort_potentiel', 'premium']
-        potentiel_map = dict(PointOfSale.POTENTIEL_CHOICES)
-        potentiels_in_db = set(qs.values_list('potentiel', flat=True).distinct())
-        potentiels = [
-            {'value': p, 'label': potentiel_map.get(p, p)}
-            for p in potentiel_order
-            if p in potentiels_in_db
-        ]
-
-        return Response({
-            'communes':  list(communes),
-            'districts': list(districts),
-            'regions':   list(regions),
-            'marques':   list(marques),
-            'types':     types,
-            'potentiels': potentiels,
-        })
+        return Response(filter_options_for_user(request.user))
 
     # ─────────────────────────────────────────────────────────────────────
     # GET /api/points-vente/agents-performance/
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config  # Pour gérer les variables d'environnement
 import dj_database_url  # Importez dj-database-url
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',  # gzip/brotli des réponses API
     'corsheaders.middleware.CorsMiddleware',  # Add this
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,7 +69,54 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # orjson si installé, sinon repli automatique sur l'encodeur standard (api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+# Compression des réponses API (api/middleware.py)
+API_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'PATH_PREFIXES': ['/api/'],
+}
+
+# Cache partagé par tous les workers gunicorn de la machine : les
+# invalidations des signaux (périmètre, facettes) sont vues par tous les
+# processus. Avec le cache local par défaut (LocMemCache), seul le worker
+# qui reçoit le signal serait invalidé. Sur plusieurs machines, pointer
+# CACHE_LOCATION vers un volume commun ou passer à un cache réseau.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config(
+            'CACHE_LOCATION', default=str(Path(tempfile.gettempdir()) / 'lanfiatect_cache')
+        ),
+    }
 }
+
+# Durée (secondes) de mise en cache du périmètre utilisateur (api/scope.py).
+# C'est aussi le délai maximal pendant lequel un accès retiré reste servi si
+# une invalidation n'atteint pas le cache (cache non partagé).
+USER_SCOPE_CACHE_TTL = 60
+
+# Durée (secondes) de mise en cache des tuiles de heatmap (api/heatmap.py)
+HEATMAP_CACHE_TTL = 300
+
+# Durée (secondes) de mise en cache des facettes des points de vente (api/facets.py)
+FACETS_CACHE_TTL = 300
+
+# Cache LRU par processus des codes scannés (api/scan.py)
+SCAN_CACHE_SIZE = 4096
+SCAN_CACHE_TTL = 300
+
 ROOT_URLCONF = 'lanfiatect.urls'
 
 TEMPLATES = [
@@ -143,6 +192,9 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Fuseau métier pour le regroupement des graphiques (api/timeseries.py)
+BUSINESS_TIME_ZONE = 'Africa/Abidjan'
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/